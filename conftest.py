@@ -6,3 +6,20 @@ sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))  # Ajoute le proj
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "enchante.settings")  # Vérifie que "enchante" est correct
 django.setup()
+
+import pytest
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    """ Cache vidé à chaque test : les compteurs de génération et listes en cache survivraient au rollback de la base. """
+    from django.core.cache import cache
+    from pastry_app.utils import _forget_prefix_generation
+    cache.clear()
+    _forget_prefix_generation()  # génération d'un test précédent, annulée par son rollback
+
+@pytest.fixture(autouse=True)
+def _close_search_pool():
+    """ Les threads de l'omnibox gardent leur connexion : fermées après chaque test (flush et suppression de la base de test). """
+    yield
+    from pastry_app.views import _shutdown_search_executor
+    _shutdown_search_executor()
@@ -151,4 +151,26 @@ REST_FRAMEWORK = {
     "DEFAULT_THROTTLE_RATES": {"adapt": "15/minute"},
 }
 
-DATE_INPUT_FORMATS = ["%Y-%m-%d"]  # Format standard ISO (AAAA-MM-JJ)
\ No newline at end of file
+DATE_INPUT_FORMATS = ["%Y-%m-%d"]  # Format standard ISO (AAAA-MM-JJ)
+
+# Cache partagé par tous les workers (listes de référence, omnibox) : Redis si REDIS_URL est défini,
+# sinon table en base (migration 0018). Jamais de cache par processus (LocMemCache), cf. check pastry_app.E001.
+if os.getenv('REDIS_URL'):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': os.getenv('REDIS_URL')}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'pastry_cache',
+                          'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '20000'))}}}
+
+# Historique des prix : partitions annuelles conservées en base, au-delà archivées sur disque (archive_price_history)
+PRICE_HISTORY_RETENTION_YEARS = int(os.getenv('PRICE_HISTORY_RETENTION_YEARS', '3'))
+PRICE_HISTORY_ARCHIVE_DIR = os.getenv('PRICE_HISTORY_ARCHIVE_DIR', str(BASE_DIR / 'archives' / 'price_history'))
+
+# Omnibox : seuils pg_trgm des opérateurs indexés % (similarity) et <% (word_similarity)
+SEARCH_SIMILARITY_THRESHOLD = float(os.getenv('SEARCH_SIMILARITY_THRESHOLD', '0.3'))
+SEARCH_WORD_SIMILARITY_THRESHOLD = float(os.getenv('SEARCH_WORD_SIMILARITY_THRESHOLD', '0.6'))
+SEARCH_UNIFIED_INDEX = os.getenv('SEARCH_UNIFIED_INDEX', 'True') == 'True'  # omnibox sur SearchDocument (sinon une requête par entité)
+SEARCH_MAX_WORKERS = int(os.getenv('SEARCH_MAX_WORKERS', '4'))  # omnibox par entité : requêtes en parallèle (1 = séquentiel)
+SEARCH_PUBLIC_CACHE_TTL = int(os.getenv('SEARCH_PUBLIC_CACHE_TTL', '300'))  # omnibox : durée de vie de la partie publique en cache (s)
+SEARCH_GENERATION_CHECK_INTERVAL = float(os.getenv('SEARCH_GENERATION_CHECK_INTERVAL', '1'))  # autocomplétion : relecture de la génération par processus (s)
+HIDDEN_RECIPES_CACHE_TTL = int(os.getenv('HIDDEN_RECIPES_CACHE_TTL', '3600'))  # ids de recettes masquées par user/invité (invalidés par signaux) (s)
+REFERENCE_LIST_CACHE_TTL = int(os.getenv('REFERENCE_LIST_CACHE_TTL', '3600'))  # listes de référence sérialisées (clé = générations des tables) (s)
@@ -48,11 +48,13 @@ urlpatterns = [
     path('api/', include(ingredients_router.urls)),
     path('api/', include(subrecipes_router.urls)),
     path("api/search/", SearchAPIView.as_view(), name="omnibox-search"),
+    path("api/search/suggest/", SearchSuggestAPIView.as_view(), name="omnibox-suggest"),
     path('categories/<int:pk>/delete-subcategories/', CategoryViewSet.as_view({"delete": "delete_subcategories"}), name="delete_subcategories"),
     path("api/recipes-adapt/", RecipeAdaptationAPIView.as_view(), name="adapt-recipe"),
     path("api/recipes-adapt/by-ingredient/", RecipeAdaptationByIngredientAPIView.as_view(), name="adapt-recipe-by-ingredient"),
     path("api/pan-estimation/", PanEstimationAPIView.as_view(), name="estimate-pan"),
     path("api/pan-suggestion/", PanSuggestionAPIView.as_view(), name="suggest-pans"),
+    path("api/shopping-basket/optimize/", ShoppingBasketOptimizerAPIView.as_view(), name="optimize-shopping-basket"),
 ]
 
 
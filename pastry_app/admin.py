@@ -70,7 +70,7 @@ class IngredientAdminForm(forms.ModelForm):
     def clean_ingredient_name(self):
         # On normalise comme en prod
         value = self.cleaned_data["ingredient_name"].strip().lower()
-        if Ingredient.objects.exclude(pk=self.instance.pk).filter(ingredient_name__iexact=value).exists():
+        if Ingredient.objects.exclude(pk=self.instance.pk).filter(ingredient_name__nexact=value).exists():
             raise ValidationError("Un ingrédient avec ce nom existe déjà.")
         return value
 
@@ -149,6 +149,7 @@ class CategoryAdmin(AdminSuggestMixin, admin.ModelAdmin):
     form = CategoryAdminForm
     list_display = ("category_name", "category_type", "parent_category", "children_link", "id")
     search_fields = ('category_name',)
+    suggest_prefix_entity = "categories"
     inlines = [ChildCategoryInline]
 
     class Media:
@@ -237,6 +238,7 @@ class LabelAdmin(AdminSuggestMixin, admin.ModelAdmin):
     list_display = ('label_name', 'label_type')
     list_filter = ('label_type',)  
     search_fields = ('label_name', 'label_type') 
+    suggest_prefix_entity = "labels"
 
     class Media:
         css = {'all': ('pastry_app/admin/required_fields.css',)}
@@ -381,6 +383,7 @@ class IngredientAdmin(AdminSuggestMixin, admin.ModelAdmin):
     inlines = [IngredientPriceInline]
     list_display = ('ingredient_name', 'id', categories_display, labels_display, 'visibility', 'is_default', prices_count)
     search_fields = ('ingredient_name', 'categories__category_name', 'labels__label_name')
+    suggest_prefix_entity = "ingredients"
 
     # ---- Filtre Labels restreint (type ingredient|both) ----
     class _LabelForIngredientFilter(RelatedOnlyFieldListFilter):
@@ -557,6 +560,7 @@ class RecipeAdmin(AdminSuggestMixin, admin.ModelAdmin):
     list_display = ('recipe_name', 'id', 'chef_name', 'context_name', 'parent_recipe', 'display_tags', 'visibility', 'is_default')
     list_filter = (ShowFilter, 'recipe_type', CategoryDrilldownFilter, ("labels", _LabelForRecipeFilter), 'visibility')
     search_fields = ('recipe_name', 'categories__category_name', 'labels__label_name')
+    suggest_prefix_entity = "recipes"
     readonly_fields = ['recipe_subrecipes_synthesis']
     form = RecipeAdminForm
 
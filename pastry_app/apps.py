@@ -1,6 +1,23 @@
 from django.apps import AppConfig
+from django.core import checks
+
+
+PER_PROCESS_CACHE_BACKENDS = ("django.core.cache.backends.locmem.LocMemCache",)
+
+def check_shared_cache(app_configs, **kwargs):
+    """ Listes de référence et omnibox en cache : un cache par processus servirait des données périmées aux autres workers. """
+    from django.conf import settings
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend in PER_PROCESS_CACHE_BACKENDS:
+        return [checks.Error(f"Le cache par défaut ({backend}) n'est pas partagé entre workers.",
+                             hint="Définir REDIS_URL ou utiliser DatabaseCache (cf. settings.CACHES).",
+                             id="pastry_app.E001")]
+    return []
 
 
 class EnchanteConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pastry_app'
+
+    def ready(self):
+        checks.register(check_shared_cache, checks.Tags.caches)
@@ -32,6 +32,7 @@ ALLOWED_LEGO_SEARCH_PARAMS = {
     "tags","tags_mode","usage_type","has_pan","has_servings","mine",
     "ordering","page","page_size",
     "target_servings","target_pan_id","include_non_scalable",
+    "target_quantity","host",
 }
 
 ALLOWED_REFERENCE_USES_PARAMS = {
@@ -108,4 +109,14 @@ SERVING_VOLUME_ML = 150  # volume standard pour 1 portion
 # # Dictionnaire qui associe `category_name` à `category_type`
 # LABEL_TYPE_MAP = {key: c_type for key, _, c_type in LABEL_DEFINITIONS}
 # # Liste des noms de catégories pour la validation
-# LABEL_NAME_CHOICES = list(LABEL_TYPE_MAP.keys())
\ No newline at end of file
+# LABEL_NAME_CHOICES = list(LABEL_TYPE_MAP.keys())
+# Omnibox : pondération des entités dans le classement mixte (index de recherche unifié)
+SEARCH_ENTITY_WEIGHTS = {
+    "recipes": 1.0, "ingredients": 0.9, "categories": 0.8, "labels": 0.8, "pans": 0.7, "stores": 0.7,
+}
+
+# Facettes disponibles sur la liste et la recherche de recettes (?facets=categories,labels,...)
+RECIPE_FACETS = ("categories", "labels", "recipe_type", "pan_type")
+
+# Relations des recettes développables via ?expand= (id seul par défaut → {id, name})
+RECIPE_EXPANDABLE_FIELDS = ("pan", "categories", "labels", "parent_recipe")
@@ -112,7 +112,7 @@ def load_references_list():
     created = exists = missing = 0
     for ref in REFERENCES:
         try:
-            ingredient = Ingredient.objects.get(ingredient_name__iexact=ref["ingredient_name"])
+            ingredient = Ingredient.objects.get(ingredient_name__nexact=ref["ingredient_name"])
             obj, was_created = IngredientUnitReference.objects.get_or_create(
                 ingredient=ingredient,
                 unit=ref["unit"],
@@ -146,7 +146,7 @@ def auto_iur_from_form_categories(force: bool = False):
     # Récup catégories forme
     form_cats = {}
     for key, name in FORM_CATEGORIES.items():
-        cat = Category.objects.filter(category_type="ingredient", category_name__iexact=name).first()
+        cat = Category.objects.filter(category_type="ingredient", category_name__nexact=name).first()
         if cat:
             form_cats[key] = cat
         else:
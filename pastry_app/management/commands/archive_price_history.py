@@ -0,0 +1,45 @@
+# archivage annuel de l'historique des prix (cron) : crée les partitions à venir, sort les années hors rétention
+# 30 3 1 * * cd /srv/pastry && python manage.py archive_price_history
+
+# liste des partitions qui seraient archivées, sans écriture
+# python manage.py archive_price_history --retention-years 5 --dry-run
+
+from __future__ import annotations
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from pastry_app.utils import archive_price_history, ensure_price_history_partitions
+
+class Command(BaseCommand):
+    """Maintenance des partitions annuelles d'IngredientPriceHistory et archivage des plus anciennes sur disque."""
+    help = "Crée les partitions manquantes de l'historique des prix et archive (CSV gzip) celles hors rétention."
+
+    def add_arguments(self, parser):
+        """Déclare --retention-years, --dir, --ensure-only, --dry-run."""
+        parser.add_argument("--retention-years", type=int, default=settings.PRICE_HISTORY_RETENTION_YEARS,
+                            help="Nb d'années complètes conservées en base en plus de l'année courante")
+        parser.add_argument("--dir", default=settings.PRICE_HISTORY_ARCHIVE_DIR, help="Répertoire des archives")
+        parser.add_argument("--ensure-only", action="store_true", help="Crée les partitions sans rien archiver")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        if opts["ensure_only"]:
+            created = ensure_price_history_partitions()
+            self.stdout.write(f"[partitions] créées={created or '-'}")
+            self.stdout.write(self.style.SUCCESS("Partitions de l'historique des prix à jour."))
+            return
+
+        try:
+            report = archive_price_history(retention_years=opts["retention_years"], directory=opts["dir"],
+                                           dry_run=opts["dry_run"])
+        except ValidationError as e:
+            raise CommandError(" ".join(e.messages))
+
+        self.stdout.write(f"[partitions] créées={report['created_partitions'] or '-'} rétention jusqu'au {report['cutoff']}")
+        for item in report["archived"]:
+            rows = "?" if item["rows"] is None else item["rows"]
+            self.stdout.write(f"[archive] {item['partition']} ({item['year']}) : {rows} lignes → {item['path'] or '-'}")
+        if opts["dry_run"]:
+            self.stdout.write(self.style.WARNING("Dry-run: aucune partition archivée."))
+            return
+        self.stdout.write(self.style.SUCCESS(f"Archivage terminé : {len(report['archived'])} partition(s)."))
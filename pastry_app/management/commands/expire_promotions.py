@@ -0,0 +1,42 @@
+# balayage quotidien des promotions expirées (cron)
+# 5 0 * * * cd /srv/pastry && python manage.py expire_promotions
+
+# simulation à une date donnée
+# python manage.py expire_promotions --date 2025-07-01 --dry-run
+
+# supprimer (au lieu de conserver) les promos expirées sans prix normal connu
+# python manage.py expire_promotions --delete-orphans
+
+from __future__ import annotations
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from pastry_app.utils import sweep_expired_promotions
+
+class Command(BaseCommand):
+    """Archive les promotions expirées et rétablit le dernier prix normal connu (à lancer via cron)."""
+    help = "Archive les promos expirées (IngredientPrice) dans l'historique et rétablit le prix normal."
+
+    def add_arguments(self, parser):
+        """Déclare --date, --dry-run, --delete-orphans."""
+        parser.add_argument("--date", help="Date de référence AAAA-MM-JJ (défaut: aujourd'hui)")
+        parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument("--delete-orphans", action="store_true",
+                            help="Supprime les promos expirées sans prix normal connu (défaut: conservées en prix normal)")
+
+    def handle(self, *args, **opts):
+        today = None
+        if opts.get("date"):
+            try:
+                today = datetime.date.fromisoformat(opts["date"])
+            except ValueError:
+                raise CommandError(f"Date invalide : {opts['date']} (format attendu AAAA-MM-JJ).")
+
+        report = sweep_expired_promotions(today=today, dry_run=opts["dry_run"], delete_orphans=opts["delete_orphans"])
+        self.stdout.write(
+            f"[promos] expirées={report['expired']} archivées={report['archived']} "
+            f"rétablies={report['restored']} conservées={report['kept']} supprimées={report['deleted']}"
+        )
+        if opts["dry_run"]:
+            self.stdout.write(self.style.WARNING("Dry-run: rollback effectué, aucune écriture persistée."))
+            return
+        self.stdout.write(self.style.SUCCESS("Balayage des promotions terminé."))
@@ -0,0 +1,60 @@
+# import d'une liste de prix fournisseur (CSV ou JSON)
+# python manage.py import_prices prix_fournisseur.csv --delimiter ";"
+
+# contrôle sans écriture, en ignorant les lignes invalides
+# python manage.py import_prices prix_fournisseur.json --dry-run --skip-invalid
+
+from __future__ import annotations
+import csv
+import json
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from pastry_app.utils import bulk_import_prices
+
+class Command(BaseCommand):
+    """Import en masse de prix (IngredientPrice) depuis un fichier CSV ou JSON, en une transaction."""
+    help = "Importe une liste de prix fournisseur (CSV/JSON) : validation en mémoire, archivage et upsert groupés."
+
+    def add_arguments(self, parser):
+        """Déclare le fichier, --format, --delimiter, --skip-invalid, --dry-run."""
+        parser.add_argument("path", help="Fichier CSV (en-tête = noms de champs) ou JSON (liste d'objets)")
+        parser.add_argument("--format", choices=["auto", "csv", "json"], default="auto")
+        parser.add_argument("--delimiter", default=",", help="Séparateur CSV (défaut: ',')")
+        parser.add_argument("--skip-invalid", action="store_true", help="Importe les lignes valides malgré les erreurs")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def _read_rows(self, path: Path, fmt: str, delimiter: str) -> list[dict]:
+        """Charge les lignes brutes. JSON: liste top-level ou {'rows': [...]}."""
+        if fmt == "auto":
+            fmt = "json" if path.suffix.lower() == ".json" else "csv"
+        if fmt == "json":
+            data = json.loads(path.read_text(encoding="utf-8"))
+            return data.get("rows", []) if isinstance(data, dict) else data
+        with path.open(encoding="utf-8-sig", newline="") as f:
+            return list(csv.DictReader(f, delimiter=delimiter))
+
+    def handle(self, *args, **opts):
+        path = Path(opts["path"])
+        if not path.exists():
+            raise CommandError(f"Fichier introuvable : {path}")
+
+        rows = self._read_rows(path, opts["format"], opts["delimiter"])
+        self.stdout.write(f"[import] {len(rows)} lignes lues depuis {path.name}")
+
+        report = bulk_import_prices(rows, skip_invalid=opts["skip_invalid"], dry_run=opts["dry_run"])
+
+        for err in report["errors"][:50]:
+            self.stdout.write(self.style.WARNING(f"[err] ligne {err['row']}: {err['error']}"))
+        if len(report["errors"]) > 50:
+            self.stdout.write(self.style.WARNING(f"[err] … {len(report['errors']) - 50} autres erreurs"))
+        if report["errors"] and not opts["skip_invalid"]:
+            raise CommandError(f"{len(report['errors'])} ligne(s) invalide(s) : aucun prix importé (utilisez --skip-invalid).")
+
+        self.stdout.write(
+            f"[import] créés={report['created']} mis à jour={report['updated']} inchangés={report['unchanged']} "
+            f"archivés={report['archived']} rétroactifs={report['retroactive']}"
+        )
+        if opts["dry_run"]:
+            self.stdout.write(self.style.WARNING("Dry-run: rollback effectué, aucune écriture persistée."))
+            return
+        self.stdout.write(self.style.SUCCESS("Import des prix terminé."))
@@ -0,0 +1,31 @@
+# reconstruction complète de l'index de recherche de l'omnibox (après import massif / chargement de fixtures)
+# python manage.py rebuild_search_index
+
+# uniquement certaines entités
+# python manage.py rebuild_search_index --entities recipes,ingredients
+
+from __future__ import annotations
+from django.core.management.base import BaseCommand, CommandError
+from pastry_app.constants import SEARCH_ENTITY_WEIGHTS
+from pastry_app.utils import rebuild_search_documents
+
+class Command(BaseCommand):
+    """Reconstruit la table SearchDocument à partir des entités recherchables."""
+    help = "Reconstruit l'index de recherche unifié de l'omnibox (SearchDocument)."
+
+    def add_arguments(self, parser):
+        """Déclare --entities."""
+        parser.add_argument("--entities", help=f"Liste CSV parmi {','.join(SEARCH_ENTITY_WEIGHTS)} (défaut: toutes)")
+
+    def handle(self, *args, **opts):
+        entities = None
+        if opts.get("entities"):
+            entities = [e.strip() for e in opts["entities"].split(",") if e.strip()]
+            invalid = [e for e in entities if e not in SEARCH_ENTITY_WEIGHTS]
+            if invalid:
+                raise CommandError(f"Entités invalides : {invalid}")
+
+        counts = rebuild_search_documents(entity_types=entities)
+        for entity, n in counts.items():
+            self.stdout.write(f"[index] {entity}: {n} documents")
+        self.stdout.write(self.style.SUCCESS("Index de recherche reconstruit."))
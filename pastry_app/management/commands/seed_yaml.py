@@ -61,10 +61,10 @@ class Command(BaseCommand):
     # -------------------- Helpers ORM --------------------
     @staticmethod
     def _ci(qs, field: str, value: str | None):
-        """Filtre insensible à la casse sur un champ."""
+        """Filtre insensible à la casse et aux accents sur un champ."""
         if not value:
             return None
-        return qs.filter(**{f"{field}__iexact": value}).first()
+        return qs.filter(**{f"{field}__nexact": value}).first()
 
     def _require_admin(self):
         """Retourne un admin is_staff=True, sinon erreur."""
@@ -175,9 +175,9 @@ class Command(BaseCommand):
     def _upsert_recipe_header(self, r: dict) -> Recipe:
         """Crée/MAJ l’entête Recipe par triplet (name, chef, context)."""
         obj = Recipe.objects.filter(
-            recipe_name__iexact=r["recipe_name"],
-            chef_name__iexact=(r.get("chef_name") or ""),
-            context_name__iexact=(r.get("context_name") or ""),
+            recipe_name__nexact=r["recipe_name"],
+            chef_name__nexact=(r.get("chef_name") or ""),
+            context_name__nexact=(r.get("context_name") or ""),
         ).first()
 
         payload = dict(
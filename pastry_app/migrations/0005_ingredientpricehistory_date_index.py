@@ -0,0 +1,25 @@
+# Generated by Django 4.2.6 on 2026-10-19 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pastry_app', '0004_rename_adaptation_note_recipe_version_note'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='ingredientpricehistory',
+            name='unique_ingredient_price_history',
+        ),
+        migrations.AddIndex(
+            model_name='ingredientpricehistory',
+            index=models.Index(fields=['ingredient', 'date'], name='iph_ingredient_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredientpricehistory',
+            constraint=models.UniqueConstraint(fields=('ingredient', 'store', 'brand_name', 'quantity', 'unit', 'date'), name='unique_ingredient_price_history'),
+        ),
+    ]
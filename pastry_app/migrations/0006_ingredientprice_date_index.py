@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-19 05:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pastry_app', '0005_ingredientpricehistory_date_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredientprice',
+            index=models.Index(fields=['ingredient', 'date'], name='ip_ingredient_date'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-19 05:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pastry_app', '0006_ingredientprice_date_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredientprice',
+            index=models.Index(condition=models.Q(('is_promo', True)), fields=['promotion_end_date'], name='ip_promo_end_date'),
+        ),
+    ]
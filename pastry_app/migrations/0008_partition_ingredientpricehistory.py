@@ -0,0 +1,131 @@
+# Generated by Django 4.2.6 on 2026-10-19 05:09
+
+from django.db import migrations, models
+import django.utils.timezone
+
+# Partitionnement déclaratif PostgreSQL de l'historique des prix par plage de dates (une partition par année).
+# - clé primaire (id, date) : la clé de partitionnement doit faire partie des contraintes uniques ;
+# - id alimenté par une séquence possédée par la colonne (compatible pg_get_serial_sequence / reset des séquences) ;
+# - partitions créées de la plus ancienne année présente (au plus 50 ans) à l'année suivante, + partition DEFAULT ;
+# - les années suivantes sont créées par la commande archive_price_history (ensure_price_history_partitions).
+
+TABLE = "pastry_app_ingredientpricehistory"
+
+COLUMNS = "id, ingredient_name, brand_name, quantity, unit, price, is_promo, promotion_end_date, date, ingredient_id, store_id"
+
+CONSTRAINTS_SQL = f"""
+ALTER TABLE {TABLE} ADD CONSTRAINT unique_ingredient_price_history
+    UNIQUE (ingredient_id, store_id, brand_name, quantity, unit, date);
+CREATE INDEX iph_ingredient_date ON {TABLE} (ingredient_id, date);
+CREATE INDEX pastry_app_ingredientpricehistory_ingredient_id_04086b1e ON {TABLE} (ingredient_id);
+CREATE INDEX pastry_app_ingredientpricehistory_store_id_f76b6adb ON {TABLE} (store_id);
+ALTER TABLE {TABLE} ADD CONSTRAINT pastry_app_ingredien_ingredient_id_04086b1e_fk_pastry_ap
+    FOREIGN KEY (ingredient_id) REFERENCES pastry_app_ingredient(id) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE {TABLE} ADD CONSTRAINT pastry_app_ingredien_store_id_f76b6adb_fk_pastry_ap
+    FOREIGN KEY (store_id) REFERENCES pastry_app_store(id) DEFERRABLE INITIALLY DEFERRED;
+"""
+
+PARTITION_SQL = f"""
+ALTER TABLE {TABLE} RENAME TO {TABLE}_legacy;
+ALTER TABLE {TABLE}_legacy ALTER COLUMN id DROP IDENTITY;
+ALTER TABLE {TABLE}_legacy DROP CONSTRAINT {TABLE}_pkey;
+ALTER TABLE {TABLE}_legacy DROP CONSTRAINT unique_ingredient_price_history;
+ALTER TABLE {TABLE}_legacy DROP CONSTRAINT pastry_app_ingredien_ingredient_id_04086b1e_fk_pastry_ap;
+ALTER TABLE {TABLE}_legacy DROP CONSTRAINT pastry_app_ingredien_store_id_f76b6adb_fk_pastry_ap;
+DROP INDEX iph_ingredient_date, pastry_app_ingredientpricehistory_ingredient_id_04086b1e, pastry_app_ingredientpricehistory_store_id_f76b6adb;
+
+CREATE TABLE {TABLE} (
+    id bigint NOT NULL,
+    ingredient_name varchar(255) NULL,
+    brand_name varchar(200) NULL,
+    quantity double precision NOT NULL,
+    unit varchar(50) NOT NULL,
+    price double precision NOT NULL,
+    is_promo boolean NOT NULL,
+    promotion_end_date date NULL,
+    date date NOT NULL,
+    ingredient_id bigint NULL,
+    store_id bigint NULL,
+    CONSTRAINT {TABLE}_pkey PRIMARY KEY (id, date)
+) PARTITION BY RANGE (date);
+
+CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id;
+ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq');
+
+DO $$
+DECLARE
+    y_now int := EXTRACT(YEAR FROM CURRENT_DATE)::int;
+    y_min int;
+BEGIN
+    SELECT COALESCE(EXTRACT(YEAR FROM MIN(date))::int, y_now) INTO y_min FROM {TABLE}_legacy;
+    FOR y IN GREATEST(LEAST(y_min, y_now), y_now - 50) .. y_now + 1 LOOP
+        EXECUTE format('CREATE TABLE %I PARTITION OF {TABLE} FOR VALUES FROM (%L) TO (%L)',
+                       '{TABLE}_y' || y, make_date(y, 1, 1), make_date(y + 1, 1, 1));
+    END LOOP;
+END $$;
+CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT;
+
+INSERT INTO {TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM {TABLE}_legacy;
+SELECT setval('{TABLE}_id_seq', COALESCE((SELECT MAX(id) FROM {TABLE}), 0) + 1, false);
+DROP TABLE {TABLE}_legacy;
+""" + CONSTRAINTS_SQL
+
+UNPARTITION_SQL = f"""
+ALTER TABLE {TABLE} RENAME TO {TABLE}_partitioned;
+ALTER TABLE {TABLE}_partitioned ALTER COLUMN id DROP DEFAULT;
+DROP SEQUENCE {TABLE}_id_seq;
+ALTER TABLE {TABLE}_partitioned DROP CONSTRAINT {TABLE}_pkey;
+ALTER TABLE {TABLE}_partitioned DROP CONSTRAINT unique_ingredient_price_history;
+ALTER TABLE {TABLE}_partitioned DROP CONSTRAINT pastry_app_ingredien_ingredient_id_04086b1e_fk_pastry_ap;
+ALTER TABLE {TABLE}_partitioned DROP CONSTRAINT pastry_app_ingredien_store_id_f76b6adb_fk_pastry_ap;
+DROP INDEX iph_ingredient_date, pastry_app_ingredientpricehistory_ingredient_id_04086b1e, pastry_app_ingredientpricehistory_store_id_f76b6adb;
+
+CREATE TABLE {TABLE} (
+    id bigint NOT NULL PRIMARY KEY GENERATED BY DEFAULT AS IDENTITY,
+    ingredient_name varchar(255) NULL,
+    brand_name varchar(200) NULL,
+    quantity double precision NOT NULL,
+    unit varchar(50) NOT NULL,
+    price double precision NOT NULL,
+    is_promo boolean NOT NULL,
+    promotion_end_date date NULL,
+    date date NOT NULL,
+    ingredient_id bigint NULL,
+    store_id bigint NULL
+);
+INSERT INTO {TABLE} ({COLUMNS}) OVERRIDING SYSTEM VALUE SELECT {COLUMNS} FROM {TABLE}_partitioned;
+SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), COALESCE((SELECT MAX(id) FROM {TABLE}), 0) + 1, false);
+DROP TABLE {TABLE}_partitioned;
+""" + CONSTRAINTS_SQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pastry_app', '0007_ingredientprice_promo_end_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(f"UPDATE {TABLE} SET date = CURRENT_DATE WHERE date IS NULL;", migrations.RunSQL.noop),
+        migrations.CreateModel(
+            name='PriceHistoryArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('partition_name', models.CharField(max_length=100, unique=True)),
+                ('range_start', models.DateField()),
+                ('range_end', models.DateField()),
+                ('path', models.CharField(max_length=500)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['range_start'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='ingredientpricehistory',
+            name='date',
+            field=models.DateField(blank=True, default=django.utils.timezone.now),
+        ),
+        migrations.RunSQL(PARTITION_SQL, UNPARTITION_SQL),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.6 on 2026-10-19 05:19
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pastry_app', '0008_partition_ingredientpricehistory'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='category',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['category_name'], name='idx_category_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['ingredient_name'], name='idx_ingredient_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='label',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['label_name'], name='idx_label_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='pan',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['pan_name'], name='idx_pan_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='store',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['store_name'], name='idx_store_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='store',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['city'], name='idx_store_city_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='store',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['zip_code'], name='idx_store_zip_code_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.6 on 2026-10-19 05:23
+
+from django.conf import settings
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_search_documents(apps, schema_editor):
+    """ Indexe les entités existantes (les suivantes le sont par signaux). """
+    from pastry_app.utils import rebuild_search_documents
+    models_map = {"recipes": "Recipe", "ingredients": "Ingredient", "categories": "Category", "labels": "Label",
+                  "pans": "Pan", "stores": "Store"}
+    rebuild_search_documents(models={e: apps.get_model("pastry_app", m) for e, m in models_map.items()},
+                             document_model=apps.get_model("pastry_app", "SearchDocument"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('pastry_app', '0009_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_type', models.CharField(choices=[('recipes', 'recipes'), ('ingredients', 'ingredients'), ('categories', 'categories'), ('labels', 'labels'), ('pans', 'pans'), ('stores', 'stores')], max_length=20)),
+                ('entity_id', models.PositiveBigIntegerField()),
+                ('guest_id', models.CharField(blank=True, max_length=64, null=True)),
+                ('visibility', models.CharField(default='public', max_length=10)),
+                ('is_default', models.BooleanField(default=False)),
+                ('title', models.CharField(max_length=255)),
+                ('subtitle', models.CharField(blank=True, default='', max_length=255)),
+                ('text', models.TextField()),
+                ('weight', models.FloatField(default=1.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['text'], name='idx_search_document_trgm', opclasses=['gin_trgm_ops']), models.Index(fields=['guest_id'], name='idx_search_document_guest')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('entity_type', 'entity_id'), name='unique_search_document'),
+        ),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.6 on 2026-10-19 05:42
+
+from django.contrib.postgres.operations import UnaccentExtension
+from django.db import migrations, models
+import pastry_app.models
+
+# unaccent() n'est que STABLE (dictionnaire résolu via search_path) : on l'enveloppe dans une
+# fonction IMMUTABLE à dictionnaire explicite, seule forme acceptée dans un index fonctionnel.
+# Noms qualifiés par le schéma : CREATE INDEX s'exécute avec un search_path restreint.
+NORMALIZE_SQL = r"""
+CREATE OR REPLACE FUNCTION immutable_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+
+CREATE OR REPLACE FUNCTION search_normalize(text) RETURNS text
+    LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+    AS $$ SELECT regexp_replace(btrim(lower(public.immutable_unaccent($1))), '\s+', ' ', 'g') $$;
+"""
+
+DROP_NORMALIZE_SQL = """
+DROP FUNCTION IF EXISTS search_normalize(text);
+DROP FUNCTION IF EXISTS immutable_unaccent(text);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pastry_app', '0010_search_document'),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        migrations.RunSQL(NORMALIZE_SQL, DROP_NORMALIZE_SQL),
+        # Le texte indexé de l'omnibox passe lui aussi sans accents (cf. utils._search_document_values)
+        migrations.RunSQL("UPDATE pastry_app_searchdocument SET text = search_normalize(text);", migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(pastry_app.models.SearchNormalize('category_name'), name='idx_category_name_norm'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(pastry_app.models.SearchNormalize('ingredient_name'), name='idx_ingredient_name_norm'),
+        ),
+        migrations.AddIndex(
+            model_name='label',
+            index=models.Index(pastry_app.models.SearchNormalize('label_name'), name='idx_label_name_norm'),
+        ),
+        migrations.AddIndex(
+            model_name='pan',
+            index=models.Index(pastry_app.models.SearchNormalize('pan_name'), name='idx_pan_name_norm'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(pastry_app.models.SearchNormalize('recipe_name'), pastry_app.models.SearchNormalize('chef_name'), name='idx_recipe_name_chef_norm'),
+        ),
+        migrations.AddIndex(
+            model_name='store',
+            index=models.Index(pastry_app.models.SearchNormalize('store_name'), pastry_app.models.SearchNormalize('city'), name='idx_store_name_city_norm'),
+        ),
+    ]
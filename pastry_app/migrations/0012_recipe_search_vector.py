@@ -0,0 +1,30 @@
+# Generated by Django 4.2.6 on 2026-10-19 05:48
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def populate_recipe_search_vectors(apps, schema_editor):
+    """ Calcule le tsvector des recettes existantes (les suivantes le sont par signaux). """
+    from pastry_app.utils import refresh_recipe_search_vectors
+    refresh_recipe_search_vectors(apps=apps)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pastry_app', '0011_normalized_name_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='idx_recipe_search_vector'),
+        ),
+        migrations.RunPython(populate_recipe_search_vectors, migrations.RunPython.noop),
+    ]
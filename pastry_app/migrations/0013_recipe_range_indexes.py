@@ -0,0 +1,37 @@
+# Generated by Django 4.2.6 on 2026-10-19 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pastry_app', '0012_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pan',
+            index=models.Index(fields=['volume_cm3_cache'], name='idx_pan_volume'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['servings_min'], name='idx_recipe_servings_min'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['servings_max'], name='idx_recipe_servings_max'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['total_recipe_quantity'], name='idx_recipe_total_quantity'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['created_at'], name='idx_recipe_created_at'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['updated_at'], name='idx_recipe_updated_at'),
+        ),
+    ]
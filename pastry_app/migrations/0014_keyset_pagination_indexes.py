@@ -0,0 +1,29 @@
+# Generated by Django 4.2.6 on 2026-10-19 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pastry_app', '0013_recipe_range_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='idx_recipe_updated_at',
+        ),
+        migrations.AddIndex(
+            model_name='ingredientpricehistory',
+            index=models.Index(fields=['date', 'id'], name='iph_date_id'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['updated_at', 'id'], name='idx_recipe_updated_id'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['recipe_name', 'id'], name='idx_recipe_name_id'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.6 on 2026-10-19 06:15
+
+from django.db import migrations, models
+
+
+def populate_recipe_flags(apps, schema_editor):
+    """ Calcule les indicateurs dénormalisés des recettes existantes (les suivants le sont par signaux). """
+    from pastry_app.utils import refresh_recipe_flags
+    refresh_recipe_flags(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pastry_app', '0014_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='has_steps',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='has_sub_recipes',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='is_preparation',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='is_variant',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(populate_recipe_flags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.6 on 2026-10-19 06:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pastry_app', '0015_recipe_flags'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('visibility', 'public'), ('is_default', True), _connector='OR'), fields=['id'], name='idx_recipe_shared'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(models.Q(('visibility', 'public'), _negated=True), ('is_default', False)), fields=['user'], name='idx_recipe_user_private'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(models.Q(('visibility', 'public'), _negated=True), ('is_default', False)), fields=['guest_id'], name='idx_recipe_guest_private'),
+        ),
+        migrations.AddIndex(
+            model_name='userrecipevisibility',
+            index=models.Index(condition=models.Q(('visible', False)), fields=['user', 'recipe'], name='urv_user_hidden'),
+        ),
+        migrations.AddIndex(
+            model_name='userrecipevisibility',
+            index=models.Index(condition=models.Q(('visible', False)), fields=['guest_id', 'recipe'], name='urv_guest_hidden'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.6 on 2026-10-19 07:20
+
+from django.db import migrations, models
+
+
+def seed_generations(apps, schema_editor):
+    """ Une génération par table de l'app : la première lecture n'a rien à créer. """
+    import uuid
+    TableGeneration = apps.get_model("pastry_app", "TableGeneration")
+    TableGeneration.objects.bulk_create(
+        [TableGeneration(table_name=model._meta.label_lower, token=uuid.uuid4().hex)
+         for model in apps.get_app_config("pastry_app").get_models()],
+        ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pastry_app', '0016_visibility_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableGeneration',
+            fields=[
+                ('table_name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('token', models.CharField(max_length=32)),
+            ],
+        ),
+        migrations.RunPython(seed_generations, migrations.RunPython.noop),
+    ]
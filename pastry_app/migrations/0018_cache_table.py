@@ -0,0 +1,20 @@
+# Table du cache partagé (DatabaseCache, cf. settings.CACHES) : créée au migrate plutôt qu'à la main.
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    # Sans effet si le cache est Redis ou si la table existe déjà
+    call_command("createcachetable", database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pastry_app', '0017_table_generation'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.6 on 2026-10-19 07:37
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+def fill_ingredient_ids(apps, schema_editor):
+    """ Relit une fois les archives existantes pour en extraire les ingrédients présents. """
+    import csv
+    import gzip
+    import os
+    PriceHistoryArchive = apps.get_model("pastry_app", "PriceHistoryArchive")
+    for archive in PriceHistoryArchive.objects.all():
+        if not os.path.exists(archive.path):
+            continue
+        with gzip.open(archive.path, "rt", encoding="utf-8", newline="") as f:
+            archive.ingredient_ids = sorted({int(row["ingredient_id"]) for row in csv.DictReader(f)})
+        archive.save(update_fields=["ingredient_ids"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pastry_app', '0018_cache_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricehistoryarchive',
+            name='ingredient_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, size=None),
+        ),
+        migrations.RunPython(fill_ingredient_ids, migrations.RunPython.noop),
+    ]
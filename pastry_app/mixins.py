@@ -1,9 +1,119 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Q
 from django.urls import reverse, path
 from django.http import JsonResponse
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.response import Response
+from .utils import visible_ids, get_table_generations, make_etag, REFERENCE_LIST_CACHE_PREFIX
 
-class GuestUserRecipeMixin:
+class PrefetchPlanMixin:
+    """
+    Plan de chargement déclaratif par action, appliqué par les mixins user/guest après le filtrage de visibilité :
+        prefetch_plans = {
+            "<action>": {"select": {champ: lookup}, "prefetch": {champ: lookup | Prefetch | (lookups,)},
+                         "expand": {champ: lookup}, "defer": (colonnes,)},
+            "default": {...},   # actions non listées
+        }
+    `champ` = champ du sérialiseur servi par le lookup ("*" = toujours) : avec un rendu clairsemé (?fields=),
+    seuls les lookups des champs rendus sont appliqués ; `expand` ajoute un select_related pour les relations
+    développées (?expand=).
+    """
+    prefetch_plans = {}
+
+    def get_prefetch_plan(self):
+        plans = self.prefetch_plans
+        return plans.get(getattr(self, "action", None), plans.get("default", {}))
+
+    def apply_prefetch_plan(self, queryset, fields=None, expand=frozenset()):
+        plan = self.get_prefetch_plan()
+        wanted = lambda name: name == "*" or fields is None or name in fields
+        select = [lookup for name, lookup in plan.get("select", {}).items() if wanted(name)]
+        select += [lookup for name, lookup in plan.get("expand", {}).items() if name in expand]
+        prefetch = []
+        for name, lookups in plan.get("prefetch", {}).items():
+            if wanted(name):
+                prefetch += lookups if isinstance(lookups, (list, tuple)) else [lookups]
+        if select:  # select_related() sans argument suivrait toutes les FK
+            queryset = queryset.select_related(*select)
+        if plan.get("defer"):
+            queryset = queryset.defer(*plan["defer"])
+        return queryset.prefetch_related(*prefetch)
+
+class ConditionalGetMixin:
+    """
+    GET conditionnel (If-None-Match / If-Modified-Since) : validateurs calculés avant tout chargement lourd.
+    Usage dans une action : `not_modified = self.conditional_response(request, etag, last_modified)` ;
+    si non None, le renvoyer tel quel (304) ; sinon poser les validateurs sur la réponse (set_validators).
+    """
+    def conditional_response(self, request, etag, last_modified=None):
+        from django.utils.cache import get_conditional_response
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request._request, etag=etag, last_modified=timestamp)
+        return self.set_validators(response, etag, last_modified) if response is not None else None
+
+    @staticmethod
+    def set_validators(response, etag, last_modified=None):
+        from django.utils.http import http_date
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if last_modified:
+                response["Last-Modified"] = http_date(last_modified.timestamp())
+        return response
+
+class GenerationETagMixin(ConditionalGetMixin):
+    """
+    ETag fort des listes/détails de référence : générations des tables `etag_generation_models` (cf.
+    utils.get_table_generations) + chemin + portée propriétaire + paramètres de requête triés.
+    Le 304 est décidé sur une seule requête (générations, cf. TableGeneration), sans charger de données.
+    - generation_shared_scope : contenu identique pour tous les appelants (catégories, labels) -> portée commune.
+    - cache_generation_lists : la liste sérialisée est servie depuis le cache tant que les générations tiennent
+      (clé = état ci-dessus ; une écriture bumpe la génération, l'ancienne entrée n'est plus jamais lue).
+    """
+    etag_generation_models = ()
+    generation_shared_scope = False
+    cache_generation_lists = False
+
+    def get_owner_scope(self, request):
+        """ Ce qui fait varier le contenu selon l'appelant : user, guest (header) et guest de session. """
+        if self.generation_shared_scope:
+            return "*"
+        user = request.user.pk if request.user.is_authenticated else None
+        guest_id = request.headers.get("X-Guest-Id") or request.headers.get("X-GUEST-ID")
+        session = getattr(request, "session", None)
+        session_guest = session.get("guest_id") if session is not None else None
+        return (user, guest_id, session_guest)
+
+    def get_generation_etag(self, request):
+        params = sorted((key, value) for key, values in request.query_params.lists() for value in values)
+        return make_etag(*get_table_generations(*self.etag_generation_models), request.path,
+                         self.get_owner_scope(request), params)
+
+    def _conditional(self, handler, request, *args, **kwargs):
+        etag = self.get_generation_etag(request)  # lu avant les données : au pire un ETag plus ancien que le contenu
+        return self.conditional_response(request, etag) or self.set_validators(handler(request, *args, **kwargs), etag)
+
+    def list(self, request, *args, **kwargs):
+        if not self.cache_generation_lists:
+            return self._conditional(super().list, request, *args, **kwargs)
+        etag = self.get_generation_etag(request)
+        not_modified = self.conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        digest = etag.strip('"')
+        key = f"{REFERENCE_LIST_CACHE_PREFIX}:{self.queryset.model._meta.label_lower}:{digest}"
+        data = cache.get(key)  # liste déjà sérialisée pour cet état : ni requête de données ni sérialisation
+        if data is not None:
+            return self.set_validators(Response(data), etag)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.REFERENCE_LIST_CACHE_TTL)
+        return self.set_validators(response, etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(super().retrieve, request, *args, **kwargs)
+
+class GuestUserRecipeMixin(PrefetchPlanMixin):
     """
     Mixin pour factoriser la gestion des recettes/ingrédients/moules/magasins multi-utilisateurs (user ou invité/guest_id).
     - Permet à un utilisateur connecté d'accéder à ses propres éléments + publiques + "de base".
@@ -21,17 +131,18 @@ class GuestUserRecipeMixin:
         )
 
     def get_queryset(self):
+        """
+        Publiques + de base + éléments privés de l'utilisateur (ou de l'invité identifié par guest_id).
+        Branches en UNION ALL (cf. utils.visible_ids) : pas d'OR global ni de DISTINCT.
+        Part du queryset de la vue (select_related/prefetch conservés) puis applique le plan de l'action.
+        """
+        qs = super().get_queryset()
         user = self.request.user
         if user.is_authenticated:
-            # Recettes de l'utilisateur + publiques + de base
-            return (self.queryset.model.objects.filter(Q(user=user) | Q(visibility="public") | Q(is_default=True)).distinct())
+            ids = visible_ids(qs.model, user=user)
         else:
-            guest_id = self.get_guest_id()
-            qs = self.queryset.model.objects.filter(Q(visibility="public") | Q(is_default=True))
-            if guest_id:
-                # Ajoute ses recettes privées (en tant qu'invité identifié par guest_id)
-                qs = qs | self.queryset.model.objects.filter(guest_id=guest_id, visibility="private")
-            return qs.distinct()
+            ids = visible_ids(qs.model, guest_id=self.get_guest_id())
+        return self.apply_prefetch_plan(qs.filter(pk__in=ids))
 
     def perform_create(self, serializer):
         """
@@ -71,7 +182,7 @@ class GuestUserRecipeMixin:
                 raise PermissionDenied("Un invité ne peut pas publier en public.")
         serializer.save()
 
-class GuestUserReferenceMixin:
+class GuestUserReferenceMixin(PrefetchPlanMixin):
     """
     Mixin ultra-minimaliste pour gestion user/guest sur les modèles sans visibility.
     """
@@ -89,7 +200,8 @@ class GuestUserReferenceMixin:
         qs = super().get_queryset()
         user = self.request.user if self.request.user.is_authenticated else None
         guest_id = self.get_guest_id()
-        return qs.filter(Q(user=user) | Q(guest_id=guest_id) | (Q(user__isnull=True) & Q(guest_id__isnull=True)))
+        qs = qs.filter(Q(user=user) | Q(guest_id=guest_id) | (Q(user__isnull=True) & Q(guest_id__isnull=True)))
+        return self.apply_prefetch_plan(qs)
 
     def perform_create(self, serializer):
         user = self.request.user if self.request.user.is_authenticated else None
@@ -132,6 +244,7 @@ class AdminSuggestMixin:
     change_list_template = "admin/with_endpoints_change_list.html"
     suggest_limit = 10  # max résultats
     suggest_route_suffix = "suggest"  # segment d’URL
+    suggest_prefix_entity = None  # entité de l'index de préfixes en mémoire (ex: "recipes") ; None = SQL seul
 
     # ---------- wiring UI ----------
     def get_suggest_url(self, request):
@@ -179,7 +292,7 @@ class AdminSuggestMixin:
         """
         Retourne JSON {"results": [...]}
         - Aggregue les suggestions issues de TOUS les champs de get_suggest_fields()
-        - Gère les préfixes Django: '^'→istartswith, '='→iexact, sinon→icontains
+        - Gère les préfixes Django: '^'→istartswith, '='→nexact (casse + accents), sinon→icontains
         - Déduplique, tronque à suggest_limit
         """
         q = (request.GET.get("q") or "").strip()
@@ -192,15 +305,23 @@ class AdminSuggestMixin:
             return JsonResponse({"results": []})
 
         limit = int(getattr(self, "suggest_limit", 10))
-        base_qs = self.get_suggest_queryset()
         out = []
 
+        # Préfixes publics depuis l'index mémoire : pas de requête SQL si la liste est déjà complète
+        if self.suggest_prefix_entity:
+            from .utils import get_prefix_index
+            out.extend(title for _, _, title in get_prefix_index().search(q, entities=[self.suggest_prefix_entity], limit=limit))
+            if len(out) >= limit:
+                return JsonResponse({"results": out[:limit]})
+
+        base_qs = self.get_suggest_queryset()
+
         for f in fields:
             raw = f.lstrip("^=@")
             if f.startswith("^"):
                 flt = {f"{raw}__istartswith": q}
             elif f.startswith("="):
-                flt = {f"{raw}__iexact": q}
+                flt = {f"{raw}__nexact": q}
             else:
                 flt = {f"{raw}__icontains": q}
 
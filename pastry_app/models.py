@@ -1,6 +1,6 @@
 from math import pi
 from typing import Optional, Dict
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
 from django.utils.timezone import now
 from django.core.exceptions import ValidationError
@@ -9,13 +9,40 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.indexes import GinIndex
-from django.db.models.signals import post_delete, m2m_changed
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.signals import post_delete, post_save, m2m_changed
 from django.dispatch import receiver
 from .text_utils import normalize_case
-from .constants import UNIT_CHOICES, SUBRECIPE_UNIT_CHOICES
+from .constants import UNIT_CHOICES, SUBRECIPE_UNIT_CHOICES, SEARCH_ENTITY_WEIGHTS
 
 User = get_user_model()
 
+class SearchNormalize(models.Func):
+    """
+    search_normalize(texte) : minuscules, sans accents (unaccent), espaces normalisés.
+    Fonction SQL IMMUTABLE (migration 0011) → utilisable dans des index fonctionnels.
+    """
+    function = "search_normalize"
+    output_field = models.TextField()
+
+@models.CharField.register_lookup
+@models.TextField.register_lookup
+class NormalizedExact(models.Lookup):
+    """
+    `champ__nexact=valeur` : égalité insensible à la casse et aux accents ("Crème" == "creme").
+    Les deux côtés passent par search_normalize → sonde de l'index fonctionnel search_normalize(champ).
+    Comme `iexact`, une valeur None se traduit en `IS NULL`.
+    """
+    lookup_name = "nexact"
+    can_use_none_as_rhs = True
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        if self.rhs is None:
+            return f"{lhs} IS NULL", lhs_params
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"search_normalize({lhs}) = search_normalize({rhs})", [*lhs_params, *rhs_params]
+
 class Pan(models.Model):
     PAN_TYPE_CHOICES = [
         ('ROUND', 'Rond'),
@@ -58,6 +85,9 @@ class Pan(models.Model):
     class Meta:
         ordering = ['pan_name', 'pan_type']
         constraints = [models.UniqueConstraint(fields=["pan_name"], name="unique_pan_name")]
+        indexes = [GinIndex(fields=["pan_name"], name="idx_pan_name_trgm", opclasses=["gin_trgm_ops"]),
+                   models.Index(SearchNormalize("pan_name"), name="idx_pan_name_norm"),
+                   models.Index(fields=["volume_cm3_cache"], name="idx_pan_volume")]  # filtre pan_volume des recettes
     
     def __str__(self):
         return f"{self.pan_name or 'Moule'} ({self.pan_type})"
@@ -177,6 +207,8 @@ class Category(models.Model):
 
     class Meta:
         verbose_name_plural = "categories"
+        indexes = [GinIndex(fields=["category_name"], name="idx_category_name_trgm", opclasses=["gin_trgm_ops"]),
+                   models.Index(SearchNormalize("category_name"), name="idx_category_name_norm")]
 
     def __str__(self):
         return f"{self.category_name} [{self.category_type}]"
@@ -189,7 +221,7 @@ class Category(models.Model):
         # Normalisation du `parent_category`
         if self.parent_category:
             normalized_parent = normalize_case(self.parent_category.category_name)
-            self.parent_category = Category.objects.filter(category_name__iexact=normalized_parent).first()
+            self.parent_category = Category.objects.filter(category_name__nexact=normalized_parent).first()
 
         # Normalisation du `category_type`
         if self.category_type:
@@ -215,7 +247,7 @@ class Category(models.Model):
                 raise ValidationError(f"Une catégorie '{this_type}' ne peut avoir pour parent qu'une catégorie '{this_type}' ou 'both', jamais '{parent_type}'.")
 
         # Vérifier qu'on ne met pas à jour un `category_name` existant
-        existing_category = Category.objects.exclude(id=self.id).filter(category_name__iexact=self.category_name).exists()
+        existing_category = Category.objects.exclude(id=self.id).filter(category_name__nexact=self.category_name).exists()
         if existing_category:
             raise ValidationError("Une catégorie avec ce nom existe déjà.")
         
@@ -252,6 +284,10 @@ class Label(models.Model):
     label_type = models.CharField(max_length=10, choices=LABEL_CHOICES, default='both')
     created_by = models.ForeignKey(User, on_delete=models.PROTECT, related_name="created_labels") # créé pour forcer la création par un admin
 
+    class Meta:
+        indexes = [GinIndex(fields=["label_name"], name="idx_label_name_trgm", opclasses=["gin_trgm_ops"]),
+                   models.Index(SearchNormalize("label_name"), name="idx_label_name_norm")]
+
     def __str__(self):
         return f"{self.label_name} [{self.label_type}]"
 
@@ -273,7 +309,7 @@ class Label(models.Model):
             raise ValidationError(f"`label_type` doit être l'une des valeurs suivantes: {', '.join(dict(self.LABEL_CHOICES).keys())}.")
 
         # Vérifier qu'on ne met pas à jour un `label_name` existant
-        existing_label = Label.objects.exclude(id=self.id).filter(label_name__iexact=self.label_name).exists()
+        existing_label = Label.objects.exclude(id=self.id).filter(label_name__nexact=self.label_name).exists()
         if existing_label:
             raise ValidationError("Un label avec ce nom existe déjà.")
 
@@ -368,6 +404,14 @@ class Recipe(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     # Compteur de version pour verrou optimiste
     version = models.PositiveIntegerField(default=1)  # Incrémenté à chaque modification persistante pour détecter les conflits de concurrence côté API.
+    # Recherche plein texte pondérée (nom, chef/contexte, ingrédients/sous-recettes, étapes), maintenue par signaux
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+    # Indicateurs dénormalisés pour filtres, tris et badges de liste (maintenus par signaux, cf. utils.recipe_flag_expressions)
+    ingredient_count = models.PositiveIntegerField(default=0, editable=False)
+    has_steps = models.BooleanField(default=False, editable=False)
+    has_sub_recipes = models.BooleanField(default=False, editable=False)
+    is_preparation = models.BooleanField(default=False, editable=False)  # utilisée comme sous-recette par au moins une recette
+    is_variant = models.BooleanField(default=False, editable=False)      # parent_recipe renseignée
 
     # Utilisateur
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="recipes", blank=True, null=True)  # null=True pour migrer en douceur
@@ -387,6 +431,19 @@ class Recipe(models.Model):
             GinIndex(fields=["chef_name"],   name="idx_chef_name_trgm",   opclasses=["gin_trgm_ops"]),
             GinIndex(fields=["context_name"],name="idx_context_name_trgm",opclasses=["gin_trgm_ops"]),
             GinIndex(fields=["tags"],        name="idx_recipe_tags_gin"),  # ArrayField
+            models.Index(SearchNormalize("recipe_name"), SearchNormalize("chef_name"), name="idx_recipe_name_chef_norm"),
+            GinIndex(fields=["search_vector"], name="idx_recipe_search_vector"),
+            # Filtres de plage (RecipeFilter)
+            models.Index(fields=["servings_min"], name="idx_recipe_servings_min"),
+            models.Index(fields=["servings_max"], name="idx_recipe_servings_max"),
+            models.Index(fields=["total_recipe_quantity"], name="idx_recipe_total_quantity"),
+            models.Index(fields=["created_at"], name="idx_recipe_created_at"),
+            models.Index(fields=["updated_at", "id"], name="idx_recipe_updated_id"),  # + pagination keyset
+            models.Index(fields=["recipe_name", "id"], name="idx_recipe_name_id"),     # pagination keyset
+            # Branches de visibilité (utils.visible_ids) : index partiels aux prédicats identiques
+            models.Index(fields=["id"], name="idx_recipe_shared", condition=models.Q(visibility="public") | models.Q(is_default=True)),
+            models.Index(fields=["user"], name="idx_recipe_user_private", condition=~models.Q(visibility="public") & models.Q(is_default=False)),
+            models.Index(fields=["guest_id"], name="idx_recipe_guest_private", condition=~models.Q(visibility="public") & models.Q(is_default=False)),
         ]
 
     def __str__(self):
@@ -677,7 +734,7 @@ class Recipe(models.Model):
         normalized_context = self.context_name or ""
         if normalized_context == "":
             doublon = Recipe.objects.exclude(pk=self.pk).filter(
-                recipe_name__iexact=self.recipe_name, chef_name__iexact=self.chef_name,
+                recipe_name__nexact=self.recipe_name, chef_name__nexact=self.chef_name,
             ).filter(models.Q(context_name__isnull=True) | models.Q(context_name="")).exists()
             if doublon:
                 raise ValidationError("Il existe déjà une recette de ce nom et chef sans contexte. Ajoutez un contexte pour différencier.")
@@ -837,6 +894,7 @@ class SubRecipe(models.Model):
             original = SubRecipe.objects.get(pk=self.pk)
             if original.recipe != self.recipe:
                 raise ValidationError("Recipe cannot be changed after creation.")
+            self._previous_sub_recipe_id = original.sub_recipe_id  # is_preparation de l'ancienne cible à recalculer
 
     def save(self, *args, **kwargs):
         """ Applique les validations avant la sauvegarde """
@@ -859,6 +917,8 @@ class Ingredient(models.Model):
 
     class Meta:
         ordering = ['ingredient_name']
+        indexes = [GinIndex(fields=["ingredient_name"], name="idx_ingredient_name_trgm", opclasses=["gin_trgm_ops"]),
+                   models.Index(SearchNormalize("ingredient_name"), name="idx_ingredient_name_norm")]
 
     def __str__(self):
         return self.ingredient_name
@@ -952,7 +1012,11 @@ class Store(models.Model):
 
     class Meta:
         constraints = [models.UniqueConstraint(fields=["store_name", "city", "zip_code", "address"], name="unique_store_per_location")]
-        indexes = [models.Index(fields=["store_name", "city", "zip_code"])]  # Ajout d'un index pour accélérer les requêtes sur (store_name, city, zip_code)
+        indexes = [models.Index(fields=["store_name", "city", "zip_code"]),  # Ajout d'un index pour accélérer les requêtes sur (store_name, city, zip_code)
+                   GinIndex(fields=["store_name"], name="idx_store_name_trgm", opclasses=["gin_trgm_ops"]),
+                   GinIndex(fields=["city"],       name="idx_store_city_trgm", opclasses=["gin_trgm_ops"]),
+                   GinIndex(fields=["zip_code"],   name="idx_store_zip_code_trgm", opclasses=["gin_trgm_ops"]),
+                   models.Index(SearchNormalize("store_name"), SearchNormalize("city"), name="idx_store_name_city_norm")]
 
     def __str__(self):
         return f"{self.store_name} ({self.city or 'Ville non renseignée'})"
@@ -980,7 +1044,8 @@ class Store(models.Model):
         self.address = normalize_case(self.address)
 
         # Vérifie l’unicité en base sur (store_name, city, zip_code, address)
-        if Store.objects.filter(store_name=self.store_name, city=self.city, zip_code=self.zip_code, address=self.address).exclude(id=self.id).exists():
+        if Store.objects.filter(store_name__nexact=self.store_name, city__nexact=self.city, zip_code=self.zip_code,
+                                address__nexact=self.address).exclude(id=self.id).exists():
             raise ValidationError("Ce magasin existe déjà.")
         
     def save(self, *args, **kwargs):
@@ -1002,6 +1067,11 @@ class IngredientPrice(models.Model):
     class Meta:
         constraints = [UniqueConstraint(
                 fields=["ingredient", "store", "brand_name", "quantity", "unit"], name="unique_ingredient_price")]
+        indexes = [
+            models.Index(fields=["ingredient", "date"], name="ip_ingredient_date"),  # Tendances / coût à date par période
+            # Balayage des promos expirées (commande expire_promotions)
+            models.Index(fields=["promotion_end_date"], name="ip_promo_end_date", condition=models.Q(is_promo=True)),
+        ]
 
     def __str__(self):
         """ Affichage clair du prix de l’ingrédient """
@@ -1145,12 +1215,16 @@ class IngredientPriceHistory(models.Model):
     price = models.FloatField(validators=[MinValueValidator(0)])
     is_promo = models.BooleanField(default=False)
     promotion_end_date = models.DateField(null=True, blank=True)  # Ajout de la date de fin de promo
-    date = models.DateField(null=True, blank=True, default=now)  # Date d'archivage
+    date = models.DateField(blank=True, default=now)  # Date d'archivage (clé de partitionnement, non nulle)
 
     class Meta:
+        # Table partitionnée par plage de dates (migration 0008) : clé primaire réelle (id, date)
+        # Un archivage par tuple et par date : permet de reconstituer l'évolution d'un même produit dans le temps
         constraints = [UniqueConstraint(
-                fields=["ingredient", "store", "brand_name", "quantity", "unit"],
+                fields=["ingredient", "store", "brand_name", "quantity", "unit", "date"],
                 name="unique_ingredient_price_history")]
+        indexes = [models.Index(fields=["ingredient", "date"], name="iph_ingredient_date"),  # Lookup "prix en vigueur à une date"
+                   models.Index(fields=["date", "id"], name="iph_date_id")]  # pagination keyset
         verbose_name_plural = "ingredient prices history"
 
     def __str__(self):
@@ -1242,6 +1316,22 @@ class IngredientPriceHistory(models.Model):
 
         super().save(*args, **kwargs)
         
+class PriceHistoryArchive(models.Model):
+    """ Partition annuelle d'IngredientPriceHistory sortie de la base vers un fichier compressé (commande archive_price_history). """
+    partition_name = models.CharField(max_length=100, unique=True)
+    range_start = models.DateField()  # borne incluse
+    range_end = models.DateField()    # borne exclue
+    path = models.CharField(max_length=500)  # fichier CSV gzip
+    row_count = models.PositiveIntegerField(default=0)
+    ingredient_ids = ArrayField(models.BigIntegerField(), default=list, blank=True)  # ingrédients présents dans le fichier
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["range_start"]
+
+    def __str__(self):
+        return f"{self.partition_name} [{self.range_start} → {self.range_end}[ ({self.row_count} lignes)"
+
 # Gestion des promos plus avancées (promo nationale + promo magasin par ex., promo conditionnelle 2+1 gratuit)
 # Ajout d'un modèle Promotion
 # class Promotion(models.Model):
@@ -1391,6 +1481,10 @@ class UserRecipeVisibility(models.Model):
 
     class Meta:
         unique_together = (("user", "guest_id", "recipe"),)
+        indexes = [  # NOT EXISTS des recettes masquées (utils.visible_ids)
+            models.Index(fields=["user", "recipe"], name="urv_user_hidden", condition=models.Q(visible=False)),
+            models.Index(fields=["guest_id", "recipe"], name="urv_guest_hidden", condition=models.Q(visible=False)),
+        ]
 
     def clean(self):
         # Au moins un des deux doit être présent
@@ -1414,3 +1508,129 @@ class UserRecipeVisibility(models.Model):
         self.full_clean()
         super().save(*args, **kwargs)
 
+
+class SearchDocument(models.Model):
+    """
+    Index de recherche dénormalisé de l'omnibox : une ligne par entité recherchable (recette, ingrédient,
+    catégorie, label, moule, magasin), avec sa portée de visibilité et son texte normalisé.
+    Maintenu par signaux (post_save/post_delete) ; reconstruction complète : commande rebuild_search_index.
+    """
+    ENTITY_CHOICES = [(e, e) for e in SEARCH_ENTITY_WEIGHTS]
+
+    entity_type = models.CharField(max_length=20, choices=ENTITY_CHOICES)
+    entity_id = models.PositiveBigIntegerField()
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    guest_id = models.CharField(max_length=64, null=True, blank=True)
+    visibility = models.CharField(max_length=10, default="public")
+    is_default = models.BooleanField(default=False)
+    title = models.CharField(max_length=255)
+    subtitle = models.CharField(max_length=255, blank=True, default="")
+    text = models.TextField()  # titre + champs secondaires, normalisés (normalize_case)
+    weight = models.FloatField(default=1.0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["entity_type", "entity_id"], name="unique_search_document")]
+        indexes = [
+            GinIndex(fields=["text"], name="idx_search_document_trgm", opclasses=["gin_trgm_ops"]),
+            models.Index(fields=["guest_id"], name="idx_search_document_guest"),
+        ]
+
+    def __str__(self):
+        return f"{self.entity_type}#{self.entity_id} {self.title}"
+
+class TableGeneration(models.Model):
+    """
+    Génération d'une table (jeton opaque renouvelé à chaque écriture) : ETags et listes de référence en cache.
+    En base plutôt qu'en cache : partagée par tous les workers, jamais évincée, et écrite dans la transaction
+    de l'écriture qu'elle signale (visible au commit, en même temps que les données).
+    """
+    table_name = models.CharField(max_length=100, primary_key=True)  # label du modèle ("pastry_app.category")
+    token = models.CharField(max_length=32)
+
+    def __str__(self):
+        return f"{self.table_name}@{self.token}"
+
+def _sync_search_document(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Met à jour (post_save) ou supprime (post_delete) le document de recherche de l'instance.
+    La génération n'est incrémentée que si le document est, ou était, public ou de base : une écriture privée
+    ne touche ni l'index de préfixes en mémoire ni le cache public de l'omnibox.
+    Incrémentée tout de suite puis à nouveau au commit (cf. _bump_table_generation) : des résultats publics
+    relus et mis en cache avant le commit restent sous une génération morte.
+    """
+    if raw:  # chargement de fixtures : reconstruction via rebuild_search_index
+        return
+    from .utils import index_search_document, unindex_search_document, bump_search_generation
+    if kwargs.get("signal") is post_delete:
+        shared = unindex_search_document(instance)
+    else:
+        shared = index_search_document(instance)
+    if shared:
+        bump_search_generation()  # invalide les index de préfixes en mémoire
+        transaction.on_commit(bump_search_generation)
+
+for _model in (Recipe, Ingredient, Category, Label, Pan, Store):
+    post_save.connect(_sync_search_document, sender=_model, dispatch_uid=f"search_document_save_{_model.__name__}")
+    post_delete.connect(_sync_search_document, sender=_model, dispatch_uid=f"search_document_delete_{_model.__name__}")
+del _model
+
+def _sync_recipe_derived_fields(sender, instance, raw=False, **kwargs):
+    """
+    Recalcule le tsvector et les indicateurs dénormalisés des recettes touchées, en un UPDATE :
+    - Recipe : elle-même (is_variant) + les recettes qui l'utilisent comme sous-recette (son nom y est indexé) ;
+    - RecipeStep / RecipeIngredient : la recette hôte ;
+    - SubRecipe : l'hôte (has_sub_recipes), la sous-recette et l'éventuelle ancienne cible (is_preparation) ;
+    - Ingredient : les recettes qui l'utilisent (renommage) ;
+    - suppression d'une Recipe : ses versions, détachées par SET_NULL sans signal (is_variant).
+    Les écritures d'étapes, d'ingrédients et de liens incrémentent aussi la version de la recette hôte.
+    """
+    if raw:
+        return
+    from .utils import refresh_recipe_derived_fields
+    if sender is Recipe and kwargs.get("signal") is post_delete:
+        ids = Recipe.objects.filter(is_variant=True, parent_recipe__isnull=True).values("pk")
+    elif sender is Recipe:
+        ids = [instance.pk, *SubRecipe.objects.filter(sub_recipe=instance).values_list("recipe_id", flat=True)]
+    elif sender is Ingredient:
+        ids = RecipeIngredient.objects.filter(ingredient=instance).values("recipe_id")
+    elif sender is SubRecipe:
+        ids = [instance.recipe_id, instance.sub_recipe_id, getattr(instance, "_previous_sub_recipe_id", None)]
+    else:
+        ids = [instance.recipe_id]
+    # Étapes / ingrédients / liens : contenu de la recette hôte modifié (version et updated_at, cf. ETag)
+    touched = [instance.recipe_id] if sender in (RecipeStep, RecipeIngredient, SubRecipe) else ()
+    refresh_recipe_derived_fields(ids, touched)
+
+for _model in (RecipeStep, RecipeIngredient, SubRecipe, Recipe):
+    post_save.connect(_sync_recipe_derived_fields, sender=_model, dispatch_uid=f"recipe_derived_fields_save_{_model.__name__}")
+    post_delete.connect(_sync_recipe_derived_fields, sender=_model, dispatch_uid=f"recipe_derived_fields_delete_{_model.__name__}")
+post_save.connect(_sync_recipe_derived_fields, sender=Ingredient, dispatch_uid="recipe_derived_fields_save_Ingredient")
+del _model
+
+def _invalidate_hidden_recipes(sender, instance, raw=False, **kwargs):
+    """ Oublie l'ensemble des recettes masquées du propriétaire ; à nouveau après commit (lecture concurrente pendant la transaction). """
+    from .utils import invalidate_hidden_recipe_ids
+    invalidate_hidden_recipe_ids(instance.user_id, instance.guest_id)
+    transaction.on_commit(lambda: invalidate_hidden_recipe_ids(instance.user_id, instance.guest_id))
+
+post_save.connect(_invalidate_hidden_recipes, sender=UserRecipeVisibility, dispatch_uid="hidden_recipes_save")
+post_delete.connect(_invalidate_hidden_recipes, sender=UserRecipeVisibility, dispatch_uid="hidden_recipes_delete")
+
+def _bump_table_generation(sender, instance=None, **kwargs):
+    """
+    Nouvelle génération de la table modifiée : invalide les ETags et listes en cache qui en dépendent.
+    Incrémentée tout de suite puis à nouveau au commit : une liste relue et mise en cache avant le commit
+    (lignes encore anciennes, ex: m2m_changed dans un sérialiseur atomique) reste sous une génération morte.
+    """
+    from .utils import bump_table_generation
+    model = Ingredient if sender in (Ingredient.categories.through, Ingredient.labels.through) else sender
+    bump_table_generation(model)
+    transaction.on_commit(lambda: bump_table_generation(model))
+
+for _model in (Ingredient, IngredientPrice, Category, Label, Pan, Store, IngredientUnitReference):
+    post_save.connect(_bump_table_generation, sender=_model, dispatch_uid=f"table_generation_save_{_model.__name__}")
+    post_delete.connect(_bump_table_generation, sender=_model, dispatch_uid=f"table_generation_delete_{_model.__name__}")
+for _through in (Ingredient.categories.through, Ingredient.labels.through):
+    m2m_changed.connect(_bump_table_generation, sender=_through, dispatch_uid=f"table_generation_m2m_{_through.__name__}")
+del _model, _through
@@ -2,11 +2,12 @@ from rest_framework import serializers
 from rest_framework.response import Response
 from rest_framework import status
 from django.db import IntegrityError
-from django.db.models import Max
+from django.db.models import Max, Q
 from django.utils.timezone import now
 from .models import *
 from .constants import UNIT_CHOICES, SUBRECIPE_UNIT_CHOICES
 from .text_utils import normalize_case
+from .utils import ingredient_price_summary_annotations, visible_ids
 
 
 class StoreSerializer(serializers.ModelSerializer):
@@ -94,7 +95,13 @@ class StoreSerializer(serializers.ModelSerializer):
 
         # Unicité en traitant "" comme None
         sn_key = normalize_case(store_name) if store_name not in ("", None) else None
-        qs = Store.objects.filter(store_name=sn_key, city=city_key, zip_code=zip_key, address=address_key)
+        def same(field, key, lookup="nexact"):
+            # "" et NULL sont stockés indifféremment : une clé vide doit matcher les deux
+            if key is None:
+                return Q(**{f"{field}__isnull": True}) | Q(**{field: ""})
+            return Q(**{f"{field}__{lookup}": key})
+        qs = Store.objects.filter(same("store_name", sn_key), same("city", city_key), same("zip_code", zip_key, "exact"),
+                                  same("address", address_key))
         if self.instance:
             qs = qs.exclude(id=self.instance.id)
         if qs.exists():
@@ -215,6 +222,19 @@ class IngredientPriceSerializer(serializers.ModelSerializer):
 
         return instance
 
+class IngredientPriceBulkImportSerializer(serializers.Serializer):
+    """
+    Entrée de l’import de prix en masse (/ingredient_prices/bulk-import/).
+
+      - rows: lignes brutes {ingredient, store_name, city, zip_code, address, brand_name, quantity, unit, price,
+              date, is_promo, promotion_end_date}, validées en mémoire par bulk_import_prices().
+      - skip_invalid: importe les lignes valides malgré les erreurs (défaut: tout ou rien).
+      - dry_run: calcule le rapport sans rien écrire.
+    """
+    rows = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=50000)
+    skip_invalid = serializers.BooleanField(required=False, default=False)
+    dry_run = serializers.BooleanField(required=False, default=False)
+
 class IngredientPriceHistorySerializer(serializers.ModelSerializer):
     """ Gère la validation et la sérialisation de l'historique des prix d'ingrédients. """
 
@@ -223,6 +243,37 @@ class IngredientPriceHistorySerializer(serializers.ModelSerializer):
         fields = ['id', 'ingredient', 'ingredient_name', 'brand_name', 'store', 'date', 'quantity', 'unit', 'price', "is_promo", "promotion_end_date"]
         read_only_fields = fields  # Empêche toute modification via l'API
     
+class PriceTrendQuerySerializer(serializers.Serializer):
+    """
+    Paramètres (query string) des tendances de prix.
+
+      - ingredient: identifiants séparés par des virgules (obligatoire, 50 max).
+      - bucket: week|month (défaut: month).
+      - by_store: 1 pour une série par magasin.
+      - start/end: période (défaut: les 12 derniers mois).
+    """
+    ingredient = serializers.CharField(required=True)
+    bucket = serializers.ChoiceField(choices=["week", "month"], required=False, default="month")
+    by_store = serializers.BooleanField(required=False, default=False)
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate_ingredient(self, value):
+        try:
+            ids = sorted({int(v) for v in value.split(",") if v.strip()})
+        except ValueError:
+            raise serializers.ValidationError("ingredient doit être une liste d'identifiants séparés par des virgules.")
+        if not ids:
+            raise serializers.ValidationError("Au moins un ingrédient est requis.")
+        if len(ids) > 50:
+            raise serializers.ValidationError("50 ingrédients maximum par requête.")
+        return ids
+
+    def validate(self, data):
+        if data.get("start") and data.get("end") and data["start"] > data["end"]:
+            raise serializers.ValidationError("La date de début doit être antérieure ou égale à la date de fin.")
+        return data
+
 class CategorySerializer(serializers.ModelSerializer):
     parent_category = serializers.SlugRelatedField(queryset=Category.objects.all(), slug_field="category_name", allow_null=True, required=False)
 
@@ -248,7 +299,7 @@ class CategorySerializer(serializers.ModelSerializer):
         request = self.context.get("request")
         
         # Vérifie si la catégorie existe déjà en base
-        category_exists = Category.objects.exclude(id=self.instance.id if self.instance else None).filter(category_name__iexact=value).exists()
+        category_exists = Category.objects.exclude(id=self.instance.id if self.instance else None).filter(category_name__nexact=value).exists()
         if category_exists:
             raise serializers.ValidationError("Une catégorie avec ce nom existe déjà.")
 
@@ -303,7 +354,7 @@ class CategorySerializer(serializers.ModelSerializer):
         # Empêche la modification de `category_name` vers un nom déjà existant.
         new_name = validated_data.get("category_name", instance.category_name)
         if normalize_case(new_name) != normalize_case(instance.category_name):
-            if Category.objects.exclude(id=instance.id).filter(category_name__iexact=new_name).exists():
+            if Category.objects.exclude(id=instance.id).filter(category_name__nexact=new_name).exists():
                 raise serializers.ValidationError({"category_name": "Une catégorie avec ce nom existe déjà."})
 
         return super().update(instance, validated_data)
@@ -329,7 +380,7 @@ class LabelSerializer(serializers.ModelSerializer):
         request = self.context.get("request")
         
         # Vérifie si la catégorie existe déjà en base
-        label_exists = Label.objects.exclude(id=self.instance.id if self.instance else None).filter(label_name__iexact=value).exists()
+        label_exists = Label.objects.exclude(id=self.instance.id if self.instance else None).filter(label_name__nexact=value).exists()
         if label_exists:
             raise serializers.ValidationError("Un label avec ce nom existe déjà.")
 
@@ -382,16 +433,50 @@ class IngredientSerializer(serializers.ModelSerializer):
     visibility = serializers.ChoiceField(choices=[('private', 'Privée'), ('public', 'Publique')], required=False, default='private')
     is_default = serializers.BooleanField(read_only=True)
 
+    # Résumé des prix (annoté par IngredientViewSet, cf. ingredient_price_summary_annotations)
+    best_price_per_g = serializers.SerializerMethodField()
+    price_store_count = serializers.SerializerMethodField()
+    price_last_updated = serializers.SerializerMethodField()
+
+    PRICE_SUMMARY_FIELDS = ("best_price_per_g", "price_store_count", "price_last_updated")
+
     class Meta:
         model = Ingredient
-        fields = ['id', 'ingredient_name', 'categories', 'labels', 'prices', "user", "guest_id", "visibility", "is_default"]
+        fields = ['id', 'ingredient_name', 'categories', 'labels', 'prices', "best_price_per_g", "price_store_count",
+                  "price_last_updated", "user", "guest_id", "visibility", "is_default"]
+
+    def get_fields(self):
+        """ Les prix détaillés ne sont sérialisés que si le contexte le demande (détail, ou liste avec ?include_prices=true). """
+        fields = super().get_fields()
+        if not self.context.get("include_prices", True):
+            fields.pop("prices", None)
+        return fields
+
+    def _price_summary(self, obj):
+        """ Résumé annoté sur l'instance ; sinon (réponse de création/mise à jour) calculé par une requête dédiée. """
+        if not all(hasattr(obj, f) for f in self.PRICE_SUMMARY_FIELDS):
+            summary = Ingredient.objects.filter(pk=obj.pk).annotate(**ingredient_price_summary_annotations())
+            values = summary.values(*self.PRICE_SUMMARY_FIELDS).first() or dict.fromkeys(self.PRICE_SUMMARY_FIELDS)
+            for field, value in values.items():
+                setattr(obj, field, value)
+        return obj
+
+    def get_best_price_per_g(self, obj):
+        value = self._price_summary(obj).best_price_per_g
+        return round(value, 6) if value is not None else None
+
+    def get_price_store_count(self, obj):
+        return self._price_summary(obj).price_store_count or 0
+
+    def get_price_last_updated(self, obj):
+        return self._price_summary(obj).price_last_updated
     
     def validate_ingredient_name(self, value):
         """ Vérifie que l'ingrédient n'existe pas déjà (insensible à la casse), sauf s'il s'agit de la mise à jour du même ingrédient. """
         value = normalize_case(value)  # Normalisation : minuscule + suppression espaces inutiles
 
         ingredient_id = self.instance.id if self.instance else None  # Exclure l'ID courant en cas de mise à jour
-        if Ingredient.objects.exclude(id=ingredient_id).filter(ingredient_name__iexact=value).exists():
+        if Ingredient.objects.exclude(id=ingredient_id).filter(ingredient_name__nexact=value).exists():
             raise serializers.ValidationError("Un ingrédient avec ce nom existe déjà.")
         return value
 
@@ -656,7 +741,41 @@ class SubRecipeSerializer(serializers.ModelSerializer):
 
         return data
 
-class RecipeSerializer(serializers.ModelSerializer):
+class NamedRefSerializer(serializers.Serializer):
+    """ Référence compacte {id, name} d'une relation développée via ?expand= (name lu dans `name_source`). """
+    def __init__(self, *args, name_source, **kwargs):
+        self.name_source = name_source
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        return {"id": serializers.IntegerField(read_only=True),
+                "name": serializers.CharField(source=self.name_source, read_only=True)}
+
+class SparseFieldsetMixin:
+    """
+    Rendu clairsemé piloté par le contexte (cf. utils.parse_sparse_fieldset) :
+    - context["fields"] : champs à rendre (None = tous) ;
+    - context["expand"] : relations remplacées par leur forme développée (`expandable_fields`).
+    Sans ces clés (écritures, autres actions), le sérialiseur est inchangé.
+    """
+    expandable_fields = {
+        "pan": lambda: NamedRefSerializer(name_source="pan_name", read_only=True),
+        "categories": lambda: NamedRefSerializer(name_source="category_name", many=True, read_only=True),
+        "labels": lambda: NamedRefSerializer(name_source="label_name", many=True, read_only=True),
+        "parent_recipe": lambda: NamedRefSerializer(name_source="recipe_name", read_only=True),
+    }
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for name in self.context.get("expand") or ():
+            if name in fields:
+                fields[name] = self.expandable_fields[name]()
+        only = self.context.get("fields")
+        if only is not None:
+            fields = {name: field for name, field in fields.items() if name in only}
+        return fields
+
+class RecipeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # Champs simples
     recipe_name = serializers.CharField()
     chef_name = serializers.CharField()
@@ -808,7 +927,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         recipe_id = self.instance.id if self.instance else None
 
         # Si une autre recette a les mêmes valeurs → erreur
-        if Recipe.objects.exclude(id=recipe_id).filter(recipe_name__iexact=name, chef_name__iexact=chef, context_name__iexact=context).exists():
+        if Recipe.objects.exclude(id=recipe_id).filter(recipe_name__nexact=name, chef_name__nexact=chef, context_name__nexact=context).exists():
             raise serializers.ValidationError("Une recette avec ce nom, ce chef et ce contexte existe déjà.")
         
         # 5. Présence d'ingrédients/étapes/sous-recettes (sauf adapt_recipe)
@@ -983,12 +1102,12 @@ class RecipeFullSerializer(serializers.Serializer):
     flat_ingredients = serializers.ListField(child=serializers.DictField())
     flat_steps = serializers.ListField(child=serializers.DictField())
 
-class RecipeListSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Liste/recherche des recettes.
     - Payload compact pour la page de résultats.
     - Pas d’ingrédients/étapes/sous-recettes.
-    - Inclut un résumé portions (servings_avg) et les IDs des M2M.
+    - Inclut un résumé portions (servings_avg), les IDs des M2M et les indicateurs dénormalisés (badges).
     """
     servings_avg = serializers.SerializerMethodField()
     pan = serializers.PrimaryKeyRelatedField(read_only=True)
@@ -1001,11 +1120,31 @@ class RecipeListSerializer(serializers.ModelSerializer):
             "id", "recipe_name", "chef_name", "context_name", "recipe_type",
             "servings_min", "servings_max", "servings_avg", "pan",
             "categories", "labels", "tags", "updated_at",
+            "ingredient_count", "has_steps", "has_sub_recipes", "is_preparation", "is_variant",
         ]
 
     def get_servings_avg(self, obj):
         return obj.servings_avg
 
+class RecipeLegoCandidateSerializer(RecipeListSerializer):
+    """
+    Candidat LEGO classé (cf. utils.rank_lego_candidates) : payload de liste + adéquation au besoin de l'hôte.
+    - scale_multiplier : multiplicateur à appliquer pour atteindre la cible (None si non scalable ou sans cible).
+    - is_host_variant : variante déjà possédée par l'hôte.
+    """
+    scale_multiplier = serializers.SerializerMethodField()
+    is_host_variant = serializers.SerializerMethodField()
+
+    class Meta(RecipeListSerializer.Meta):
+        fields = RecipeListSerializer.Meta.fields + ["total_recipe_quantity", "scale_multiplier", "is_host_variant"]
+
+    def get_scale_multiplier(self, obj):
+        m = getattr(obj, "scale_multiplier", None)
+        return round(m, 4) if m is not None else None
+
+    def get_is_host_variant(self, obj):
+        return bool(getattr(obj, "is_host_variant", False))
+
 class PanSerializer(serializers.ModelSerializer):
     pan_name = serializers.CharField(required=False, allow_blank=True, allow_null=True)
     pan_brand = serializers.CharField(required=False, allow_blank=True, allow_null=True)
@@ -1041,7 +1180,7 @@ class PanSerializer(serializers.ModelSerializer):
     def validate_pan_name(self, value):
         value = normalize_case(value)
         pan_id = self.instance.id if self.instance else None
-        if Pan.objects.exclude(id=pan_id).filter(pan_name__iexact=value).exists():
+        if Pan.objects.exclude(id=pan_id).filter(pan_name__nexact=value).exists():
             raise serializers.ValidationError("Un moule avec ce nom existe déjà.")
         
         if value and len(value) < 2:
@@ -1231,6 +1370,65 @@ class ConvertUnitsSerializer(serializers.Serializer):
         return out
 
 
+class ShoppingBasketItemSerializer(serializers.Serializer):
+    ingredient_id = serializers.IntegerField(required=True)
+    quantity = serializers.FloatField(required=True, min_value=0)
+    unit = serializers.ChoiceField(choices=[u for u, _ in UNIT_CHOICES if u != "qs"], required=False, default="g")
+
+class ShoppingBasketOptimizerSerializer(serializers.Serializer):
+    """
+    Entrée de l’optimiseur de panier multi-magasins.
+
+    Entrée:
+      - items: liste de courses consolidée [{ingredient_id, quantity, unit}] (unit par défaut "g").
+      - max_stores: nombre max de magasins visités (optionnel, ≥ 1).
+      - store_ids: restreint la recherche à ces magasins (optionnel, parmi les magasins visibles).
+    """
+    items = ShoppingBasketItemSerializer(many=True, allow_empty=False)
+    max_stores = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+    store_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+
+    def validate_items(self, value):
+        """ Seuls les ingrédients visibles par l'appelant (publics, de base, ou à lui) : les autres sont introuvables. """
+        request = self.context.get("request")
+        user = request.user if request and request.user.is_authenticated else None
+        guest_id = (request.headers.get("X-Guest-Id") or request.headers.get("X-GUEST-ID")) if request else None
+        ids = {it["ingredient_id"] for it in value}
+        visible = visible_ids(Ingredient, user=user, guest_id=guest_id)
+        existing = set(Ingredient.objects.filter(id__in=ids, pk__in=visible).values_list("id", flat=True))
+        unknown = sorted(ids - existing)
+        if unknown:
+            raise serializers.ValidationError(f"Ingrédient(s) introuvable(s) : {unknown}")
+        return value
+
+
+class RecipeCostQuerySerializer(serializers.Serializer):
+    """
+    Paramètres (query string) du coût de recette à date.
+
+      - as_of: date du coût ponctuel (défaut: aujourd'hui).
+      - start/end: bornes de la série de coûts (défaut: les 12 derniers mois).
+      - granularity: pas de la série (day|week|month, défaut: week).
+      - store_ids: restreint les prix à ces magasins ("1,2,3").
+    """
+    as_of = serializers.DateField(required=False)
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    granularity = serializers.ChoiceField(choices=["day", "week", "month"], required=False, default="week")
+    store_ids = serializers.CharField(required=False, allow_blank=True)
+
+    def validate_store_ids(self, value):
+        try:
+            return [int(v) for v in value.split(",") if v.strip()]
+        except ValueError:
+            raise serializers.ValidationError("store_ids doit être une liste d'identifiants séparés par des virgules.")
+
+    def validate(self, data):
+        if data.get("start") and data.get("end") and data["start"] > data["end"]:
+            raise serializers.ValidationError("La date de début doit être antérieure ou égale à la date de fin.")
+        return data
+
+
 
 class RecipeOmniSerializer(serializers.ModelSerializer):
     """Résultat léger pour la recherche: id, titre, sous-titre, score optionnel."""
@@ -1296,3 +1494,16 @@ class StoreOmniSerializer(serializers.ModelSerializer):
     def get_subtitle(self, obj):
         parts = [getattr(obj, "city", None), getattr(obj, "zip_code", None)]
         return " ".join([p for p in parts if p])
+
+class SearchDocumentOmniSerializer(serializers.Serializer):
+    """Résultat omnibox issu de l'index unifié : même forme que les sérialiseurs Omni par entité (+ type en mode mixte)."""
+    WITH_SUBTITLE = {"recipes", "stores"}
+
+    def to_representation(self, doc):
+        data = {"id": doc.entity_id, "title": doc.title}
+        if doc.entity_type in self.WITH_SUBTITLE:
+            data["subtitle"] = doc.subtitle
+        data["score"] = doc.score
+        if self.context.get("with_type"):
+            data["type"] = doc.entity_type
+        return data
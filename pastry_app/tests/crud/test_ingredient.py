@@ -1,7 +1,7 @@
 import pytest, json
 from django.contrib.auth import get_user_model
 from rest_framework import status
-from pastry_app.models import Ingredient, Category, Label, Recipe, RecipeIngredient
+from pastry_app.models import Ingredient, Category, Label, Recipe, RecipeIngredient, Store, IngredientPrice
 from pastry_app.tests.utils import normalize_case
 from pastry_app.tests.base_api_test import api_client, base_url
 
@@ -15,6 +15,8 @@ from pastry_app.tests.base_api_test import api_client, base_url
 # Lecture
 # - test_get_ingredient
 # - test_get_nonexistent_ingredient
+# - test_list_ingredients_price_summary
+# - test_list_ingredients_query_count_independent_of_prices
 
 # Mise à jour
 # - test_update_ingredient_name
@@ -185,4 +187,41 @@ def test_delete_nonexistent_ingredient(api_client, base_url):
     """Vérifie qu’on obtient une erreur 404 quand on essaie de supprimer un ingrédient qui n’existe pas."""
     url = base_url(model_name) + "9999/"
     response = api_client.delete(url)
-    assert response.status_code == status.HTTP_404_NOT_FOUND
\ No newline at end of file
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+@pytest.fixture
+def priced_ingredient(setup_ingredient):
+    """Chocolat vendu dans deux magasins, dont un format non convertible en grammes."""
+    s1 = Store.objects.create(store_name="Carrefour", city="Paris", visibility="public")
+    s2 = Store.objects.create(store_name="Lidl", city="Paris", visibility="public")
+    IngredientPrice.objects.create(ingredient=setup_ingredient, store=s1, brand_name="Nestle", quantity=200, unit="g", price=3.0, date="2025-01-10")
+    IngredientPrice.objects.create(ingredient=setup_ingredient, store=s2, brand_name="Lindt", quantity=1, unit="kg", price=12.0, date="2025-03-01")
+    IngredientPrice.objects.create(ingredient=setup_ingredient, store=s2, brand_name="Lindt", quantity=1, unit="cup", price=0.10, date="2025-02-01")
+    return setup_ingredient
+
+def test_list_ingredients_price_summary(api_client, base_url, priced_ingredient):
+    """La liste renvoie le résumé des prix ; le détail et ?include_prices=true renvoient les prix complets"""
+    response = api_client.get(base_url(model_name))
+    assert response.status_code == status.HTTP_200_OK
+    item = next(i for i in response.json() if i["id"] == priced_ingredient.id)
+    assert "prices" not in item
+    assert item["best_price_per_g"] == 0.012
+    assert item["price_store_count"] == 2
+    assert item["price_last_updated"] == "2025-03-01"
+
+    response = api_client.get(base_url(model_name), {"include_prices": "true"})
+    item = next(i for i in response.json() if i["id"] == priced_ingredient.id)
+    assert len(item["prices"]) == 3
+
+    response = api_client.get(base_url(model_name) + f"{priced_ingredient.id}/")
+    assert len(response.json()["prices"]) == 3 and response.json()["price_store_count"] == 2
+
+def test_list_ingredients_query_count_independent_of_prices(api_client, base_url, priced_ingredient, django_assert_max_num_queries):
+    """Le nombre de requêtes de la liste ne dépend ni du nombre d'ingrédients ni du nombre de prix"""
+    store = Store.objects.get(store_name="carrefour")
+    for i in range(20):
+        ingredient = Ingredient.objects.create(ingredient_name=f"Farine {i}", visibility="public")
+        IngredientPrice.objects.create(ingredient=ingredient, store=store, quantity=1, unit="kg", price=1 + i)
+    with django_assert_max_num_queries(4):
+        response = api_client.get(base_url(model_name))
+    assert response.status_code == status.HTTP_200_OK and len(response.json()) == 21
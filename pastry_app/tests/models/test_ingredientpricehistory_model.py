@@ -36,8 +36,8 @@ def test_create_ingredientpricehistory_db(ingredient_price_history):
 
 @pytest.mark.django_db
 def test_unique_ingredientpricehistory_db(ingredient_price_history):
-    """ Vérifie qu'on ne peut pas créer deux historiques identiques. """
-    expected_error = "Ingredient price history with this Ingredient, Store, Brand name, Quantity and Unit already exists."
+    """ Vérifie qu'on ne peut pas créer deux historiques identiques (même produit, même date). """
+    expected_error = "Ingredient price history with this Ingredient, Store, Brand name, Quantity, Unit and Date already exists."
     validate_unique_together(
         IngredientPriceHistory, expected_error,
         ingredient=ingredient_price_history.ingredient,
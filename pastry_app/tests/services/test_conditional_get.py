@@ -0,0 +1,118 @@
+# tests/services/test_conditional_get.py
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from pastry_app.tests.base_api_test import api_client, base_url
+from pastry_app.models import Recipe, RecipeStep, RecipeIngredient, SubRecipe, Ingredient, Category, Store
+from pastry_app.utils import bulk_import_prices
+
+pytestmark = pytest.mark.django_db
+
+URL = "/api/recipes/"
+
+User = get_user_model()
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+def make_recipe(name, **kw):
+    r = Recipe.objects.create(recipe_name=name, chef_name="chef", visibility="public", **kw)
+    RecipeStep.objects.create(recipe=r, step_number=1, instruction="mélanger")
+    return r
+
+def test_recipe_detail_304_before_any_loading(api_client, django_assert_num_queries):
+    recipe = make_recipe("flan")
+    first = api_client.get(f"{URL}{recipe.id}/")
+    etag = first["ETag"]
+    assert first.status_code == 200 and etag == f'"{recipe.id}-{first.data["version"]}"' and first["Last-Modified"]
+
+    with django_assert_num_queries(1):  # validateurs seulement
+        r = api_client.get(f"{URL}{recipe.id}/", HTTP_IF_NONE_MATCH=etag)
+    assert r.status_code == 304 and r["ETag"] == etag
+    assert api_client.get(f"{URL}{recipe.id}/", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]).status_code == 304
+
+    sparse = api_client.get(f"{URL}{recipe.id}/", {"fields": "id"}, HTTP_IF_NONE_MATCH=etag)
+    assert sparse.status_code == 200 and sparse["ETag"] != etag  # autre représentation, autre ETag
+
+def test_nested_writes_change_recipe_etag_and_if_match_accepts_it(api_client):
+    recipe = make_recipe("flan", guest_id="guest-1")
+    farine = Ingredient.objects.create(ingredient_name="farine")
+    RecipeIngredient.objects.create(recipe=recipe, ingredient=farine, quantity=200, unit="g")
+    api_client.credentials(HTTP_X_GUEST_ID="guest-1")
+    etag = api_client.get(f"{URL}{recipe.id}/")["ETag"]
+    RecipeStep.objects.create(recipe=recipe, step_number=2, instruction="cuire")
+
+    r = api_client.get(f"{URL}{recipe.id}/", HTTP_IF_NONE_MATCH=etag)
+    assert r.status_code == 200 and r["ETag"] != etag and len(r.data["steps"]) == 2
+
+    conflict = api_client.patch(f"{URL}{recipe.id}/", {"context_name": "maison"}, format="json", HTTP_IF_MATCH=etag)
+    assert conflict.status_code == 409
+    ok = api_client.patch(f"{URL}{recipe.id}/", {"context_name": "maison"}, format="json", HTTP_IF_MATCH=r["ETag"])
+    assert ok.status_code == 200
+
+def test_detail_etag_covers_parent_and_expanded_relations(api_client, django_assert_num_queries):
+    admin = User.objects.create_user(username="admin", password="testpass123", is_staff=True)
+    parent = make_recipe("flan parisien", guest_id="guest-1")
+    RecipeIngredient.objects.create(recipe=parent, ingredient=Ingredient.objects.create(ingredient_name="lait"), quantity=500, unit="g")
+    category = Category.objects.create(category_name="entremets", category_type="recipe", created_by=admin)
+    variant = make_recipe("flan vanille", parent_recipe=parent, recipe_type="VARIATION")
+    variant.categories.add(category)
+    url = f"{URL}{variant.id}/"
+
+    first = api_client.get(url)
+    assert first.data["parent_recipe_name"] == "flan parisien"
+    with django_assert_num_queries(1):  # validateurs de la recette et de sa parente, une requête
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=first["ETag"]).status_code == 304
+
+    renamed = api_client.patch(f"{URL}{parent.id}/", {"recipe_name": "flan pâtissier"}, format="json", HTTP_X_GUEST_ID="guest-1")
+    assert renamed.status_code == 200
+    r = api_client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+    assert r.status_code == 200 and r.data["parent_recipe_name"] == "flan pâtissier"
+
+    expanded = api_client.get(url, {"expand": "categories"})
+    assert expanded.data["categories"] == [{"id": category.id, "name": "entremets"}] and "Last-Modified" not in expanded
+    category.category_name = "gâteaux de voyage"
+    category.save()
+    r = api_client.get(url, {"expand": "categories"}, HTTP_IF_NONE_MATCH=expanded["ETag"])
+    assert r.status_code == 200 and r.data["categories"] == [{"id": category.id, "name": "gâteaux de voyage"}]
+    assert api_client.get(url, {"expand": "categories"}, HTTP_IF_NONE_MATCH=r["ETag"]).status_code == 304
+
+def test_full_etag_covers_sub_recipes(api_client, django_assert_num_queries):
+    creme = make_recipe("crème pâtissière")
+    tarte = make_recipe("tarte")
+    SubRecipe.objects.create(recipe=tarte, sub_recipe=creme, quantity=300, unit="g")
+    etag = api_client.get(f"{URL}{tarte.id}/full/")["ETag"]
+    with django_assert_num_queries(2):  # validateurs + arbre des versions
+        assert api_client.get(f"{URL}{tarte.id}/full/", HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    RecipeStep.objects.create(recipe=creme, step_number=2, instruction="refroidir")
+    r = api_client.get(f"{URL}{tarte.id}/full/", HTTP_IF_NONE_MATCH=etag)
+    assert r.status_code == 200 and r["ETag"] != etag
+    assert api_client.get(f"{URL}999999/full/").status_code == 404
+
+def test_reference_lists_use_table_generations(api_client, django_assert_num_queries):
+    Ingredient.objects.create(ingredient_name="farine", visibility="public")
+    Store.objects.create(store_name="carrefour", city="paris")
+    first = api_client.get("/api/ingredients/")
+    etag = first["ETag"]
+    with django_assert_num_queries(1):  # générations des tables seulement (TableGeneration), aucune donnée chargée
+        assert api_client.get("/api/ingredients/", HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    bulk_import_prices([{"ingredient": "farine", "store_name": "carrefour", "city": "paris", "quantity": "1",
+                         "unit": "kg", "price": "1.20", "date": "2025-01-01"}])  # écriture groupée, sans signal
+    r = api_client.get("/api/ingredients/", HTTP_IF_NONE_MATCH=etag)
+    assert r.status_code == 200 and r["ETag"] != etag
+
+    admin = User.objects.create_user(username="admin", password="testpass123", is_staff=True)
+    cat_etag = api_client.get("/api/categories/")["ETag"]
+    assert api_client.get("/api/categories/", HTTP_IF_NONE_MATCH=cat_etag).status_code == 304
+    Category.objects.create(category_name="tartes", category_type="recipe", created_by=admin)
+    assert api_client.get("/api/categories/", HTTP_IF_NONE_MATCH=cat_etag).status_code == 200
+
+def test_generation_tokens_never_repeat_after_loss(api_client):
+    from pastry_app.models import TableGeneration
+    etag = api_client.get("/api/categories/")["ETag"]
+    TableGeneration.objects.filter(table_name="pastry_app.category").delete()  # perte de la génération
+    r = api_client.get("/api/categories/", HTTP_IF_NONE_MATCH=etag)
+    assert r.status_code == 200 and r["ETag"] != etag  # jeton neuf : l'ancien ETag ne revalide jamais
@@ -0,0 +1,76 @@
+# tests/services/test_keyset_pagination.py
+import datetime
+import pytest
+from pastry_app.tests.base_api_test import api_client, base_url
+from pastry_app.models import Recipe, RecipeStep, Ingredient, IngredientPriceHistory
+
+pytestmark = pytest.mark.django_db
+
+D = datetime.date
+
+def make_recipe(name, chef="chef"):
+    r = Recipe.objects.create(recipe_name=name, chef_name=chef, visibility="public")
+    RecipeStep.objects.create(recipe=r, step_number=1, instruction="mélanger")
+    return r
+
+def walk(api_client, url, params):
+    """ Suit les liens `next` et renvoie la liste des pages (chaque page = liste d'items). """
+    pages, r = [], api_client.get(url, params)
+    while True:
+        assert r.status_code == 200, r.data
+        assert set(r.data) == {"next", "results"}  # ni count ni offset
+        pages.append(r.data["results"])
+        if not r.data["next"]:
+            return pages
+        r = api_client.get(r.data["next"])
+
+def test_recipe_cursor_walks_name_ordering_with_ties(api_client):
+    for chef in ("chef-a", "chef-b", "chef-c"):
+        make_recipe("tarte", chef=chef)  # même nom : départage par id
+    for name in ("brioche", "éclair", "flan"):
+        make_recipe(name)
+    pages = walk(api_client, "/api/recipes/", {"page_size": 2})
+    assert [len(p) for p in pages] == [2, 2, 2]
+    ids = [x["id"] for p in pages for x in p]
+    assert ids == list(Recipe.objects.order_by("recipe_name", "id").values_list("id", flat=True))
+
+def test_recipe_cursor_by_recent_updates(api_client):
+    recipes = [make_recipe(f"recette-{i}") for i in range(5)]
+    Recipe.objects.filter(pk=recipes[0].pk).update(updated_at=recipes[-1].updated_at + datetime.timedelta(seconds=1))
+    pages = walk(api_client, "/api/recipes/", {"page_size": 3, "ordering": "-updated_at"})
+    ids = [x["id"] for p in pages for x in p]
+    assert ids[0] == recipes[0].id and sorted(ids) == sorted(r.id for r in recipes)
+
+def test_ingredient_and_history_cursors(api_client):
+    for name in ("beurre", "farine", "lait", "sucre", "vanille"):
+        Ingredient.objects.create(ingredient_name=name, visibility="public")
+    pages = walk(api_client, "/api/ingredients/", {"page_size": 2})
+    assert [x["ingredient_name"] for p in pages for x in p] == ["beurre", "farine", "lait", "sucre", "vanille"]
+
+    farine = Ingredient.objects.get(ingredient_name="farine")
+    for month in range(1, 6):
+        IngredientPriceHistory.objects.create(ingredient=farine, quantity=1, unit="kg", price=month, date=D(2025, month, 1))
+    pages = walk(api_client, "/api/ingredient_prices_history/", {"page_size": 2})
+    assert [x["date"] for p in pages for x in p] == [f"2025-0{m}-01" for m in range(5, 0, -1)]
+
+def test_deep_page_costs_the_same_as_first(api_client, django_assert_max_num_queries):
+    for i in range(30):
+        Ingredient.objects.create(ingredient_name=f"ing-{i:02d}", visibility="public")
+    first = api_client.get("/api/ingredients/", {"page_size": 5})
+    next_url = first.data["next"]
+    for _ in range(4):
+        next_url = api_client.get(next_url).data["next"]
+    with django_assert_max_num_queries(4):  # page + prefetch M2M, aucun COUNT
+        r = api_client.get(next_url)
+    assert [x["ingredient_name"] for x in r.data["results"]] == [f"ing-{i:02d}" for i in range(25, 30)]
+
+def test_without_cursor_params_list_is_unchanged_and_bad_cursor_404(api_client):
+    make_recipe("flan")
+    assert isinstance(api_client.get("/api/recipes/").data, list)
+    assert api_client.get("/api/recipes/", {"cursor": "pas-un-curseur"}).status_code == 404
+
+def test_unsupported_ordering_is_rejected_not_replaced(api_client):
+    make_recipe("flan")
+    r = api_client.get("/api/recipes/", {"page_size": 2, "ordering": "chef_name"})
+    assert r.status_code == 400 and "chef_name" in r.data["error"]
+    assert api_client.get("/api/recipes/", {"ordering": "chef_name"}).status_code == 200  # sans curseur : inchangé
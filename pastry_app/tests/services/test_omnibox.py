@@ -1,8 +1,11 @@
 # tests/services/test_omnibox_api.py
+import hashlib
 import pytest
 from django.contrib.auth import get_user_model
 from pastry_app.tests.base_api_test import api_client, base_url
-from pastry_app.models import Recipe, Ingredient, Pan, Category, Label, Store, UserRecipeVisibility
+from django.core.cache import cache
+from django.core.management import call_command
+from pastry_app.models import Recipe, Ingredient, Pan, Category, Label, Store, UserRecipeVisibility, SearchDocument
 from pastry_app.text_utils import *
 
 pytestmark = pytest.mark.django_db
@@ -11,6 +14,11 @@ SEARCH_URL = "/api/search/"
 
 User = get_user_model()
 
+@pytest.fixture(autouse=True)
+def clear_search_cache():
+    """ SearchAPIView est mise en cache 30 s (cache_page) : isole les tests. """
+    cache.clear()
+
 @pytest.fixture
 def user():
     admin = User.objects.create_user(username="user1", password="testpass123")
@@ -138,3 +146,288 @@ def test_search_limit_is_per_entity_and_bounded(api_client):
     # limit max = 10 par entité
     assert len(r.data.get("ingredients", [])) <= 10
     # stores peut être vide si non match, mais la clé existe pas forcément; c’est OK
+
+def test_search_filters_candidates_by_trigram_threshold(api_client):
+    Ingredient.objects.create(ingredient_name="pomme", visibility="public")
+    Ingredient.objects.create(ingredient_name="compote de pomme", visibility="public")
+    Ingredient.objects.create(ingredient_name="beurre", visibility="public")
+
+    r = api_client.get(SEARCH_URL, {"q": "pomme", "entities": "ingredients", "limit": 10})
+    titles = [it["title"] for it in r.data["ingredients"]]
+    assert titles[0] == "pomme"
+    assert "compote de pomme" in titles  # mot contenu : opérateur <% (word_similarity)
+    assert "beurre" not in titles
+
+    r = api_client.get(SEARCH_URL, {"q": "po", "entities": "ingredients", "limit": 10})
+    titles = [it["title"] for it in r.data["ingredients"]]  # q court : préfixe
+    assert titles[0] == "pomme" and "beurre" not in titles
+
+@pytest.mark.parametrize("unified", [True, False])
+def test_search_modes_agree(api_client, settings, unified):
+    settings.SEARCH_UNIFIED_INDEX = unified
+    Ingredient.objects.create(ingredient_name="chocolat noir", visibility="public")
+    Ingredient.objects.create(ingredient_name="beurre", visibility="public")
+    Recipe.objects.create(recipe_name="Mousse au chocolat", chef_name="Alice", visibility="public")
+    r = api_client.get(SEARCH_URL, {"q": "chocolat", "entities": "recipes,ingredients", "limit": 5})
+    assert [it["title"] for it in r.data["ingredients"]] == ["chocolat noir"]
+    assert [it["subtitle"] for it in r.data["recipes"]] == ["alice"]
+
+def test_search_unified_results_are_mixed_and_follow_updates(api_client, user):
+    ing = Ingredient.objects.create(ingredient_name="vanille", visibility="public")
+    Recipe.objects.create(recipe_name="Crème vanille", chef_name="Alice", visibility="public")
+    Recipe.objects.create(recipe_name="Flan vanille", chef_name="Bob", visibility="private", user=user)
+
+    r = api_client.get(SEARCH_URL, {"q": "vanille", "entities": "recipes,ingredients"})
+    assert r.data["results"][0] == {"id": ing.id, "title": "vanille", "score": r.data["results"][0]["score"], "type": "ingredients"}
+    assert {it["type"] for it in r.data["results"]} == {"recipes", "ingredients"}
+    assert "flan vanille" not in [it["title"] for it in r.data["results"]]
+
+    api_client.force_authenticate(user=user)
+    r = api_client.get(SEARCH_URL, {"q": "vanille", "entities": "recipes"})
+    assert "flan vanille" in [it["title"] for it in r.data["recipes"]]
+
+    ing.ingredient_name = "vanille bourbon"
+    ing.save()
+    assert SearchDocument.objects.get(entity_type="ingredients", entity_id=ing.id).text == "vanille bourbon"
+    ing.delete()
+    assert not SearchDocument.objects.filter(entity_type="ingredients").exists()
+
+def test_rebuild_search_index_command(django_capture_on_commit_callbacks):
+    from pastry_app.utils import get_search_generation, suggest_names
+    assert suggest_names("ing") == []  # index de préfixes construit avant l'import
+    Ingredient.objects.bulk_create([Ingredient(ingredient_name=f"ing{i}", visibility="public") for i in range(5)])
+    assert not SearchDocument.objects.exists()  # bulk_create ne déclenche pas les signaux
+    assert suggest_names("ing") == []
+    before = get_search_generation()
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command("rebuild_search_index", "--entities", "ingredients")
+    assert SearchDocument.objects.filter(entity_type="ingredients").count() == 5
+    assert get_search_generation() != before  # index de préfixes et cache public reconstruits
+    assert len(suggest_names("ing")) == 5
+
+def test_search_candidates_use_trigram_index():
+    from django.db import connection
+    from pastry_app.views import _score_qs, _set_similarity_threshold
+
+    _set_similarity_threshold()
+    qs = _score_qs(Ingredient.objects.all(), "pomme", ["ingredient_name"]).order_by("-score")[:5]
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        sql, params = qs.query.sql_with_params()
+        cursor.execute("EXPLAIN " + sql, params)
+        plan = "\n".join(row[0] for row in cursor.fetchall())
+    assert "idx_ingredient_name_trgm" in plan
+
+def test_normalized_name_lookup_uses_functional_index():
+    from django.db import connection
+
+    qs = Ingredient.objects.filter(ingredient_name__nexact="Crème")
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        sql, params = qs.query.sql_with_params()
+        cursor.execute("EXPLAIN " + sql, params)
+        plan = "\n".join(row[0] for row in cursor.fetchall())
+    assert "idx_ingredient_name_norm" in plan
+
+def test_unified_search_ignores_accents():
+    from pastry_app.utils import search_documents
+
+    Ingredient.objects.create(ingredient_name="crème fraîche", visibility="public")
+    assert [d.title for d in search_documents("creme fraiche", entities=["ingredients"], limit=5)] == ["crème fraîche"]
+
+@pytest.mark.django_db(transaction=True)
+def test_entity_queries_run_concurrently(settings):
+    import time
+    from pastry_app.views import _run_entity_queries
+
+    settings.SEARCH_MAX_WORKERS = 3
+    slow = lambda: time.sleep(0.3) or "ok"
+    start = time.perf_counter()
+    assert _run_entity_queries({"recipes": slow, "ingredients": slow, "stores": slow}) == {"recipes": "ok", "ingredients": "ok", "stores": "ok"}
+    assert time.perf_counter() - start < 0.6
+
+@pytest.mark.django_db(transaction=True)
+def test_search_per_entity_concurrent_mode(api_client, settings):
+    settings.SEARCH_UNIFIED_INDEX = False
+    settings.SEARCH_MAX_WORKERS = 3
+    Ingredient.objects.create(ingredient_name="chocolat noir", visibility="public")
+    Store.objects.create(store_name="La Grande Épicerie", city="Paris", visibility="public")
+    Recipe.objects.create(recipe_name="Mousse au chocolat", chef_name="Alice", visibility="public")
+    r = api_client.get(SEARCH_URL, {"q": "chocolat", "entities": "recipes,ingredients,stores"})
+    assert r.status_code == 200
+    assert [it["title"] for it in r.data["recipes"]] == ["mousse au chocolat"]
+    assert [it["title"] for it in r.data["ingredients"]] == ["chocolat noir"]
+    assert r.data["stores"] == []
+
+@pytest.mark.django_db(transaction=True)
+def test_per_entity_threaded_path_matches_sequential_and_reuses_connections(api_client, settings, monkeypatch):
+    import threading
+    from django.db import connection
+    from pastry_app import views
+
+    settings.SEARCH_UNIFIED_INDEX = False
+    settings.SEARCH_MAX_WORKERS = 3
+    Ingredient.objects.create(ingredient_name="chocolat noir", visibility="public")
+    Ingredient.objects.create(ingredient_name="chocolat blanc", visibility="public")
+    Pan.objects.create(pan_name="moule chocolat", pan_type="CUSTOM", volume_raw=500, unit="cm3", visibility="public")
+    Store.objects.create(store_name="Chocolaterie", city="Lyon", visibility="public")
+    Recipe.objects.create(recipe_name="Mousse au chocolat", chef_name="Alice", visibility="public")
+    params = {"q": "chocolat", "entities": "recipes,ingredients,pans,stores"}
+
+    workers = []
+    run = views._run_in_own_connection
+    def spy(query):
+        result = run(query)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            workers.append((threading.current_thread().name, cursor.fetchone()[0]))
+        return result
+    monkeypatch.setattr(views, "_run_in_own_connection", spy)
+
+    threaded = []
+    for _ in range(2):
+        cache.clear()  # cache_page
+        threaded.append(api_client.get(SEARCH_URL, params).data)
+    assert len(workers) == 8 and all(name.startswith("omnibox") for name, _ in workers)
+    assert len({pid for _, pid in workers}) <= 3  # une connexion par thread, réutilisée d'une requête à l'autre
+
+    settings.SEARCH_MAX_WORKERS = 1
+    cache.clear()
+    sequential = api_client.get(SEARCH_URL, params).data
+    assert len(workers) == 8
+    assert threaded[0] == threaded[1] == sequential
+    assert {it["title"] for it in sequential["ingredients"]} == {"chocolat blanc", "chocolat noir"}
+
+def test_prefix_index_matches_name_then_word_prefixes():
+    from pastry_app.utils import PrefixIndex
+    index = PrefixIndex([("recipes", 1, "tarte aux pommes"), ("ingredients", 2, "pomme"), ("ingredients", 3, "crème"),
+                         ("labels", 4, "bio")])
+    assert [i[1] for i in index.search("pom")] == [2, 1]  # nom complet d'abord, puis mot du nom
+    assert index.search("creme") == [("ingredients", 3, "crème")]  # insensible aux accents
+    assert index.search("pom", entities={"recipes"}) == [("recipes", 1, "tarte aux pommes")]
+    assert index.search("pom", limit=1) == [("ingredients", 2, "pomme")]
+
+def test_suggest_serves_public_prefixes_from_memory(django_assert_num_queries):
+    from pastry_app.utils import suggest_names
+    for name in ("chocolat noir", "chocolat blanc", "chou"):
+        Ingredient.objects.create(ingredient_name=name, visibility="public")
+    Ingredient.objects.create(ingredient_name="chocolat secret", visibility="private", guest_id="g1")
+
+    assert [r["title"] for r in suggest_names("choc", limit=2)] == ["chocolat blanc", "chocolat noir"]
+    with django_assert_num_queries(0):  # génération contrôlée au plus une fois par intervalle, index en mémoire
+        assert len(suggest_names("cho", limit=3)) == 3
+
+    # nouvelle écriture → génération incrémentée → index reconstruit
+    Ingredient.objects.create(ingredient_name="chocolatine", visibility="public")
+    assert "chocolatine" in [r["title"] for r in suggest_names("chocolati")]
+
+    # lignes privées : uniquement pour leur propriétaire, via SQL
+    assert "chocolat secret" not in [r["title"] for r in suggest_names("chocolat s")]
+    private = suggest_names("chocolat s", guest_id="g1")  # puis repli approché (trigram) sur le reste
+    assert (private[0]["title"], private[0]["source"]) == ("chocolat secret", "db")
+
+def test_suggest_skips_recipes_hidden_by_caller():
+    from pastry_app.utils import suggest_names
+    tatin = Recipe.objects.create(recipe_name="Tarte Tatin", chef_name="Alice", is_default=True)
+    Recipe.objects.create(recipe_name="Tarte tropézienne", chef_name="Bob", visibility="public")
+    UserRecipeVisibility.objects.create(guest_id="g1", recipe=tatin, visible=False)
+    assert [r["title"] for r in suggest_names("ta", entities=["recipes"])] == ["tarte tatin", "tarte tropézienne"]
+    assert [r["title"] for r in suggest_names("ta", entities=["recipes"], guest_id="g1")] == ["tarte tropézienne"]
+    assert [r["title"] for r in suggest_names("ta", entities=["recipes"], limit=1, guest_id="g1")] == ["tarte tropézienne"]
+
+def test_other_processes_see_new_generation_after_check_interval(settings, django_assert_num_queries):
+    from pastry_app.models import SearchDocument
+    from pastry_app.utils import bump_table_generation, suggest_names
+    Ingredient.objects.create(ingredient_name="chocolat", visibility="public")
+    assert len(suggest_names("ch")) == 1
+    # écriture d'un autre processus : seule la génération en base change
+    Ingredient.objects.bulk_create([Ingredient(ingredient_name="chocolatine", visibility="public")])
+    bump_table_generation(SearchDocument)
+    with django_assert_num_queries(0):
+        assert len(suggest_names("ch")) == 1  # dans l'intervalle : index courant, aucune requête (< 3 caractères : pas de repli trigram)
+
+    settings.SEARCH_GENERATION_CHECK_INTERVAL = 0
+    assert len(suggest_names("ch")) == 2
+
+def test_suggest_api(api_client):
+    Recipe.objects.create(recipe_name="Tarte Tatin", chef_name="Alice", visibility="public")
+    r = api_client.get(SEARCH_URL + "suggest/", {"q": "tat"})
+    assert r.status_code == 200
+    assert r.data["results"] == [{"type": "recipes", "id": Recipe.objects.get().id, "title": "tarte tatin", "source": "prefix"}]
+    assert api_client.get(SEARCH_URL + "suggest/", {"q": "tat", "entities": "stores"}).status_code == 400
+    assert api_client.get(SEARCH_URL + "suggest/").status_code == 400
+
+def test_public_part_is_cached_and_private_part_live(django_assert_num_queries):
+    from pastry_app.utils import cached_search_documents
+    Recipe.objects.create(recipe_name="Tarte au chocolat", chef_name="Alice", visibility="public")
+    hidden = Recipe.objects.create(recipe_name="Tarte chocolat poire", chef_name="Bob", visibility="public")
+    mine = Recipe.objects.create(recipe_name="Tarte chocolat maison", chef_name="Moi", visibility="private", guest_id="g1")
+    UserRecipeVisibility.objects.create(guest_id="g1", recipe=hidden, visible=False)
+
+    anonymous = cached_search_documents("tarte chocolat", entities=["recipes"], limit=5)
+    assert mine.id not in [h.entity_id for h in anonymous]
+    with django_assert_num_queries(2):  # génération + entrée du cache partagé, aucune recherche SQL
+        assert cached_search_documents("Tarte  Chocolat", entities=["recipes"], limit=5) == anonymous
+
+    first = cached_search_documents("tarte chocolat", entities=["recipes"], limit=5, guest_id="g1")  # met en cache les masquées de g1
+    with django_assert_num_queries(4):  # génération + partie publique et masquées en cache partagé + partie privée
+        guest = cached_search_documents("tarte chocolat", entities=["recipes"], limit=5, guest_id="g1")
+    assert guest == first
+    ids = [h.entity_id for h in guest]
+    assert mine.id in ids and hidden.id not in ids
+
+    # toute écriture change la génération : la partie publique est recalculée
+    Recipe.objects.create(recipe_name="Tarte chocolat framboise", chef_name="Zoé", visibility="public")
+    assert "tarte chocolat framboise" in [h.title for h in cached_search_documents("tarte chocolat", entities=["recipes"], limit=5)]
+
+def test_only_public_writes_bump_search_generation():
+    from pastry_app.utils import get_search_generation
+    start = get_search_generation()
+    private = Ingredient.objects.create(ingredient_name="vanille maison", guest_id="g1")
+    private.ingredient_name = "vanille bourbon"
+    private.save()
+    assert get_search_generation() == start  # écritures privées : index de préfixes et cache public intacts
+
+    private.visibility = "public"
+    private.save()
+    assert get_search_generation() != start
+    published = get_search_generation()
+    private.visibility = "private"  # était publique : doit sortir de l'index
+    private.save()
+    assert get_search_generation() != published
+    published = get_search_generation()
+    private.delete()
+    assert get_search_generation() == published
+
+def test_public_write_bumps_search_generation_again_on_commit(django_capture_on_commit_callbacks):
+    from pastry_app.utils import cached_search_documents, get_search_generation
+    with django_capture_on_commit_callbacks(execute=True):
+        Recipe.objects.create(recipe_name="Tarte citron", chef_name="Alice", visibility="public")
+        during = get_search_generation()
+        # lecteur concurrent : résultats d'avant le commit (aucune recette) mis en cache sous la génération en cours
+        digest = hashlib.sha1("tarte citron|recipes".encode()).hexdigest()
+        cache.set(f"search:public:{during}:{digest}", [])
+    assert get_search_generation() != during
+    assert [h.title for h in cached_search_documents("tarte citron", entities=["recipes"], limit=5)] == ["tarte citron"]
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        Ingredient.objects.create(ingredient_name="citron confit", guest_id="g1")
+    assert not [c for c in callbacks if getattr(c, "__name__", "") == "bump_search_generation"]  # écriture privée
+
+def test_search_generation_survives_cache_eviction():
+    from pastry_app.utils import cached_search_documents, get_search_generation
+    Recipe.objects.create(recipe_name="Tarte citron", chef_name="Alice", visibility="public")
+    before = get_search_generation()
+    stale = cached_search_documents("tarte", entities=["recipes"], limit=5)
+    Recipe.objects.create(recipe_name="Tarte citron meringuée", chef_name="Bob", visibility="public")
+    after = get_search_generation()
+
+    cache.clear()  # éviction (MAX_ENTRIES de DatabaseCache) ou redémarrage de Redis
+    assert get_search_generation() == after != before
+    assert len(cached_search_documents("tarte", entities=["recipes"], limit=5)) == len(stale) + 1
+
+def test_suggest_private_prefix_ignores_accents():
+    from pastry_app.utils import suggest_names
+    Ingredient.objects.create(ingredient_name="pâte d'amande", visibility="private", guest_id="g1")
+    for q in ("pâ", "pa", "PÂ"):  # < 3 caractères : pas de repli trigram, seul le préfixe SQL répond
+        assert [r["title"] for r in suggest_names(q, guest_id="g1")] == ["pâte d'amande"]
@@ -0,0 +1,86 @@
+# tests/services/test_price_history_partitions.py
+import datetime
+import gzip
+import pytest
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from pastry_app.tests.base_api_test import api_client, base_url
+from pastry_app.models import Recipe, RecipeStep, RecipeIngredient, Ingredient, Store, IngredientPriceHistory, PriceHistoryArchive
+from pastry_app.utils import (archive_price_history, ensure_price_history_partitions, list_price_history_partitions,
+                              recipe_cost_as_of, recipe_cost_series)
+
+pytestmark = pytest.mark.django_db
+
+D = datetime.date
+TABLE = IngredientPriceHistory._meta.db_table
+
+@pytest.fixture
+def old_prices():
+    """ Farine : 1,00 €/kg en 2019 (hors rétention), 1,50 €/kg en 2025. """
+    farine = Ingredient.objects.create(ingredient_name="farine")
+    store = Store.objects.create(store_name="carrefour", city="paris", visibility="public")
+    for day, price in [(D(2019, 3, 1), 1.00), (D(2025, 6, 1), 1.50)]:
+        IngredientPriceHistory.objects.create(ingredient=farine, store=store, brand_name="francine", quantity=1, unit="kg", price=price, date=day)
+    recipe = Recipe.objects.create(recipe_name="pâte brisée", chef_name="chef", visibility="public")
+    RecipeStep.objects.create(recipe=recipe, step_number=1, instruction="step ok")
+    RecipeIngredient.objects.create(recipe=recipe, ingredient=farine, quantity=500, unit="g")
+    return recipe, farine
+
+def _partition_of(pk):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT tableoid::regclass::text FROM {TABLE} WHERE id = %s", [pk])
+        return cursor.fetchone()[0]
+
+def test_history_table_is_partitioned_by_date(old_prices):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT partstrat FROM pg_partitioned_table WHERE partrelid = %s::regclass", [TABLE])
+        assert cursor.fetchone() == ("r",)
+    old, recent = IngredientPriceHistory.objects.order_by("date")
+    assert _partition_of(old.pk) == f"{TABLE}_default"
+
+    assert 2019 in ensure_price_history_partitions()
+    assert _partition_of(old.pk) == f"{TABLE}_y2019"
+    assert _partition_of(recent.pk) == f"{TABLE}_y2025"
+    assert ensure_price_history_partitions([2019]) == []
+
+def test_archive_moves_old_partitions_to_disk(tmp_path, old_prices):
+    recipe, farine = old_prices
+    report = archive_price_history(retention_years=3, directory=tmp_path, today=D(2026, 10, 1))
+    assert [a["year"] for a in report["archived"]] == [2019]
+
+    assert list(IngredientPriceHistory.objects.values_list("date", flat=True)) == [D(2025, 6, 1)]
+    assert 2019 not in [y for y, _ in list_price_history_partitions()]
+    archive = PriceHistoryArchive.objects.get()
+    assert (archive.range_start, archive.row_count, archive.ingredient_ids) == (D(2019, 1, 1), 1, [farine.id])
+    with gzip.open(archive.path, "rt") as f:
+        assert len(f.read().splitlines()) == 2
+
+    # Lecture transparente : le coût à date retrouve le prix archivé
+    assert recipe_cost_as_of(recipe, D(2020, 1, 1))["cost"] == 0.50
+    assert recipe_cost_as_of(recipe, D(2025, 7, 1))["cost"] == 0.75
+
+    # Prix rétroactif arrivé après archivage : fusionné dans l'archive existante au passage suivant
+    IngredientPriceHistory.objects.create(ingredient=farine, brand_name="bio", quantity=1, unit="kg", price=3.0, date=D(2019, 5, 1))
+    archive_price_history(retention_years=3, directory=tmp_path, today=D(2026, 10, 1))
+    assert PriceHistoryArchive.objects.get().row_count == 2
+
+def test_current_window_touches_no_archive(tmp_path, old_prices):
+    recipe, farine = old_prices
+    archive_price_history(retention_years=3, directory=tmp_path, today=D(2026, 10, 1))
+    for path in tmp_path.iterdir():
+        path.unlink()  # toute lecture d'archive lèverait une erreur
+
+    # Fenêtre et référence (prix de 2025) en base : aucune archive ouverte
+    assert recipe_cost_as_of(recipe, D(2025, 7, 1))["cost"] == 0.75
+    series = recipe_cost_series(recipe, [D(2025, 6, 1), D(2025, 9, 1)], store_ids=[IngredientPriceHistory.objects.get().store_id])
+    assert [p["cost"] for p in series["points"]] == [0.75, 0.75]
+    # Avant le premier prix en base : la référence est dans l'archive
+    with pytest.raises(ValidationError, match="introuvable"):
+        recipe_cost_as_of(recipe, D(2024, 1, 1))
+
+def test_archive_command_dry_run(tmp_path, old_prices):
+    ensure_price_history_partitions([2019])
+    call_command("archive_price_history", "--dir", str(tmp_path), "--dry-run")
+    assert IngredientPriceHistory.objects.count() == 2
+    assert not PriceHistoryArchive.objects.exists() and not list(tmp_path.iterdir())
@@ -0,0 +1,149 @@
+# tests/services/test_price_import.py
+import datetime
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from pastry_app.tests.base_api_test import api_client, base_url
+from pastry_app.models import Ingredient, Store, IngredientPrice, IngredientPriceHistory
+from pastry_app.utils import bulk_import_prices
+
+pytestmark = pytest.mark.django_db
+
+URL = "/api/ingredient_prices/bulk-import/"
+D = datetime.date
+
+User = get_user_model()
+
+@pytest.fixture
+def admin():
+    return User.objects.create_user(username="admin", password="testpass123", is_staff=True)
+
+@pytest.fixture
+def catalog():
+    farine = Ingredient.objects.create(ingredient_name="farine", is_default=True)
+    sucre = Ingredient.objects.create(ingredient_name="sucre", visibility="public")
+    store = Store.objects.create(store_name="carrefour", city="paris", zip_code="75001")
+    return {"farine": farine, "sucre": sucre, "store": store}
+
+def row(**kw):
+    base = {"ingredient": "Farine ", "store_name": "Carrefour", "city": "Paris", "brand_name": "Francine",
+            "quantity": "1", "unit": "kg", "price": "1.20", "date": "2025-01-01"}
+    base.update(kw)
+    return base
+
+def test_bulk_import_creates_prices(catalog):
+    report = bulk_import_prices([row(), row(ingredient="sucre", price="0,99")])
+    assert report["created"] == 2 and not report["errors"]
+    p = IngredientPrice.objects.get(ingredient=catalog["sucre"])
+    assert p.price == 0.99 and p.store == catalog["store"] and p.brand_name == "francine"
+
+def test_bulk_import_archives_superseded_and_retroactive_prices(catalog):
+    bulk_import_prices([row()])
+    report = bulk_import_prices([row(price="1.50", date="2025-06-01"), row(price="1.10", date="2024-06-01", brand_name="bio")])
+    assert report["updated"] == 1 and report["created"] == 1 and report["archived"] == 1
+
+    current = IngredientPrice.objects.get(brand_name="francine")
+    assert (current.price, current.date) == (1.50, D(2025, 6, 1))
+    assert list(IngredientPriceHistory.objects.values_list("price", "date")) == [(1.20, D(2025, 1, 1))]
+
+    # Ligne antérieure au prix courant : archivée seule, le prix courant reste inchangé
+    report = bulk_import_prices([row(price="1.35", date="2025-03-01")])
+    assert report["retroactive"] == 1 and report["updated"] == 0
+    assert IngredientPrice.objects.get(brand_name="francine").price == 1.50
+    assert IngredientPriceHistory.objects.filter(price=1.35, date=D(2025, 3, 1)).exists()
+
+def test_bulk_import_folds_successive_rows_of_same_product(catalog):
+    report = bulk_import_prices([row(price="1.40", date="2025-03-01"), row(price="1.20", date="2025-01-01"),
+                                 row(price="1.60", date="2025-05-01")])
+    assert report["created"] == 1 and report["archived"] == 2
+    assert IngredientPrice.objects.get().price == 1.60
+    assert sorted(IngredientPriceHistory.objects.values_list("price", flat=True)) == [1.20, 1.40]
+
+def test_bulk_import_is_all_or_nothing_by_default(catalog):
+    rows = [row(), row(ingredient="inconnu"), row(unit="xx"), row(store_name="absent")]
+    report = bulk_import_prices(rows)
+    assert [e["row"] for e in report["errors"]] == [2, 3, 4]
+    assert not IngredientPrice.objects.exists()
+
+    report = bulk_import_prices(rows, skip_invalid=True)
+    assert report["created"] == 1 and len(report["errors"]) == 3
+
+def test_bulk_import_rejects_promo_above_normal_price(catalog):
+    report = bulk_import_prices([row(), row(brand_name="bio", price="2.00", is_promo="true")])
+    assert len(report["errors"]) == 1 and "prix promo" in report["errors"][0]["error"]
+
+def test_bulk_import_query_count_does_not_grow_with_rows(catalog, django_assert_max_num_queries):
+    rows = [row(quantity=str(q)) for q in range(1, 401)]
+    with django_assert_max_num_queries(12):
+        report = bulk_import_prices(rows)
+    assert report["created"] == 400
+    rows = [row(quantity=str(q), price="2.00", date="2025-02-01") for q in range(1, 401)]
+    with django_assert_max_num_queries(12):
+        report = bulk_import_prices(rows)
+    assert report["updated"] == 400 and report["archived"] == 400
+
+def test_bulk_import_dry_run_writes_nothing(catalog):
+    report = bulk_import_prices([row()], dry_run=True)
+    assert report["created"] == 1
+    assert not IngredientPrice.objects.exists()
+
+def test_bulk_import_api_is_admin_only(api_client, admin, catalog):
+    payload = {"rows": [row()]}
+    assert api_client.post(URL, payload, format="json").status_code in (401, 403)
+
+    api_client.force_authenticate(user=admin)
+    r = api_client.post(URL, payload, format="json")
+    assert r.status_code == 200 and r.data["created"] == 1
+
+    r = api_client.post(URL, {"rows": [row(price="-1")]}, format="json")
+    assert r.status_code == 400 and r.data["errors"]
+
+def test_import_prices_command_csv(tmp_path, catalog):
+    path = tmp_path / "prix.csv"
+    path.write_text("ingredient;store_name;city;brand_name;quantity;unit;price;date\n"
+                    "farine;carrefour;paris;francine;1;kg;1,20;2025-01-01\n"
+                    "sucre;carrefour;paris;;1;kg;0,95;2025-01-01\n", encoding="utf-8")
+    call_command("import_prices", str(path), "--delimiter", ";")
+    assert IngredientPrice.objects.count() == 2
+
+    bad = tmp_path / "bad.csv"
+    bad.write_text("ingredient,quantity,unit,price\ninconnu,1,kg,1\n", encoding="utf-8")
+    with pytest.raises(CommandError):
+        call_command("import_prices", str(bad))
+
+def test_bulk_import_locks_current_prices_and_counts_inserted_archives(catalog):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    bulk_import_prices([row()])
+    # Archivage déjà présent à la même date (autre prix) : la ligne en conflit est ignorée, donc non comptée
+    IngredientPriceHistory.objects.create(ingredient=catalog["farine"], store=catalog["store"], brand_name="francine",
+                                          quantity=1, unit="kg", price=9.99, date=D(2024, 12, 1))
+    IngredientPriceHistory.objects.create(ingredient=catalog["farine"], store=catalog["store"], brand_name="francine",
+                                          quantity=1, unit="kg", price=1.00, date=D(2025, 1, 1))
+    with CaptureQueriesContext(connection) as ctx:
+        report = bulk_import_prices([row(price="1.50", date="2025-06-01")])
+    assert report["updated"] == 1 and report["archived"] == 0
+    locked = [q["sql"] for q in ctx.captured_queries if "FOR UPDATE" in q["sql"]]
+    assert any("ingredientprice" in sql for sql in locked)
+
+def test_bulk_import_resolves_names_without_case_or_accents():
+    creme = Ingredient.objects.create(ingredient_name="crème fraîche", visibility="public")
+    store = Store.objects.create(store_name="épicerie du marché", city="évry")
+    report = bulk_import_prices([row(ingredient="Creme Fraiche", store_name="Epicerie du Marche", city="EVRY")])
+    assert report["created"] == 1 and not report["errors"]
+    assert IngredientPrice.objects.filter(ingredient=creme, store=store).exists()
+
+def test_bulk_import_never_matches_private_ingredients():
+    Ingredient.objects.create(ingredient_name="praliné maison", guest_id="guest-1")
+    Store.objects.create(store_name="carrefour", city="paris")
+    report = bulk_import_prices([row(ingredient="praliné maison")])
+    assert report["errors"] == [{"row": 1, "error": "Ingrédient introuvable parmi les ingrédients publics ou de base : 'praliné maison'."}]
+    assert not IngredientPrice.objects.exists()
+
+def test_bulk_import_reports_ambiguous_ingredient_names(catalog):
+    Ingredient.objects.create(ingredient_name="crème", visibility="public")
+    Ingredient.objects.create(ingredient_name="creme", is_default=True)
+    report = bulk_import_prices([row(), row(ingredient="Crème")], skip_invalid=True)
+    assert report["created"] == 1
+    assert report["errors"] == [{"row": 2, "error": "Ingrédient ambigu : 'crème' (2 ingrédients publics ou de base)."}]
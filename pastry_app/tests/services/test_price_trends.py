@@ -0,0 +1,56 @@
+# tests/services/test_price_trends.py
+import datetime
+import pytest
+from pastry_app.tests.base_api_test import api_client, base_url
+from pastry_app.models import Ingredient, Store, IngredientPrice, IngredientPriceHistory, IngredientUnitReference
+from pastry_app.utils import price_trends
+
+pytestmark = pytest.mark.django_db
+
+URL = "/api/ingredient_prices_history/trends/"
+D = datetime.date
+
+@pytest.fixture
+def history():
+    farine = Ingredient.objects.create(ingredient_name="farine")
+    lait = Ingredient.objects.create(ingredient_name="lait")
+    IngredientUnitReference.objects.create(ingredient=lait, unit="l", weight_in_grams=1000)
+    s1 = Store.objects.create(store_name="carrefour", city="paris")
+    s2 = Store.objects.create(store_name="lidl", city="paris")
+    for store, day, price in [(s1, D(2025, 1, 5), 1.00), (s2, D(2025, 1, 20), 2.00), (s1, D(2025, 2, 10), 1.80)]:
+        IngredientPriceHistory.objects.create(ingredient=farine, store=store, brand_name="francine", quantity=1, unit="kg", price=price, date=day)
+    IngredientPrice.objects.create(ingredient=farine, store=s1, brand_name="francine", quantity=500, unit="g", price=1.20, date=D(2025, 3, 1))
+    IngredientPriceHistory.objects.create(ingredient=lait, store=s1, quantity=1, unit="l", price=1.10, date=D(2025, 1, 15))
+    IngredientPriceHistory.objects.create(ingredient=lait, store=s1, quantity=1, unit="cup", price=0.50, date=D(2025, 1, 16))  # non convertible
+    return {"farine": farine, "lait": lait, "s1": s1, "s2": s2}
+
+def test_price_trends_monthly(history):
+    series = price_trends([history["farine"].id, history["lait"].id], D(2025, 1, 1), D(2025, 12, 31), bucket="month")
+    by_ing = {s["ingredient_id"]: s["points"] for s in series}
+
+    farine = by_ing[history["farine"].id]
+    assert [p["bucket"] for p in farine] == [D(2025, 1, 1), D(2025, 2, 1), D(2025, 3, 1)]
+    jan, feb, mar = farine
+    assert (jan["min_price_per_g"], jan["max_price_per_g"], jan["count"]) == (pytest.approx(0.001), pytest.approx(0.002), 2)
+    assert jan["avg_price_per_g"] == pytest.approx(0.0015) and jan["avg_change_pct"] is None
+    assert feb["avg_change_pct"] == pytest.approx(20.0)
+    assert mar["avg_price_per_g"] == pytest.approx(0.0024)
+
+    lait = by_ing[history["lait"].id]
+    assert len(lait) == 1 and lait[0]["count"] == 1 and lait[0]["avg_price_per_g"] == pytest.approx(0.0011)
+
+def test_price_trends_weekly_by_store(history):
+    series = price_trends([history["farine"].id], D(2025, 1, 1), D(2025, 1, 31), bucket="week", by_store=True)
+    assert {(s["store_id"], len(s["points"])) for s in series} == {(history["s1"].id, 1), (history["s2"].id, 1)}
+    # semaines ISO : date_trunc('week') tombe le lundi
+    assert all(p["bucket"].weekday() == 0 for s in series for p in s["points"])
+
+def test_price_trends_api(api_client, history):
+    r = api_client.get(URL, {"ingredient": str(history["farine"].id), "start": "2025-01-01", "end": "2025-02-28"})
+    assert r.status_code == 200
+    assert r.data["bucket"] == "month"
+    assert len(r.data["series"]) == 1 and len(r.data["series"][0]["points"]) == 2
+
+    assert api_client.get(URL).status_code == 400
+    assert api_client.get(URL, {"ingredient": "abc"}).status_code == 400
+    assert api_client.get(URL, {"ingredient": "1", "bucket": "day"}).status_code == 400
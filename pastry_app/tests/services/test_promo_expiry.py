@@ -0,0 +1,61 @@
+# tests/services/test_promo_expiry.py
+import datetime
+import pytest
+from django.core.management import call_command
+from pastry_app.models import Ingredient, Store, IngredientPrice, IngredientPriceHistory
+from pastry_app.utils import sweep_expired_promotions
+
+pytestmark = pytest.mark.django_db
+
+D = datetime.date
+TODAY = datetime.date.today()
+
+@pytest.fixture
+def prices():
+    farine = Ingredient.objects.create(ingredient_name="farine")
+    store = Store.objects.create(store_name="carrefour", city="paris")
+    # prix normal puis passage en promo (l'ancien prix normal est archivé par IngredientPrice.save())
+    promo = IngredientPrice.objects.create(ingredient=farine, store=store, brand_name="francine", quantity=1, unit="kg",
+                                           price=2.00, date=TODAY - datetime.timedelta(days=30))
+    promo.price, promo.is_promo, promo.date = 1.50, True, TODAY - datetime.timedelta(days=10)
+    promo.promotion_end_date = TODAY + datetime.timedelta(days=5)
+    promo.save()
+    # promo sans prix normal connu
+    orphan = IngredientPrice.objects.create(ingredient=farine, store=store, brand_name="bio", quantity=1, unit="kg", price=1.00,
+                                            is_promo=True, date=TODAY - datetime.timedelta(days=10),
+                                            promotion_end_date=TODAY + datetime.timedelta(days=5))
+    # promo encore active
+    active = IngredientPrice.objects.create(ingredient=farine, store=store, brand_name="bio", quantity=500, unit="g", price=0.60,
+                                            is_promo=True, promotion_end_date=TODAY + datetime.timedelta(days=30))
+    # expiration simulée (la validation métier interdit une fin de promo passée)
+    end = TODAY - datetime.timedelta(days=2)
+    IngredientPrice.objects.filter(pk__in=[promo.pk, orphan.pk]).update(promotion_end_date=end)
+    return {"promo": promo, "orphan": orphan, "active": active, "end": end}
+
+def test_sweep_archives_expired_promos_and_restores_normal_price(prices):
+    report = sweep_expired_promotions()
+    assert (report["expired"], report["archived"], report["restored"], report["kept"], report["deleted"]) == (2, 2, 1, 1, 0)
+
+    restored = IngredientPrice.objects.get(pk=prices["promo"].pk)
+    assert (restored.price, restored.is_promo, restored.promotion_end_date) == (2.00, False, None)
+    assert restored.date == prices["end"] + datetime.timedelta(days=1)
+    kept = IngredientPrice.objects.get(pk=prices["orphan"].pk)  # sans prix normal connu : conservée, plus en promo
+    assert (kept.price, kept.is_promo, kept.promotion_end_date) == (1.00, False, None)
+    assert IngredientPrice.objects.filter(pk=prices["active"].pk, is_promo=True).exists()
+
+    archived = IngredientPriceHistory.objects.filter(is_promo=True, promotion_end_date=prices["end"])
+    assert sorted(archived.values_list("price", flat=True)) == [1.00, 1.50]
+
+    # idempotent
+    assert sweep_expired_promotions()["expired"] == 0
+
+def test_expire_promotions_command_dry_run(prices):
+    call_command("expire_promotions", "--dry-run")
+    assert IngredientPrice.objects.filter(is_promo=True).count() == 3
+    call_command("expire_promotions")
+    assert IngredientPrice.objects.filter(is_promo=True).count() == 1
+
+def test_sweep_deletes_orphans_only_when_asked(prices):
+    report = sweep_expired_promotions(delete_orphans=True)
+    assert (report["restored"], report["kept"], report["deleted"]) == (1, 0, 1)
+    assert not IngredientPrice.objects.filter(pk=prices["orphan"].pk).exists()
@@ -0,0 +1,70 @@
+# tests/services/test_recipe_content_search.py
+import pytest
+from django.db import connection
+from pastry_app.tests.base_api_test import api_client, base_url
+from pastry_app.models import Recipe, RecipeStep, RecipeIngredient, SubRecipe, Ingredient
+from pastry_app.utils import search_recipe_content, refresh_recipe_search_vectors
+
+pytestmark = pytest.mark.django_db
+
+URL = "/api/recipes/"
+
+def make_recipe(name, instruction="mélanger", **kw):
+    r = Recipe.objects.create(recipe_name=name, chef_name="chef", visibility="public", **kw)
+    RecipeStep.objects.create(recipe=r, step_number=1, instruction=instruction)
+    return r
+
+@pytest.fixture
+def recipes():
+    praline = Ingredient.objects.create(ingredient_name="praliné")
+    flan = make_recipe("flan pâtissier", instruction="Cuire au bain-marie pendant 40 minutes")
+    paris_brest = make_recipe("paris-brest", instruction="Garnir de crème mousseline")
+    RecipeIngredient.objects.create(recipe=paris_brest, ingredient=praline, quantity=100, unit="g")
+    bain_marie = make_recipe("crème bain-marie")
+    return {"flan": flan, "paris_brest": paris_brest, "bain_marie": bain_marie, "praline": praline}
+
+def names(qs):
+    return [r.recipe_name for r in qs.order_by("-content_rank", "recipe_name")]
+
+def test_content_search_finds_steps_and_ingredients_without_accents(recipes):
+    assert set(names(search_recipe_content(Recipe.objects.all(), "bain-marie"))) == {"flan pâtissier", "crème bain-marie"}
+    assert names(search_recipe_content(Recipe.objects.all(), "praline")) == ["paris-brest"]
+    assert names(search_recipe_content(Recipe.objects.all(), "mousselines")) == ["paris-brest"]  # racinisation
+
+def test_content_rank_weights_name_above_steps(recipes):
+    assert names(search_recipe_content(Recipe.objects.all(), "bain-marie")) == ["crème bain-marie", "flan pâtissier"]
+
+def test_search_vector_follows_content_changes(recipes):
+    step = recipes["flan"].steps.get()
+    step.instruction = "Cuire à la vapeur"
+    step.save()
+    assert names(search_recipe_content(Recipe.objects.all(), "bain-marie")) == ["crème bain-marie"]
+
+    recipes["praline"].ingredient_name = "pralin noisette"
+    recipes["praline"].save()
+    assert names(search_recipe_content(Recipe.objects.all(), "noisette")) == ["paris-brest"]
+
+    host = make_recipe("tarte")
+    SubRecipe.objects.create(recipe=host, sub_recipe=recipes["paris_brest"], quantity=1, unit="unit")
+    assert "tarte" in names(search_recipe_content(Recipe.objects.all(), "paris brest"))
+
+def test_refresh_rebuilds_all_vectors(recipes):
+    Recipe.objects.update(search_vector=None)
+    assert refresh_recipe_search_vectors() == 3
+    assert names(search_recipe_content(Recipe.objects.all(), "praliné")) == ["paris-brest"]
+
+def test_content_search_uses_gin_index(recipes):
+    sql, params = search_recipe_content(Recipe.objects.order_by(), "bain-marie").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute("EXPLAIN " + sql, params)
+        plan = "\n".join(row[0] for row in cursor.fetchall())
+    assert "idx_recipe_search_vector" in plan
+
+def test_recipe_list_content_filter_is_ranked(api_client, recipes):
+    r = api_client.get(URL, {"content": "bain-marie"})
+    assert r.status_code == 200
+    assert [x["recipe_name"] for x in r.data] == ["crème bain-marie", "flan pâtissier"]
+
+    r = api_client.get(URL, {"content": "bain-marie", "ordering": "-recipe_name"})
+    assert [x["recipe_name"] for x in r.data] == ["flan pâtissier", "crème bain-marie"]
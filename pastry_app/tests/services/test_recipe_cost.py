@@ -0,0 +1,77 @@
+# tests/services/test_recipe_cost.py
+import datetime
+import pytest
+from pastry_app.tests.base_api_test import api_client, base_url
+from pastry_app.models import Recipe, RecipeStep, RecipeIngredient, SubRecipe, Ingredient, Store, IngredientPrice, IngredientPriceHistory
+from pastry_app.utils import recipe_cost_as_of, recipe_cost_series, cost_date_range
+
+pytestmark = pytest.mark.django_db
+
+D = datetime.date
+
+def make_recipe(name, **kw):
+    r = Recipe.objects.create(recipe_name=name, chef_name="chef", visibility="public", **kw)
+    RecipeStep.objects.create(recipe=r, step_number=1, instruction="step ok")
+    return r
+
+@pytest.fixture
+def priced_recipe():
+    """ Farine : 1,00 €/kg (jan. 2025) → 1,50 €/kg (juin 2025) → 2,00 €/kg (prix courant, jan. 2026). """
+    farine = Ingredient.objects.create(ingredient_name="farine")
+    store = Store.objects.create(store_name="carrefour", city="paris", visibility="public")
+    for day, price in [(D(2025, 1, 1), 1.00), (D(2025, 6, 1), 1.50)]:
+        IngredientPriceHistory.objects.create(ingredient=farine, store=store, brand_name="francine", quantity=1, unit="kg", price=price, date=day)
+    IngredientPrice.objects.create(ingredient=farine, store=store, brand_name="francine", quantity=1, unit="kg", price=2.00, date=D(2026, 1, 1))
+    recipe = make_recipe("pâte brisée")
+    RecipeIngredient.objects.create(recipe=recipe, ingredient=farine, quantity=500, unit="g")
+    return recipe, farine, store
+
+def test_cost_as_of_picks_price_in_effect(priced_recipe):
+    recipe, farine, _ = priced_recipe
+    assert recipe_cost_as_of(recipe, D(2025, 3, 1))["cost"] == 0.50
+    assert recipe_cost_as_of(recipe, D(2025, 6, 1))["cost"] == 0.75
+    res = recipe_cost_as_of(recipe, D(2026, 2, 1))
+    assert res["cost"] == 1.00 and res["complete"]
+    assert res["ingredients"][0]["price_date"] == D(2026, 1, 1)
+
+def test_cost_as_of_before_first_price_is_incomplete(priced_recipe):
+    recipe, farine, _ = priced_recipe
+    res = recipe_cost_as_of(recipe, D(2024, 12, 31))
+    assert res["cost"] == 0 and not res["complete"]
+    assert res["missing_ingredient_ids"] == [farine.id]
+
+def test_cost_includes_subrecipes(priced_recipe):
+    recipe, _, _ = priced_recipe
+    recipe.total_recipe_quantity = 500
+    recipe.save()
+    host = make_recipe("tarte")
+    SubRecipe.objects.create(recipe=host, sub_recipe=recipe, quantity=1000, unit="g")
+    assert recipe_cost_as_of(host, D(2025, 3, 1))["cost"] == 1.00
+
+def test_cost_series_is_bulk(priced_recipe, django_assert_max_num_queries):
+    recipe, _, _ = priced_recipe
+    dates = cost_date_range(D(2024, 12, 1), D(2026, 2, 1), "month")
+    with django_assert_max_num_queries(12):
+        series = recipe_cost_series(recipe, dates)
+    by_date = {p["date"]: p["cost"] for p in series["points"]}
+    assert by_date[D(2024, 12, 1)] == 0
+    assert by_date[D(2025, 2, 1)] == 0.50
+    assert by_date[D(2025, 7, 1)] == 0.75
+    assert by_date[D(2026, 2, 1)] == 1.00
+    assert len(series["points"]) == 15
+
+def test_cost_date_range_month_clamps_day():
+    assert cost_date_range(D(2025, 1, 31), D(2025, 3, 31), "month") == [D(2025, 1, 31), D(2025, 2, 28), D(2025, 3, 31)]
+
+def test_cost_api_endpoints(api_client, priced_recipe):
+    recipe, _, store = priced_recipe
+    r = api_client.get(f"/api/recipes/{recipe.id}/cost/", {"as_of": "2025-03-01", "store_ids": str(store.id)})
+    assert r.status_code == 200
+    assert r.data["cost"] == 0.50
+
+    r = api_client.get(f"/api/recipes/{recipe.id}/cost-history/", {"start": "2025-01-01", "end": "2025-12-31", "granularity": "month"})
+    assert r.status_code == 200
+    assert [p["cost"] for p in r.data["points"]][:6] == [0.50] * 5 + [0.75]
+
+    r = api_client.get(f"/api/recipes/{recipe.id}/cost-history/", {"start": "2025-12-31", "end": "2025-01-01"})
+    assert r.status_code == 400
@@ -0,0 +1,66 @@
+# tests/services/test_recipe_facets.py
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from pastry_app.tests.base_api_test import api_client, base_url
+from pastry_app.models import Recipe, RecipeStep, Category, Label, Pan
+from pastry_app.utils import recipe_facet_counts
+
+pytestmark = pytest.mark.django_db
+
+URL = "/api/recipes/"
+SEARCH_URL = "/api/search/"
+
+User = get_user_model()
+
+@pytest.fixture(autouse=True)
+def clear_search_cache():
+    cache.clear()
+
+def make_recipe(name, **kw):
+    r = Recipe.objects.create(recipe_name=name, chef_name="chef", **{"visibility": "public", **kw})
+    RecipeStep.objects.create(recipe=r, step_number=1, instruction="mélanger")
+    return r
+
+@pytest.fixture
+def catalog():
+    admin = User.objects.create_user(username="admin", password="testpass123", is_staff=True)
+    tartes = Category.objects.create(category_name="tartes", category_type="recipe", created_by=admin)
+    gateaux = Category.objects.create(category_name="gâteaux", category_type="recipe", created_by=admin)
+    vegan = Label.objects.create(label_name="vegan", label_type="recipe", created_by=admin)
+    cercle = Pan.objects.create(pan_name="cercle 22", pan_type="ROUND", diameter=22, height=2)
+    t1 = make_recipe("tarte citron", pan=cercle)
+    t2 = make_recipe("tarte chocolat", pan=cercle)
+    g1 = make_recipe("gâteau chocolat")
+    t1.categories.add(tartes); t2.categories.add(tartes); g1.categories.add(gateaux)
+    t2.labels.add(vegan)
+    make_recipe("tarte privée", visibility="private", guest_id="other").categories.add(tartes)
+    return {"tartes": tartes, "gateaux": gateaux, "vegan": vegan}
+
+def test_facet_counts_cover_whole_filtered_set(catalog, django_assert_max_num_queries):
+    qs = Recipe.objects.filter(visibility="public")
+    with django_assert_max_num_queries(4):
+        facets = recipe_facet_counts(qs, ["categories", "labels", "recipe_type", "pan_type"])
+    assert facets["categories"] == [{"id": catalog["tartes"].id, "name": "tartes", "count": 2},
+                                    {"id": catalog["gateaux"].id, "name": "gâteaux", "count": 1}]
+    assert facets["labels"] == [{"id": catalog["vegan"].id, "name": "vegan", "count": 1}]
+    assert facets["recipe_type"] == [{"value": "BASE", "count": 3}]
+    assert facets["pan_type"] == [{"value": "ROUND", "count": 2}]
+
+def test_recipe_list_returns_facets_alongside_results(api_client, catalog):
+    r = api_client.get(URL, {"facets": "categories,pan_type", "categories": catalog["tartes"].id})
+    assert r.status_code == 200
+    assert {x["recipe_name"] for x in r.data["results"]} == {"tarte citron", "tarte chocolat"}
+    assert r.data["facets"]["categories"] == [{"id": catalog["tartes"].id, "name": "tartes", "count": 2}]
+    assert set(r.data["facets"]) == {"categories", "pan_type"}
+
+    assert isinstance(api_client.get(URL).data, list)  # sans facets : réponse inchangée
+    assert api_client.get(URL, {"facets": "couleur"}).status_code == 400
+
+@pytest.mark.parametrize("unified", [True, False])
+def test_search_facets_count_all_matches(api_client, catalog, settings, unified):
+    settings.SEARCH_UNIFIED_INDEX = unified
+    r = api_client.get(SEARCH_URL, {"q": "tarte", "entities": "recipes", "limit": 1, "facets": "all"})
+    assert r.status_code == 200
+    assert len(r.data["recipes"]) == 1
+    assert r.data["facets"]["categories"][0] == {"id": catalog["tartes"].id, "name": "tartes", "count": 2}
@@ -0,0 +1,74 @@
+# tests/services/test_recipe_flags.py
+import pytest
+from pastry_app.tests.base_api_test import api_client, base_url
+from pastry_app.models import Recipe, RecipeStep, RecipeIngredient, SubRecipe, Ingredient
+from pastry_app.utils import refresh_recipe_flags, create_variant_for_host_and_rewire
+
+pytestmark = pytest.mark.django_db
+
+URL = "/api/recipes/"
+
+FLAGS = ("ingredient_count", "has_steps", "has_sub_recipes", "is_preparation", "is_variant")
+
+def make_recipe(name, **kw):
+    r = Recipe.objects.create(recipe_name=name, chef_name="chef", visibility="public", **kw)
+    RecipeStep.objects.create(recipe=r, step_number=1, instruction="mélanger")
+    return r
+
+def flags(recipe):
+    return Recipe.objects.values(*FLAGS).get(pk=recipe.pk)
+
+def test_flags_follow_ingredient_step_and_subrecipe_writes():
+    farine, sucre = Ingredient.objects.create(ingredient_name="farine"), Ingredient.objects.create(ingredient_name="sucre")
+    creme = make_recipe("crème pâtissière")
+    tarte = make_recipe("tarte")
+    assert flags(tarte) == {"ingredient_count": 0, "has_steps": True, "has_sub_recipes": False,
+                            "is_preparation": False, "is_variant": False}
+
+    RecipeIngredient.objects.create(recipe=tarte, ingredient=farine, quantity=200, unit="g")
+    ri = RecipeIngredient.objects.create(recipe=tarte, ingredient=sucre, quantity=50, unit="g")
+    link = SubRecipe.objects.create(recipe=tarte, sub_recipe=creme, quantity=300, unit="g")
+    assert flags(tarte)["ingredient_count"] == 2 and flags(tarte)["has_sub_recipes"]
+    assert flags(creme)["is_preparation"]
+
+    ri.delete()
+    link.delete()
+    assert flags(tarte)["ingredient_count"] == 1 and not flags(tarte)["has_sub_recipes"]
+    assert not flags(creme)["is_preparation"]
+
+def test_flags_follow_variant_rewire_and_parent_deletion():
+    creme = make_recipe("crème pâtissière")
+    tarte = make_recipe("tarte")
+    link = SubRecipe.objects.create(recipe=tarte, sub_recipe=creme, quantity=300, unit="g")
+    variant = create_variant_for_host_and_rewire(link, tarte)
+    assert flags(variant)["is_variant"] and flags(variant)["is_preparation"]
+    assert not flags(creme)["is_preparation"]  # l'ancienne cible n'est plus utilisée
+
+    parent = make_recipe("crème mère")
+    child = make_recipe("crème fille", parent_recipe=parent, recipe_type="VARIATION")
+    assert flags(child)["is_variant"]
+    parent.delete()
+    assert not flags(child)["is_variant"]
+
+def test_refresh_recipe_flags_rebuilds_all():
+    tarte = make_recipe("tarte")
+    Recipe.objects.update(has_steps=False, ingredient_count=7)
+    assert refresh_recipe_flags() == 1
+    assert flags(tarte)["has_steps"] and flags(tarte)["ingredient_count"] == 0
+
+def test_recipe_list_filters_and_badges(api_client):
+    farine = Ingredient.objects.create(ingredient_name="farine")
+    creme = make_recipe("crème pâtissière")
+    tarte = make_recipe("tarte")
+    RecipeIngredient.objects.create(recipe=tarte, ingredient=farine, quantity=200, unit="g")
+    SubRecipe.objects.create(recipe=tarte, sub_recipe=creme, quantity=300, unit="g")
+
+    r = api_client.get(URL, {"is_preparation": "true"})
+    assert [x["recipe_name"] for x in r.data] == ["crème pâtissière"]
+    assert r.data[0]["is_preparation"] is True and r.data[0]["ingredient_count"] == 0
+
+    assert [x["recipe_name"] for x in api_client.get(URL, {"usage_type": "preparation"}).data] == ["crème pâtissière"]
+    assert [x["recipe_name"] for x in api_client.get(URL, {"has_sub_recipes": "true"}).data] == ["tarte"]
+    assert [x["recipe_name"] for x in api_client.get(URL, {"ingredient_count_min": 1}).data] == ["tarte"]
+    r = api_client.get(URL, {"ordering": "-ingredient_count"})
+    assert [x["recipe_name"] for x in r.data] == ["tarte", "crème pâtissière"]
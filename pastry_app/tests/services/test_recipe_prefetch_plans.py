@@ -0,0 +1,68 @@
+# tests/services/test_recipe_prefetch_plans.py
+import pytest
+from django.contrib.auth import get_user_model
+from pastry_app.tests.base_api_test import api_client, base_url
+from pastry_app.models import Recipe, RecipeStep, RecipeIngredient, SubRecipe, Ingredient, Category, Label
+
+pytestmark = pytest.mark.django_db
+
+URL = "/api/recipes/"
+
+User = get_user_model()
+
+def make_recipe(name, ingredients, *, categories=(), labels=(), subs=()):
+    r = Recipe.objects.create(recipe_name=name, chef_name="chef", visibility="public")
+    for n in (1, 2):
+        RecipeStep.objects.create(recipe=r, step_number=n, instruction=f"étape {n} de {name}")
+    for ing in ingredients:
+        RecipeIngredient.objects.create(recipe=r, ingredient=ing, quantity=100, unit="g")
+    for sub in subs:
+        SubRecipe.objects.create(recipe=r, sub_recipe=sub, quantity=200, unit="g")
+    r.categories.add(*categories)
+    r.labels.add(*labels)
+    return r
+
+def build_catalog(n):
+    """ n recettes hôtes, chacune avec 2 ingrédients, 2 étapes, M2M et un arbre de sous-recettes à 2 niveaux. """
+    admin = User.objects.create_user(username=f"admin{n}", password="testpass123", is_staff=True)
+    cat = Category.objects.create(category_name=f"cat {n}", category_type="recipe", created_by=admin)
+    lab = Label.objects.create(label_name=f"lab {n}", label_type="recipe", created_by=admin)
+    ings = [Ingredient.objects.create(ingredient_name=f"ing {n}-{i}") for i in range(2)]
+    hosts = []
+    for i in range(n):
+        leaf = make_recipe(f"feuille {n}-{i}", ings)
+        middle = make_recipe(f"milieu {n}-{i}", ings, subs=[leaf])
+        hosts.append(make_recipe(f"hôte {n}-{i}", ings, categories=[cat], labels=[lab], subs=[middle]))
+    return hosts
+
+@pytest.mark.parametrize("action, expected", [
+    ("list", 3),        # recettes + categories + labels
+    ("lego", 3),
+    ("retrieve", 7),    # validateurs ETag + recette (+ parent) + categories, labels, ingrédients, étapes, liens
+    ("full", 14),       # validateurs + arbre des versions + recette + (ingrédients, étapes, liens, sous-recettes) × niveau
+    ("refs", 5),
+])
+def test_query_count_per_action_is_fixed(api_client, django_assert_num_queries, action, expected):
+    hosts = build_catalog(3)
+    url = {"list": URL, "lego": URL + "lego-candidates/", "retrieve": f"{URL}{hosts[0].id}/",
+           "full": f"{URL}{hosts[0].id}/full/", "refs": f"{URL}{hosts[0].id}/reference-suggestions/"}[action]
+    with django_assert_num_queries(expected):
+        r = api_client.get(url)
+    assert r.status_code == 200, r.data
+
+def test_full_tree_query_count_does_not_grow_with_sub_recipes(api_client, django_assert_num_queries):
+    ings = [Ingredient.objects.create(ingredient_name="farine")]
+    leaves = [make_recipe(f"feuille {i}", ings) for i in range(4)]
+    middles = [make_recipe(f"milieu {i}", ings, subs=leaves[i:i + 2]) for i in range(3)]
+    host = make_recipe("hôte", ings, subs=middles)
+    with django_assert_num_queries(14):
+        r = api_client.get(f"{URL}{host.id}/full/")
+    assert len(r.data["tree"]["subrecipes"]) == 3
+    assert [s["step_number"] for s in r.data["tree"]["steps"]] == [1, 2]
+
+def test_sparse_fields_trim_the_plan(api_client, django_assert_num_queries):
+    host = build_catalog(1)[0]
+    with django_assert_num_queries(3):  # validateurs ETag + recette + étapes
+        api_client.get(f"{URL}{host.id}/", {"fields": "id,steps"})
+    with django_assert_num_queries(2):  # recettes (+ jointure pan) + categories
+        api_client.get(URL, {"fields": "id,categories", "expand": "pan"})
@@ -0,0 +1,49 @@
+# tests/services/test_recipe_sparse_fields.py
+import pytest
+from django.contrib.auth import get_user_model
+from pastry_app.tests.base_api_test import api_client, base_url
+from pastry_app.models import Recipe, RecipeStep, RecipeIngredient, Ingredient, Category, Pan
+
+pytestmark = pytest.mark.django_db
+
+URL = "/api/recipes/"
+
+User = get_user_model()
+
+@pytest.fixture
+def recipe():
+    admin = User.objects.create_user(username="admin", password="testpass123", is_staff=True)
+    tartes = Category.objects.create(category_name="tartes", category_type="recipe", created_by=admin)
+    cercle = Pan.objects.create(pan_name="cercle 22", pan_type="ROUND", diameter=22, height=2)
+    r = Recipe.objects.create(recipe_name="tarte citron", chef_name="chef", visibility="public", pan=cercle)
+    RecipeStep.objects.create(recipe=r, step_number=1, instruction="mélanger")
+    RecipeIngredient.objects.create(recipe=r, ingredient=Ingredient.objects.create(ingredient_name="citron"), quantity=2, unit="unit")
+    r.categories.add(tartes)
+    return r
+
+def test_list_fields_restrict_payload_and_queries(api_client, recipe, django_assert_num_queries):
+    with django_assert_num_queries(1):  # ni prefetch categories/labels ni jointure pan
+        r = api_client.get(URL, {"fields": "id,recipe_name"})
+    assert r.status_code == 200
+    assert r.data == [{"id": recipe.id, "recipe_name": "tarte citron"}]
+
+def test_list_expand_relations(api_client, recipe):
+    r = api_client.get(URL, {"fields": "id", "expand": "pan,categories"})
+    assert r.data == [{"id": recipe.id, "pan": {"id": recipe.pan_id, "name": "cercle 22"},
+                       "categories": [{"id": recipe.categories.get().id, "name": "tartes"}]}]
+    default = api_client.get(URL).data[0]
+    assert default["pan"] == recipe.pan_id and "ingredient_count" in default  # sans paramètre : inchangé
+
+def test_retrieve_fields_skip_unrequested_nested_relations(api_client, recipe, django_assert_max_num_queries):
+    with django_assert_max_num_queries(3):  # validateurs ETag + recette + étapes, sans ingrédients ni sous-recettes
+        r = api_client.get(f"{URL}{recipe.id}/", {"fields": "id,recipe_name,steps"})
+    assert r.status_code == 200
+    assert set(r.data) == {"id", "recipe_name", "steps"} and len(r.data["steps"]) == 1
+    assert set(api_client.get(f"{URL}{recipe.id}/").data) >= {"ingredients", "sub_recipes", "categories"}
+
+def test_invalid_fields_or_expand_return_400(api_client, recipe):
+    assert api_client.get(URL, {"fields": "id,secret"}).status_code == 400
+    assert api_client.get(URL, {"expand": "steps"}).status_code == 400
+    # parent_recipe n'est pas rendu par la liste : expansion refusée plutôt qu'ignorée (et sa jointure évitée)
+    assert api_client.get(URL, {"expand": "parent_recipe"}).status_code == 400
+    assert api_client.get(f"{URL}{recipe.id}/", {"expand": "parent_recipe"}).status_code == 200
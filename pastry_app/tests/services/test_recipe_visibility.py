@@ -0,0 +1,94 @@
+# tests/services/test_recipe_visibility.py
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from pastry_app.tests.base_api_test import api_client, base_url
+from pastry_app.models import Recipe, RecipeStep, UserRecipeVisibility
+from pastry_app.utils import visible_recipes, hidden_recipe_ids
+
+pytestmark = pytest.mark.django_db
+
+URL = "/api/recipes/"
+
+User = get_user_model()
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+def make_recipe(name, **kw):
+    r = Recipe.objects.create(recipe_name=name, chef_name="chef", **kw)
+    RecipeStep.objects.create(recipe=r, step_number=1, instruction="mélanger")
+    return r
+
+@pytest.fixture
+def catalog():
+    alice = User.objects.create_user(username="alice", password="testpass123")
+    bob = User.objects.create_user(username="bob", password="testpass123")
+    make_recipe("base", is_default=True)
+    make_recipe("publique", visibility="public", user=bob)
+    make_recipe("privée alice", user=alice)
+    make_recipe("privée bob", user=bob)
+    make_recipe("privée invité", guest_id="guest-1")
+    return {"alice": alice, "bob": bob}
+
+def names(qs):
+    return sorted(qs.values_list("recipe_name", flat=True))
+
+def test_visible_recipes_branches_and_soft_hide(catalog):
+    assert names(visible_recipes()) == ["base", "publique"]
+    assert names(visible_recipes(user=catalog["alice"])) == ["base", "privée alice", "publique"]
+    assert names(visible_recipes(guest_id="guest-1")) == ["base", "privée invité", "publique"]
+
+    base = Recipe.objects.get(recipe_name="base")
+    UserRecipeVisibility.objects.create(user=catalog["alice"], recipe=base, visible=False)
+    UserRecipeVisibility.objects.create(guest_id="guest-1", recipe=base, visible=False)
+    assert names(visible_recipes(user=catalog["alice"])) == ["privée alice", "publique"]
+    assert names(visible_recipes(guest_id="guest-1")) == ["privée invité", "publique"]
+    assert names(visible_recipes(user=catalog["bob"])) == ["base", "privée bob", "publique"]
+
+def test_hidden_set_is_cached_and_excluded_as_literal_ids(catalog, django_assert_num_queries):
+    alice = catalog["alice"]
+    base = Recipe.objects.get(recipe_name="base")
+    assert hidden_recipe_ids() == frozenset() and hidden_recipe_ids(alice) == frozenset()
+
+    UserRecipeVisibility.objects.create(user=alice, recipe=base, visible=False)
+    assert hidden_recipe_ids(alice) == {base.id}
+    sql = str(visible_recipes(user=alice).query).lower()
+    assert "userrecipevisibility" not in sql and "distinct" not in sql  # ids littéraux, pas d'anti-jointure
+    with django_assert_num_queries(2):  # ensemble lu dans le cache partagé + liste
+        assert names(visible_recipes(user=alice)) == ["privée alice", "publique"]
+
+def test_soft_hide_is_visible_on_next_request(api_client, catalog, django_capture_on_commit_callbacks):
+    alice = catalog["alice"]
+    base = Recipe.objects.get(recipe_name="base")
+    api_client.force_authenticate(user=alice)
+    assert "base" in [x["recipe_name"] for x in api_client.get(URL).data]  # ensemble vide mis en cache
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert api_client.delete(f"{URL}{base.id}/").status_code == 204  # recette de base : masquage
+    assert "base" not in [x["recipe_name"] for x in api_client.get(URL).data]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        UserRecipeVisibility.objects.get(user=alice, recipe=base).delete()
+    assert "base" in [x["recipe_name"] for x in api_client.get(URL).data]
+
+def test_visibility_branches_use_partial_indexes(catalog):
+    sql, params = visible_recipes(user=catalog["alice"], guest_id="guest-1").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE pastry_app_recipe")  # statistiques du jeu courant, pas des tests précédents
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute("EXPLAIN " + sql, params)
+        plan = "\n".join(row[0] for row in cursor.fetchall())
+    assert "DISTINCT" not in sql.upper()
+    for index in ("idx_recipe_shared", "idx_recipe_user_private", "idx_recipe_guest_private"):
+        assert index in plan
+
+def test_recipe_list_visibility_for_user_and_guest(api_client, catalog):
+    api_client.force_authenticate(user=catalog["alice"])
+    assert sorted(x["recipe_name"] for x in api_client.get(URL).data) == ["base", "privée alice", "publique"]
+
+    api_client.force_authenticate(user=None)
+    r = api_client.get(URL, HTTP_X_GUEST_ID="guest-1")
+    assert sorted(x["recipe_name"] for x in r.data) == ["base", "privée invité", "publique"]
@@ -0,0 +1,57 @@
+# tests/services/test_reference_list_cache.py
+import pytest
+from django.contrib.auth import get_user_model
+from pastry_app.tests.base_api_test import api_client, base_url
+from pastry_app.models import Category, Label, Pan, Store
+
+pytestmark = pytest.mark.django_db
+
+User = get_user_model()
+
+@pytest.fixture
+def admin():
+    return User.objects.create_user(username="admin", password="testpass123", is_staff=True)
+
+def test_category_list_served_from_cache_until_write(api_client, admin, django_assert_num_queries):
+    Category.objects.create(category_name="tartes", category_type="recipe", created_by=admin)
+    first = api_client.get("/api/categories/")
+    assert [x["category_name"] for x in first.data] == ["tartes"]
+
+    with django_assert_num_queries(2):  # générations + lecture du cache partagé : ni requête de données ni sérialisation
+        again = api_client.get("/api/categories/")
+    assert again.data == first.data and again["ETag"] == first["ETag"]
+
+    api_client.force_authenticate(user=admin)
+    with django_assert_num_queries(2):  # portée commune : même entrée pour tous les appelants
+        assert api_client.get("/api/categories/").data == first.data
+
+    Category.objects.create(category_name="gâteaux", category_type="recipe", created_by=admin)
+    assert [x["category_name"] for x in api_client.get("/api/categories/").data] == ["gâteaux", "tartes"]
+
+def test_query_params_are_part_of_the_key(api_client, admin):
+    Label.objects.create(label_name="vegan", label_type="recipe", created_by=admin)
+    Label.objects.create(label_name="bio", label_type="ingredient", created_by=admin)
+    assert [x["label_name"] for x in api_client.get("/api/labels/", {"label_type": "recipe"}).data] == ["vegan"]
+    assert [x["label_name"] for x in api_client.get("/api/labels/", {"label_type": "ingredient"}).data] == ["bio"]
+    assert len(api_client.get("/api/labels/").data) == 2
+
+def test_owned_lists_are_scoped_by_owner(api_client, django_assert_num_queries):
+    Pan.objects.create(pan_name="cercle 22", pan_type="ROUND", diameter=22, height=2, visibility="public")
+    Pan.objects.create(pan_name="moule perso", pan_type="ROUND", diameter=18, height=4, guest_id="guest-1")
+    Store.objects.create(store_name="carrefour", city="paris", visibility="public")
+
+    assert [x["pan_name"] for x in api_client.get("/api/pans/").data] == ["cercle 22"]
+    r = api_client.get("/api/pans/", HTTP_X_GUEST_ID="guest-1")
+    assert [x["pan_name"] for x in r.data] == ["cercle 22", "moule perso"]
+    with django_assert_num_queries(2):  # générations + lecture du cache partagé
+        assert api_client.get("/api/pans/", HTTP_X_GUEST_ID="guest-1").data == r.data
+
+    stores = api_client.get("/api/stores/").data
+    Store.objects.filter(store_name="carrefour").first().delete()
+    assert api_client.get("/api/stores/").data != stores
+
+def test_per_process_cache_is_rejected_by_system_check(settings):
+    from pastry_app.apps import check_shared_cache
+    assert check_shared_cache(None) == []
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    assert [e.id for e in check_shared_cache(None)] == ["pastry_app.E001"]
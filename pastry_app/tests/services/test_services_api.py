@@ -1060,6 +1060,33 @@ def test_recipes_list__filter_tags_any_all(api_client, base_ingredients):
     all_ids = {it["id"] for it in _extract_items(all_r)}
     assert all_ids == {r2.id}
 
+def test_recipes_list__range_filters(api_client, base_ingredients):
+    """
+    Vérifie les filtres de plage :
+    - servings_min/servings_max : chevauchement avec la plage de portions de la recette,
+    - total_recipe_quantity_min/_max et pan_volume_min/_max (bornes incluses).
+    """
+    small_pan = make_pan_round(name="cercle 10", diameter=10.0, height=4.0, visibility="public")
+    big_pan = make_pan_round(name="cercle 24", diameter=24.0, height=4.0, visibility="public")
+    r_small = make_recipe(name="range-small", servings_min=2, servings_max=4, total_qty=400, pan=small_pan)
+    r_mid = make_recipe(name="range-mid", servings_min=6, servings_max=8, total_qty=1200, pan=big_pan)
+    r_big = make_recipe(name="range-big", servings_min=10, servings_max=20, total_qty=3000)
+    for r in (r_small, r_mid, r_big):
+        add_ingredient(r, ingredient=base_ingredients["farine"], qty=100.0)
+
+    def ids(params):
+        resp = _get(api_client, URL_RECIPES_LIST, params)
+        assert resp.status_code == 200
+        return {it["id"] for it in _extract_items(resp)} & {r_small.id, r_mid.id, r_big.id}
+
+    assert ids({"servings_min": 6, "servings_max": 10}) == {r_mid.id, r_big.id}
+    assert ids({"servings_max": 3}) == {r_small.id}
+    assert ids({"total_recipe_quantity_max": 1500}) == {r_small.id, r_mid.id}
+    assert ids({"total_recipe_quantity_min": 1200, "total_recipe_quantity_max": 1200}) == {r_mid.id}
+    assert ids({"pan_volume_min": 1000}) == {r_mid.id}  # 24 cm × 4 cm ≈ 1,8 L ; 10 cm × 4 cm ≈ 0,3 L
+    assert ids({"created_at_after": "2000-01-01"}) == {r_small.id, r_mid.id, r_big.id}
+    assert ids({"updated_at_before": "2000-01-01"}) == set()
+
 def test_recipes_list__payload_is_light(api_client, recettes_choux):
     """
     Vérifie que la réponse en liste ne contient pas de champs lourds
@@ -1223,6 +1250,55 @@ def test_lego_candidates__default_ordering_by_name_then_recent(api_client, base_
         # même nom → b plus récent doit venir avant a
         assert ids.index(b.id) < ids.index(a.id)
 
+def test_lego_candidates__ranked_by_fit_to_target_quantity(api_client, base_ingredients):
+    """
+    Avec target_quantity + host : variante déjà possédée par l'hôte en tête, puis BASE par proximité
+    du multiplicateur à 1 (|ln m|), non scalables en dernier ; l'hôte et les variantes d'autres hôtes sont exclus.
+    """
+    host = make_recipe(name="lego-host", guest_id="guest-lego", visibility="private")
+    add_ingredient(host, ingredient=base_ingredients["farine"], qty=1)
+    other_host = make_recipe(name="lego-other-host", guest_id="guest-lego", visibility="private")
+    add_ingredient(other_host, ingredient=base_ingredients["farine"], qty=1)
+    exact = make_recipe(name="lego-creme-500", total_qty=500); add_ingredient(exact, ingredient=base_ingredients["farine"], qty=1)
+    double = make_recipe(name="lego-creme-250", total_qty=250); add_ingredient(double, ingredient=base_ingredients["farine"], qty=1)
+    far = make_recipe(name="lego-creme-5000", total_qty=5000); add_ingredient(far, ingredient=base_ingredients["farine"], qty=1)
+    unknown = make_recipe(name="lego-creme-sans-total"); add_ingredient(unknown, ingredient=base_ingredients["farine"], qty=1)
+    Recipe.objects.filter(pk=unknown.pk).update(total_recipe_quantity=None)
+    mine = clone_recipe_for_host(far, host)
+    theirs = clone_recipe_for_host(double, other_host)
+
+    r = _get(api_client, URL_RECIPES_LEGO_CANDIDATES, {"q": "lego-creme", "target_quantity": 500, "host": host.id}, guest_id="guest-lego")
+    assert r.status_code == 200, r.data
+    items = {it["id"]: it for it in _extract_results_or_list(r)}
+    ordered = [i for i in items if i in {mine.id, exact.id, double.id, far.id, unknown.id, theirs.id}]
+    assert ordered == [mine.id, exact.id, double.id, far.id, unknown.id]
+    assert items[mine.id]["is_host_variant"] is True
+    assert items[exact.id]["scale_multiplier"] == 1.0 and items[double.id]["scale_multiplier"] == 2.0
+    assert items[unknown.id]["scale_multiplier"] is None
+
+    r = _get(api_client, URL_RECIPES_LEGO_CANDIDATES, {"q": "lego-creme", "target_quantity": 500, "include_non_scalable": 0})
+    assert unknown.id not in {it["id"] for it in _extract_results_or_list(r)}
+
+    assert _get(api_client, URL_RECIPES_LEGO_CANDIDATES, {"target_quantity": "beaucoup"}).status_code == 400
+    assert _get(api_client, URL_RECIPES_LEGO_CANDIDATES, {"target_quantity": -1}).status_code == 400
+
+def test_lego_candidates__ranked_list_honours_page_size(api_client, base_ingredients):
+    """ Classement par adéquation : liste classée puis découpée en pages (?page_size=, ?page=), jamais complète d'office. """
+    for qty in (500, 450, 1000, 2000, 5000):
+        r = make_recipe(name=f"lego-page-{qty}", total_qty=qty); add_ingredient(r, ingredient=base_ingredients["farine"], qty=1)
+
+    params = {"q": "lego-page", "target_quantity": 500, "page_size": 2}
+    first = _get(api_client, URL_RECIPES_LEGO_CANDIDATES, params)
+    assert first.status_code == 200, first.data
+    assert first.data["count"] == 5 and first.data["next"] and first.data["previous"] is None
+    assert [it["recipe_name"] for it in first.data["results"]] == ["lego-page-500", "lego-page-450"]
+
+    last = _get(api_client, URL_RECIPES_LEGO_CANDIDATES, {**params, "page": 3})
+    assert [it["recipe_name"] for it in last.data["results"]] == ["lego-page-5000"] and last.data["next"] is None
+
+    default = _get(api_client, URL_RECIPES_LEGO_CANDIDATES, {"q": "lego-page", "target_quantity": 500})
+    assert default.data["count"] == 5 and len(default.data["results"]) == 5  # page par défaut bornée (50)
+
 # =========================
 # /recipes/{id}/reference-uses/ — GET
 # =========================
@@ -0,0 +1,122 @@
+# tests/services/test_shopping_basket.py
+import time
+import pytest
+from pastry_app.tests.base_api_test import api_client, base_url
+from pastry_app.models import Ingredient, Store, IngredientPrice, IngredientUnitReference
+from pastry_app.utils import optimize_shopping_basket, _cheapest_packs
+
+pytestmark = pytest.mark.django_db
+
+URL = "/api/shopping-basket/optimize/"
+
+@pytest.fixture
+def catalog():
+    farine = Ingredient.objects.create(ingredient_name="farine", visibility="public")
+    sucre = Ingredient.objects.create(ingredient_name="sucre", visibility="public")
+    lait = Ingredient.objects.create(ingredient_name="lait", visibility="public")
+    IngredientUnitReference.objects.create(ingredient=lait, unit="l", weight_in_grams=1030)
+    s1 = Store.objects.create(store_name="carrefour", city="paris", visibility="public")
+    s2 = Store.objects.create(store_name="lidl", city="paris", visibility="public")
+    IngredientPrice.objects.create(ingredient=farine, store=s1, brand_name="francine", quantity=1, unit="kg", price=1.50)
+    IngredientPrice.objects.create(ingredient=farine, store=s2, brand_name="bio", quantity=1, unit="kg", price=1.00)
+    IngredientPrice.objects.create(ingredient=sucre, store=s1, brand_name="daddy", quantity=1, unit="kg", price=1.20)
+    IngredientPrice.objects.create(ingredient=sucre, store=s2, brand_name="daddy", quantity=1, unit="kg", price=1.90)
+    IngredientPrice.objects.create(ingredient=lait, store=s1, brand_name="lactel", quantity=1, unit="l", price=1.10)
+    return {"farine": farine, "sucre": sucre, "lait": lait, "s1": s1, "s2": s2}
+
+def test_cheapest_packs_mixes_formats():
+    # 1,5 kg : 1 × 1 kg + 1 × 500 g (2,90) moins cher que 2 × 1 kg (3,60) ou 3 × 500 g (3,30)
+    packs = [(1000, 1.80, "1kg"), (500, 1.10, "500g")]
+    cost, parts, purchased = _cheapest_packs(1500, packs)
+    assert cost == pytest.approx(2.90)
+    assert sorted(parts) == [("1kg", 1), ("500g", 1)]
+    assert purchased == 1500
+
+def test_optimize_without_cap_picks_cheapest_store_per_ingredient():
+    offers = {1: {10: [(1000, 2.0, "a")], 11: [(1000, 1.0, "b")]},
+              2: {10: [(1000, 1.0, "c")], 11: [(1000, 2.0, "d")]}}
+    res = optimize_shopping_basket({10: 800, 11: 800}, offers)
+    assert res["total"] == pytest.approx(2.0)
+    assert res["assignment"][10][0] == 2 and res["assignment"][11][0] == 1
+    assert res["missing"] == []
+
+def test_optimize_respects_max_stores_and_reports_missing():
+    offers = {1: {10: [(1000, 2.0, "a")], 11: [(1000, 1.0, "b")]},
+              2: {10: [(1000, 1.0, "c")], 11: [(1000, 2.5, "d")]}}
+    res = optimize_shopping_basket({10: 800, 11: 800, 12: 100}, offers, max_stores=1)
+    assert {a[0] for a in res["assignment"].values()} == {1}
+    assert res["total"] == pytest.approx(3.0)
+    assert res["missing"] == [12]
+    assert res["solver"] == "exact"
+
+def test_optimize_is_interactive_on_large_lists():
+    n_ings, n_stores = 300, 40
+    offers = {s: {i: [(1000, 1 + ((i * 7 + s * 13) % 17) / 10, None), (250, 0.4 + ((i + s) % 5) / 10, None)]
+                  for i in range(n_ings) if (i + s) % 3} for s in range(n_stores)}
+    needs = {i: 1200 + (i % 9) * 100 for i in range(n_ings)}
+    start = time.perf_counter()
+    res = optimize_shopping_basket(needs, offers, max_stores=3)
+    assert time.perf_counter() - start < 1.0
+    assert res["solver"] == "greedy"
+    assert len({a[0] for a in res["assignment"].values()}) <= 3
+    assert res["missing"] == []
+
+def test_optimize_uses_greedy_on_realistic_basket():
+    # 300 ingrédients, 20 magasins, 3 visités : C(20, 3) × 300 × 3 ≈ 1 M > BASKET_EXACT_BUDGET
+    n_ings, n_stores = 300, 20
+    offers = {s: {i: [(500, 0.5 + ((i * 3 + s * 11) % 13) / 10, None), (100, 0.15 + ((i + 2 * s) % 7) / 20, None)]
+                  for i in range(n_ings) if (i * s + 1) % 4} for s in range(n_stores)}
+    needs = {i: 50 + (i % 12) * 125 for i in range(n_ings)}
+    start = time.perf_counter()
+    res = optimize_shopping_basket(needs, offers, max_stores=3)
+    assert time.perf_counter() - start < 0.5
+    assert res["solver"] == "greedy"
+    assert len({a[0] for a in res["assignment"].values()}) <= 3
+    assert res["missing"] == []
+
+def test_api_splits_basket_between_stores(api_client, catalog):
+    payload = {"items": [
+        {"ingredient_id": catalog["farine"].id, "quantity": 1.5, "unit": "kg"},
+        {"ingredient_id": catalog["sucre"].id, "quantity": 500},
+        {"ingredient_id": catalog["lait"].id, "quantity": 0.5, "unit": "l"},
+    ]}
+    r = api_client.post(URL, payload, format="json")
+    assert r.status_code == 200, r.data
+    by_store = {b["store_id"]: b for b in r.data["stores"]}
+    assert set(by_store) == {catalog["s1"].id, catalog["s2"].id}
+    farine = by_store[catalog["s2"].id]["items"][0]
+    assert farine["packages"][0]["count"] == 2 and farine["cost"] == 2.0
+    assert r.data["total_cost"] == pytest.approx(2.0 + 1.2 + 1.1)
+
+def test_api_max_stores_one(api_client, catalog):
+    payload = {"max_stores": 1, "items": [
+        {"ingredient_id": catalog["farine"].id, "quantity": 1000},
+        {"ingredient_id": catalog["sucre"].id, "quantity": 1000},
+        {"ingredient_id": catalog["lait"].id, "quantity": 1, "unit": "l"},
+    ]}
+    r = api_client.post(URL, payload, format="json")
+    assert r.status_code == 200
+    assert [b["store_id"] for b in r.data["stores"]] == [catalog["s1"].id]
+    assert r.data["total_cost"] == pytest.approx(1.5 + 1.2 + 1.1)
+
+def test_api_ignores_private_stores_of_others(api_client, catalog):
+    hidden = Store.objects.create(store_name="epicerie", city="lyon", visibility="private", guest_id="other-guest")
+    IngredientPrice.objects.create(ingredient=catalog["sucre"], store=hidden, quantity=1, unit="kg", price=0.10)
+    r = api_client.post(URL, {"items": [{"ingredient_id": catalog["sucre"].id, "quantity": 1000}]}, format="json")
+    assert r.status_code == 200
+    assert [b["store_id"] for b in r.data["stores"]] == [catalog["s1"].id]
+
+def test_api_unknown_ingredient_and_unconvertible_unit(api_client, catalog):
+    r = api_client.post(URL, {"items": [{"ingredient_id": 999999, "quantity": 10}]}, format="json")
+    assert r.status_code == 400
+    r = api_client.post(URL, {"items": [{"ingredient_id": catalog["farine"].id, "quantity": 2, "unit": "cup"}]}, format="json")
+    assert r.status_code == 400
+    assert "error" in r.data
+
+def test_api_rejects_private_ingredients_of_others(api_client, catalog):
+    vanille = Ingredient.objects.create(ingredient_name="vanille", guest_id="other-guest")
+    IngredientPrice.objects.create(ingredient=vanille, store=catalog["s1"], quantity=10, unit="g", price=3.50)
+    payload = {"items": [{"ingredient_id": vanille.id, "quantity": 10}]}
+    assert api_client.post(URL, payload, format="json").status_code == 400  # ni nom ni prix divulgués
+    r = api_client.post(URL, payload, format="json", HTTP_X_GUEST_ID="other-guest")
+    assert r.status_code == 200 and r.data["total_cost"] == pytest.approx(3.50)
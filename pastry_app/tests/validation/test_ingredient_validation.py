@@ -13,6 +13,7 @@ pytestmark = pytest.mark.django_db
 # Création
 # test_create_ingredient_without_name → Vérifie qu'on ne peut PAS créer un ingrédient sans ingredient_name.
 # test_create_duplicate_ingredient → Vérifie qu'on ne peut PAS créer un ingrédient avec un nom déjà existant.
+# test_create_duplicate_ingredient_ignores_accents → Vérifie que "creme" est un doublon de "Crème".
 # test_create_ingredient_with_nonexistent_category → Vérifie qu'on ne peut PAS associer une catégorie inexistante.
 # test_create_ingredient_with_nonexistent_label → Vérifie qu'on ne peut PAS associer un label inexistant.
 
@@ -67,6 +68,15 @@ def test_create_duplicate_ingredient(api_client, base_url):
     assert response2.status_code == status.HTTP_400_BAD_REQUEST
     assert "ingredient_name" in response2.json()
 
+def test_create_duplicate_ingredient_ignores_accents(api_client, base_url):
+    """ Vérifie que la détection de doublon ignore les accents et ligatures ("Crème d'œuf" == "creme d'oeuf") """
+    url = base_url(model_name)
+    assert api_client.post(url, {"ingredient_name": "Crème d'œuf"}, format="json").status_code == status.HTTP_201_CREATED
+    response = api_client.post(url, {"ingredient_name": "creme d'oeuf"}, format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "ingredient_name" in response.json()
+    assert Ingredient.objects.filter(ingredient_name__nexact="CRÈME  D'ŒUF").count() == 1
+
 def test_create_ingredient_with_nonexistent_category(api_client, base_url):
     """ Vérifie qu'on ne peut PAS créer un ingrédient avec une catégorie inexistante et que le message est clair """
     url = base_url(model_name)
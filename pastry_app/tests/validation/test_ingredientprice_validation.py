@@ -1,4 +1,5 @@
 import pytest
+from datetime import date, timedelta
 from rest_framework import status
 from pastry_app.tests.base_api_test import api_client, base_url
 from pastry_app.tests.utils import *
@@ -172,7 +173,7 @@ def test_patch_soft_fields_ok(api_client, base_url, ingredient_price):
     url = f"{base_url('ingredient_prices')}{ingredient_price.id}/"
     resp = api_client.patch(url, {"is_promo": True}, format="json")
     assert resp.status_code == 200
-    resp2 = api_client.patch(url, {"promotion_end_date": "2026-02-01", "is_promo": True}, format="json")
+    resp2 = api_client.patch(url, {"promotion_end_date": (date.today() + timedelta(days=30)).isoformat(), "is_promo": True}, format="json")
     assert resp2.status_code == 200
 
 def test_api_delete_no_archive(api_client, base_url, ingredient_price):
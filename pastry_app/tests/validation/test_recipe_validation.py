@@ -121,6 +121,16 @@ def test_update_to_duplicate_recipe_api(api_client, base_url, user):
     data2 = base_recipe_data(recipe_name="Recette B", chef_name="Chef B", context_name="Instagram", source="Livre A")
     validate_update_to_duplicate_api(api_client, base_url, model_name, data1, data2, create_initiate=False)
 
+def test_duplicate_recipe_context_ignores_case_and_accents_api(api_client, base_url, user):
+    """ Vérifie que le contexte est comparé comme le nom et le chef ("Pâtisserie maison" == "patisserie maison"). """
+    api_client.force_authenticate(user=user)
+    first = api_client.post(base_url(model_name), base_recipe_data(context_name="Pâtisserie maison"), format="json")
+    assert first.status_code == 201
+    response = api_client.post(base_url(model_name), base_recipe_data(recipe_name="tarte normande",
+                                                                       context_name="PATISSERIE MAISON"), format="json")
+    assert response.status_code == 400
+    assert "Une recette avec ce nom, ce chef et ce contexte existe déjà." in str(response.data)
+
 # ----------------------------------------
 # Logique métier : parent, variation, cycles, contenu
 # ----------------------------------------
@@ -73,6 +73,14 @@ def test_delete_store_used_in_prices(api_client, base_url, related_models, user)
     expected_error = "Ce magasin est associé à des prix d'ingrédients et ne peut pas être supprimé."
     validate_protected_delete_api(api_client, base_url, model_name, related_models, expected_error, user=user)
 
+def test_duplicate_store_ignores_accents_api(api_client, base_url):
+    """ Vérifie qu'un doublon ne différant que par les accents ("Créteil" / "creteil") est refusé. """
+    url = base_url(model_name)
+    assert api_client.post(url, {"store_name": "Épicerie Ça Va", "city": "Créteil"}, format="json").status_code == status.HTTP_201_CREATED
+    response = api_client.post(url, {"store_name": "epicerie ca va", "city": "creteil"}, format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "Ce magasin existe déjà." in str(response.json())
+
 def test_store_requires_city_or_zip_code_or_address_api(api_client, base_url):
     """ Vérifie qu'un store ne peut pas être créé sans au moins une `city` ou `zip_code` ou `address` en API. """
     url = base_url(model_name)
@@ -1,5 +1,18 @@
+import unicodedata
+
 def normalize_case(value):
     """ Normalise une chaîne (minuscules, strip, espaces) """
     if isinstance(value, str):  # Vérifie que c'est bien une chaîne
         return " ".join(value.strip().lower().split())  
     return value  # Retourne la valeur telle quelle si ce n'est pas une chaîne
+
+# Ligatures que la décomposition NFKD ne sépare pas (alignées sur unaccent côté PostgreSQL)
+_LIGATURES = str.maketrans({"œ": "oe", "æ": "ae", "ß": "ss"})
+
+def fold_accents(value):
+    """ normalize_case + suppression des accents ("Crème" → "creme", "Œuf" → "oeuf"), équivalent Python de search_normalize() """
+    value = normalize_case(value)
+    if isinstance(value, str):
+        value = value.translate(_LIGATURES)
+        return "".join(c for c in unicodedata.normalize("NFKD", value) if not unicodedata.combining(c))
+    return value
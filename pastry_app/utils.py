@@ -1,11 +1,13 @@
 import math
+import threading
+from collections import namedtuple
 from typing import Optional
 from django.core.exceptions import ValidationError
 from django.db import models as django_models
 from django.db import transaction
 from django.db.models.functions import Abs
 from .models import Pan, Recipe, IngredientUnitReference, SubRecipe, RecipeIngredient, RecipeStep
-from .text_utils import normalize_case
+from .text_utils import normalize_case, fold_accents
 from .constants import SERVING_VOLUME_ML
 
 """
@@ -1352,10 +1354,63 @@ def create_variant_for_host_and_rewire(subrecipe: SubRecipe, host: Recipe, *, us
     subrecipe.save(update_fields=["sub_recipe"])
     return variant
 
+def rank_lego_candidates(qs, *, target_quantity=None, target_servings=None, host=None, include_non_scalable=True):
+    """
+    Classe des candidats LEGO selon leur adéquation au besoin de l'hôte, en une requête annotée
+    (totaux et portions précalculés, aucune adaptation exécutée).
+
+    Annotations:
+      - scale_multiplier : target_quantity / total_recipe_quantity, sinon target_servings / portions moyennes ;
+        NULL si la recette n'est pas scalable (total ou portions inconnus).
+      - fit_distance : |ln(multiplier)| (0 = quantité exacte ; ×2 et ×0,5 sont équidistants).
+      - is_host_variant : variante déjà possédée par `host` (réutilisable telle quelle).
+
+    Avec `host` : exclut l'hôte lui-même, les recettes qui l'utilisent directement (cycle) et les variantes
+    possédées par un autre hôte.
+    Tri : variante de l'hôte > BASE > VARIATION, puis fit_distance croissante (non scalables en dernier), puis nom.
+    """
+    from django.db.models import Case, ExpressionWrapper, F, FloatField, Value, When
+    from django.db.models.functions import Ln, NullIf
+
+    if target_quantity is not None:
+        multiplier = ExpressionWrapper(Value(float(target_quantity)) / NullIf(F("total_recipe_quantity"), Value(0.0)),
+                                       output_field=FloatField())
+    elif target_servings is not None:
+        servings = ExpressionWrapper((F("servings_min") + F("servings_max")) / Value(2.0), output_field=FloatField())
+        multiplier = ExpressionWrapper(Value(float(target_servings)) / NullIf(servings, Value(0.0)), output_field=FloatField())
+    else:
+        multiplier = Value(None, output_field=FloatField())
+
+    if host is not None:
+        qs = (qs.exclude(pk=host.pk).exclude(main_recipes__sub_recipe=host)
+                .filter(django_models.Q(owned_by_recipe__isnull=True) | django_models.Q(owned_by_recipe=host)))
+        is_host_variant = Case(When(owned_by_recipe=host, then=Value(True)), default=Value(False))
+    else:
+        is_host_variant = Value(False)
+
+    qs = qs.annotate(scale_multiplier=multiplier,
+                     fit_distance=Abs(Ln(F("scale_multiplier"))),
+                     is_host_variant=is_host_variant,
+                     type_rank=Case(When(recipe_type="BASE", then=Value(0)), default=Value(1)))
+    if not include_non_scalable:
+        qs = qs.filter(scale_multiplier__isnull=False)
+    return qs.order_by("-is_host_variant", "type_rank", F("fit_distance").asc(nulls_last=True), "recipe_name")
+
 # ============================================================
 # 8. UTILS FRONT : CREATION TREE
 # ============================================================
 
+def recipe_tree_prefetch_lookups(depth=2):
+    """
+    Lookups prefetch_related de l'arbre lu par build_tree_from_db : ingrédients, étapes et sous-recettes
+    jusqu'à `depth` niveaux d'imbrication (au-delà, chargement paresseux). Une requête par relation et par niveau.
+    """
+    lookups = []
+    for level in range(depth + 1):
+        prefix = "main_recipes__sub_recipe__" * level
+        lookups += [f"{prefix}recipe_ingredients", f"{prefix}steps", f"{prefix}main_recipes__sub_recipe"]
+    return tuple(lookups)
+
 def build_tree_from_db(recipe):
     """
     Construit l’arbre hiérarchique d’une recette depuis l’ORM.
@@ -1373,6 +1428,7 @@ def build_tree_from_db(recipe):
         "subrecipes": [ {**<noeud enfant>, "link_quantity": float, "link_unit": str} ]
       }
     """
+    # .all() : relations servies par recipe_tree_prefetch_lookups() si préchargées, sinon requêtées
     node = {
         "recipe_id": recipe.id,
         "recipe_name": getattr(recipe, "recipe_name", None),
@@ -1385,7 +1441,7 @@ def build_tree_from_db(recipe):
                 "quantity": ri.quantity,  # non-scalé
                 "unit": ri.unit,
             }
-            for ri in recipe.recipe_ingredients.select_related("ingredient").all()
+            for ri in recipe.recipe_ingredients.all()
         ],
         "steps": [
             {
@@ -1394,13 +1450,13 @@ def build_tree_from_db(recipe):
                 "instruction": s.instruction,
                 "trick": getattr(s, "trick", None),
             }
-            for s in recipe.steps.order_by("step_number", "id").all()
+            for s in sorted(recipe.steps.all(), key=lambda s: (s.step_number is None, s.step_number or 0, s.id))
         ],
         "subrecipes": [],
     }
 
     # Liens vers sous-recettes avec méta du lien (quantity, unit)
-    for link in recipe.main_recipes.select_related("sub_recipe").all():
+    for link in recipe.main_recipes.all():
         child = build_tree_from_db(link.sub_recipe)
         child["link_quantity"] = link.quantity
         child["link_unit"] = link.unit
@@ -1561,3 +1617,1894 @@ def compose_full(recipe, scaled_data=None):
         "flat_ingredients": flatten_ingredients(tree),
         "flat_steps": flatten_steps(tree),
     }
+
+# ============================================================
+# 9. OPTIMISATION DU PANIER MULTI-MAGASINS
+# ============================================================
+
+BASKET_EXACT_BUDGET = 200_000   # nb max (combinaisons de magasins × ingrédients × magasins par combinaison) pour la
+                                # recherche exhaustive : ~0,1 à 0,25 µs l'unité mesurés, soit quelques dizaines de ms
+BASKET_PAIR_SCAN = 200          # nb max de quantités testées pour l'assemblage de deux formats
+BASKET_SWAP_PASSES = 3          # nb max de passes d'amélioration locale (échange d'un magasin)
+
+def _prefill_unit_cache(ingredient_ids, units, *, user=None, guest_id=None, cache=None):
+    """
+    Pré-remplit le cache de _get_coeff_to_grams en une seule requête pour un lot d'ingrédients.
+    Même priorité que _get_coeff_to_grams : référence user/guest active, sinon référence globale active.
+    """
+    if cache is None:
+        cache = {}
+    units = {u for u in units if u not in ("g", "kg", "mg")}
+    if not ingredient_ids or not units:
+        return cache
+
+    owner_q = django_models.Q(user__isnull=True, guest_id__isnull=True)
+    if user:
+        owner_q |= django_models.Q(user=user, guest_id=guest_id)
+    elif guest_id:
+        owner_q |= django_models.Q(user__isnull=True, guest_id=guest_id)
+
+    refs = (IngredientUnitReference.objects
+            .filter(owner_q, ingredient_id__in=ingredient_ids, unit__in=units, is_hidden=False)
+            .values_list("ingredient_id", "unit", "weight_in_grams", "user_id", "guest_id"))
+    user_id = user.id if user else None
+    for ing_id, unit, weight, ref_user_id, ref_guest_id in refs:
+        key = (ing_id, unit, user_id, guest_id)
+        is_specific = ref_user_id is not None or ref_guest_id is not None
+        # la référence spécifique l'emporte sur la globale
+        if is_specific or key not in cache:
+            cache[key] = float(weight)
+    return cache
+
+def _cheapest_packs(need_g, packs):
+    """
+    Couvre un besoin (en grammes) avec des formats de vente indivisibles, au moindre coût.
+
+    packs: list[(pack_g, price, payload)]
+    Stratégie bornée : un seul format arrondi au supérieur, ou l'assemblage de deux formats
+    (n_i × format i complété par format j), en testant au plus BASKET_PAIR_SCAN valeurs de n_i.
+
+    Retourne (cost, [(payload, count)], purchased_g) ou None si aucun format.
+    À coût égal, on privilégie la plus petite quantité achetée.
+    """
+    best = None
+
+    def _consider(parts):
+        nonlocal best
+        cost = sum(packs[i][1] * n for i, n in parts)
+        purchased = sum(packs[i][0] * n for i, n in parts)
+        if best is None or (cost, purchased) < (best[0], best[2]):
+            best = (cost, [(packs[i][2], n) for i, n in parts if n > 0], purchased)
+
+    for i, (g_i, _, _) in enumerate(packs):
+        _consider([(i, math.ceil(need_g / g_i - 1e-9))])
+        n_max = int(need_g // g_i)
+        for j, (g_j, _, _) in enumerate(packs):
+            if j == i:
+                continue
+            for n_i in range(n_max, max(0, n_max - BASKET_PAIR_SCAN), -1):
+                rest = need_g - n_i * g_i
+                n_j = math.ceil(rest / g_j - 1e-9) if rest > 1e-9 else 0
+                _consider([(i, n_i), (j, n_j)])
+    return best
+
+def optimize_shopping_basket(needs_g, offers, max_stores=None):
+    """
+    Répartit une liste de courses entre magasins pour minimiser le coût total.
+
+    Args:
+        needs_g (dict[int, float]): besoin par ingrédient, en grammes.
+        offers (dict[store_id, dict[ingredient_id, list[(pack_g, price, payload)]]]): formats disponibles.
+        max_stores (int|None): nombre max de magasins visités (None = pas de limite).
+
+    Méthode:
+      1. Coût minimal de chaque ingrédient dans chaque magasin (_cheapest_packs).
+      2. Sans limite : chaque ingrédient va dans son magasin le moins cher (optimal).
+      3. Avec limite k : recherche exhaustive sur les sous-ensembles de k magasins si
+         C(n, k) × nb_ingrédients × k ≤ BASKET_EXACT_BUDGET, sinon glouton + échanges locaux.
+      Objectif lexicographique : (nb d'ingrédients non couverts, coût total).
+
+    Returns:
+        dict {
+          "assignment": {ingredient_id: (store_id, cost, [(payload, count)], purchased_g)},
+          "total": float, "missing": [ingredient_id], "solver": "exact"|"greedy"
+        }
+    """
+    from itertools import combinations
+
+    store_ids = [sid for sid in offers if offers[sid]]
+    ing_ids = [ing for ing, need in needs_g.items() if need > 0]
+
+    # 1) Table des coûts : rows[i][s] = coût (inf si indisponible)
+    solutions = {}
+    for s_idx, sid in enumerate(store_ids):
+        for ing in ing_ids:
+            packs = offers[sid].get(ing)
+            if packs:
+                solutions[(ing, s_idx)] = _cheapest_packs(needs_g[ing], packs)
+
+    missing = [ing for ing in ing_ids if not any((ing, s) in solutions for s in range(len(store_ids)))]
+    covered = [ing for ing in ing_ids if ing not in missing]
+    rows = [[solutions[(ing, s)][0] if (ing, s) in solutions else math.inf for s in range(len(store_ids))] for ing in covered]
+
+    def _evaluate(mins):
+        uncovered = sum(1 for m in mins if m == math.inf)
+        return (uncovered, sum(m for m in mins if m != math.inf))
+
+    def _mins_for(subset):
+        return [min(row[s] for s in subset) for row in rows]
+
+    n_stores = len(store_ids)
+    solver = "exact"
+    if not max_stores or max_stores >= n_stores:
+        chosen = list(range(n_stores))
+    elif math.comb(n_stores, max_stores) * max(1, len(rows)) * max_stores <= BASKET_EXACT_BUDGET:
+        chosen, best_obj = None, None
+        for subset in combinations(range(n_stores), max_stores):
+            obj = _evaluate(_mins_for(subset))
+            if best_obj is None or obj < best_obj:
+                chosen, best_obj = list(subset), obj
+    else:
+        solver = "greedy"
+        # Glouton : on ajoute à chaque tour le magasin qui réduit le plus l'objectif
+        chosen, current = [], [math.inf] * len(rows)
+        while len(chosen) < max_stores:
+            best_s, best_obj = None, None
+            for s in range(n_stores):
+                if s in chosen:
+                    continue
+                obj = _evaluate([min(c, row[s]) for c, row in zip(current, rows)])
+                if best_obj is None or obj < best_obj:
+                    best_s, best_obj = s, obj
+            chosen.append(best_s)
+            current = [min(c, row[best_s]) for c, row in zip(current, rows)]
+        # Amélioration locale : échange d'un magasin retenu contre un magasin écarté
+        best_obj = _evaluate(current)
+        for _ in range(BASKET_SWAP_PASSES):
+            improved = False
+            for pos in range(len(chosen)):
+                for s in range(n_stores):
+                    if s in chosen:
+                        continue
+                    candidate = chosen[:pos] + [s] + chosen[pos + 1:]
+                    obj = _evaluate(_mins_for(candidate))
+                    if obj < best_obj:
+                        chosen, best_obj, improved = candidate, obj, True
+            if not improved:
+                break
+
+    # 2) Affectation finale : magasin le moins cher parmi les magasins retenus
+    assignment = {}
+    for ing, row in zip(covered, rows):
+        s_best = min(chosen, key=lambda s: row[s])
+        if row[s_best] == math.inf:
+            missing.append(ing)
+            continue
+        cost, parts, purchased = solutions[(ing, s_best)]
+        assignment[ing] = (store_ids[s_best], cost, parts, purchased)
+
+    return {
+        "assignment": assignment,
+        "total": sum(a[1] for a in assignment.values()),
+        "missing": missing,
+        "solver": solver,
+    }
+
+def build_shopping_basket(items, stores, *, max_stores=None, user=None, guest_id=None, today=None):
+    """
+    Calcule le panier optimal multi-magasins à partir d'une liste de courses.
+
+    Args:
+        items (list[dict]): [{"ingredient_id", "quantity", "unit"}], doublons cumulés.
+        stores (QuerySet[Store]): magasins autorisés (visibles par l'appelant).
+        max_stores (int|None): nombre max de magasins visités.
+
+    Données : prix courants IngredientPrice (une requête), promos expirées ignorées,
+    formats convertis en grammes via IngredientUnitReference (cache pré-rempli en une requête).
+
+    Returns:
+        dict { "stores": [{store_id, store_name, city, items, subtotal}], "total_cost",
+               "missing": [{ingredient_id, ingredient_name, reason}], "max_stores", "solver" }
+    """
+    from django.utils.timezone import now
+    from .models import IngredientPrice, Ingredient
+
+    today = today or now().date()
+    cache = {}
+    ingredient_ids = {int(it["ingredient_id"]) for it in items}
+    _prefill_unit_cache(ingredient_ids, {it["unit"] for it in items}, user=user, guest_id=guest_id, cache=cache)
+
+    # 1) Besoins consolidés en grammes
+    needs_g = {}
+    for it in items:
+        ing_id = int(it["ingredient_id"])
+        grams = convert_amount_for_ingredient(ing_id, it["quantity"], it["unit"], "g", user=user, guest_id=guest_id, cache=cache)
+        needs_g[ing_id] = needs_g.get(ing_id, 0.0) + grams
+
+    # 2) Offres : prix courants des magasins autorisés
+    prices = list(
+        IngredientPrice.objects
+        .filter(ingredient_id__in=ingredient_ids, store__in=stores, quantity__gt=0)
+        .exclude(unit="qs")
+        .exclude(is_promo=True, promotion_end_date__lt=today)
+        .select_related("store")
+    )
+    _prefill_unit_cache(ingredient_ids, {p.unit for p in prices}, user=user, guest_id=guest_id, cache=cache)
+
+    offers, store_objs, unconvertible = {}, {}, set()
+    for p in prices:
+        try:
+            pack_g = p.quantity * _get_coeff_to_grams(p.ingredient_id, p.unit, user=user, guest_id=guest_id, cache=cache)
+        except ValidationError:
+            unconvertible.add(p.ingredient_id)
+            continue
+        store_objs[p.store_id] = p.store
+        offers.setdefault(p.store_id, {}).setdefault(p.ingredient_id, []).append((pack_g, float(p.price), p))
+
+    result = optimize_shopping_basket(needs_g, offers, max_stores=max_stores)
+
+    # 3) Mise en forme par magasin
+    names = dict(Ingredient.objects.filter(id__in=ingredient_ids).values_list("id", "ingredient_name"))
+    by_store = {}
+    for ing_id, (store_id, cost, parts, purchased) in result["assignment"].items():
+        by_store.setdefault(store_id, []).append({
+            "ingredient_id": ing_id,
+            "ingredient_name": names.get(ing_id),
+            "needed_quantity_g": round(needs_g[ing_id], 3),
+            "purchased_quantity_g": round(purchased, 3),
+            "cost": round(cost, 2),
+            "packages": [{
+                "price_id": p.id, "brand_name": p.brand_name,
+                "quantity": p.quantity, "unit": p.unit, "price": p.price,
+                "is_promo": p.is_promo, "count": count,
+            } for p, count in parts],
+        })
+
+    baskets = []
+    for store_id, lines in by_store.items():
+        store = store_objs[store_id]
+        lines.sort(key=lambda l: l["ingredient_name"] or "")
+        baskets.append({
+            "store_id": store_id, "store_name": store.store_name, "city": store.city,
+            "items": lines, "subtotal": round(sum(l["cost"] for l in lines), 2),
+        })
+    baskets.sort(key=lambda b: -b["subtotal"])
+
+    missing = [{
+        "ingredient_id": ing_id,
+        "ingredient_name": names.get(ing_id),
+        "reason": "unconvertible_unit" if ing_id in unconvertible else "no_price",
+    } for ing_id in sorted(result["missing"])]
+
+    return {
+        "stores": baskets,
+        "total_cost": round(result["total"], 2),
+        "missing": missing,
+        "max_stores": max_stores,
+        "solver": result["solver"],
+    }
+
+# ============================================================
+# 10. COÛT DE RECETTE À DATE (HISTORIQUE DES PRIX)
+# ============================================================
+
+COST_GRANULARITIES = ("day", "week", "month")
+COST_SERIES_MAX_POINTS = 750    # garde-fou : nb max de dates dans une série de coûts
+
+def recipe_ingredient_grams(recipe, *, user=None, guest_id=None, cache=None):
+    """
+    Besoin total par ingrédient (en grammes) pour une recette, sous-recettes comprises.
+    S'appuie sur scale_recipe_globally(recipe, 1.0) pour la répartition des sous-recettes.
+    Les unités "qs" et les unités sans IngredientUnitReference sont ignorées (avertissement).
+
+    Returns:
+        (dict[int, float], list[dict]) : grammes par ingrédient, avertissements.
+    """
+    if cache is None:
+        cache = {}
+    scaled = scale_recipe_globally(recipe, 1.0, user=user, guest_id=guest_id, cache=cache)
+
+    rows = []
+    def _walk(node):
+        rows.extend(node.get("ingredients", []))
+        for sub in node.get("subrecipes", []):
+            _walk(sub)
+    _walk(scaled)
+
+    _prefill_unit_cache({r["ingredient_id"] for r in rows}, {r["unit"] for r in rows}, user=user, guest_id=guest_id, cache=cache)
+    grams, warnings = {}, []
+    for r in rows:
+        if r["unit"] == "qs":
+            continue
+        try:
+            g = convert_amount_for_ingredient(r["ingredient_id"], r["quantity"], r["unit"], "g", user=user, guest_id=guest_id, cache=cache)
+        except ValidationError as e:
+            warnings.append({"ingredient_id": r["ingredient_id"], "message": e.messages[0]})
+            continue
+        grams[r["ingredient_id"]] = grams.get(r["ingredient_id"], 0.0) + g
+    return grams, warnings
+
+def _load_price_timelines(ingredient_ids, start, end, *, store_ids=None):
+    """
+    Charge en bloc les points de prix (IngredientPriceHistory + IngredientPrice) utiles pour [start, end].
+
+    Requêtes (index (ingredient, date)) :
+      1. Dernier prix normal ≤ start par produit (DISTINCT ON sur le tuple produit).
+      2. Points dans ]start, end] + promos antérieures encore actives à start.
+      3. Prix courants (IngredientPrice) datés ≤ end : dernier point de chaque produit.
+    Les périodes archivées hors base (archive_price_history) ne sont relues depuis les fichiers d'archive que
+    si la plage demandée les recouvre, ou si un ingrédient n'a aucun prix normal ≤ start en base.
+
+    Returns:
+        dict[tuple_produit, list[(date, price, quantity, unit, is_promo, promotion_end_date)]] trié par date.
+        tuple_produit = (ingredient_id, store_id, brand_name, quantity, unit)
+    """
+    from bisect import insort
+    from .models import IngredientPrice, IngredientPriceHistory
+
+    product = ("ingredient_id", "store_id", "brand_name", "quantity", "unit")
+    fields = ("ingredient_id", "store_id", "brand_name", "quantity", "unit", "date", "price", "is_promo", "promotion_end_date")
+
+    history = IngredientPriceHistory.objects.filter(ingredient_id__in=ingredient_ids)
+    current = IngredientPrice.objects.filter(ingredient_id__in=ingredient_ids, date__lte=end)
+    if store_ids:
+        history = history.filter(store_id__in=store_ids)
+        current = current.filter(store_id__in=store_ids)
+
+    baseline = (history.filter(date__lte=start, is_promo=False)
+                .order_by(*product, "-date").distinct(*product).values_list(*fields))
+    window = (history.filter(django_models.Q(date__gt=start, date__lte=end)
+                             | django_models.Q(date__lte=start, is_promo=True, promotion_end_date__gte=start)
+                             | django_models.Q(date__lte=start, is_promo=True, promotion_end_date__isnull=True))
+              .values_list(*fields))
+
+    baseline, window, current = list(baseline), list(window), list(current.values_list(*fields))
+    # Ingrédients dont la référence ≤ start est en base : inutile de la chercher dans les archives
+    priced = {r[0] for r in baseline} | {r[0] for r in current if r[5] <= start and not r[7]}
+    archived = [tuple(r[f] for f in fields)
+                for r in load_archived_price_history(ingredient_ids, end, start=start, priced_ids=priced, store_ids=store_ids)]
+
+    timelines = {}
+    for row in (*archived, *baseline, *window, *current):
+        ing_id, store_id, brand, qty, unit, day, price, is_promo, promo_end = row
+        if day is None:
+            continue
+        insort(timelines.setdefault((ing_id, store_id, brand, qty, unit), []), (day, price, qty, unit, is_promo, promo_end))
+    return timelines
+
+def _price_in_effect(points, day):
+    """
+    Point de prix en vigueur à `day` : dernier point daté ≤ day, en ignorant les promos expirées à cette date.
+    `points` est trié par date. Retourne None si aucun prix n'est connu à cette date.
+    """
+    from bisect import bisect_right
+    idx = bisect_right([p[0] for p in points], day)
+    while idx > 0:
+        idx -= 1
+        point = points[idx]
+        _, _, _, _, is_promo, promo_end = point
+        if is_promo and promo_end and promo_end < day:
+            continue
+        return point
+    return None
+
+def cost_date_range(start, end, granularity="day"):
+    """ Dates d'échantillonnage de start à end (inclus) par pas d'un jour, d'une semaine ou d'un mois. """
+    import datetime
+    import calendar
+
+    if granularity not in COST_GRANULARITIES:
+        raise ValidationError(f"Granularité invalide : '{granularity}'. Choisissez parmi {list(COST_GRANULARITIES)}.")
+    if start > end:
+        raise ValidationError("La date de début doit être antérieure ou égale à la date de fin.")
+
+    dates, i = [], 0
+    while True:
+        if granularity == "day":
+            d = start + datetime.timedelta(days=i)
+        elif granularity == "week":
+            d = start + datetime.timedelta(weeks=i)
+        else:
+            month = start.month - 1 + i
+            year, month = start.year + month // 12, month % 12 + 1
+            d = datetime.date(year, month, min(start.day, calendar.monthrange(year, month)[1]))
+        if d > end:
+            break
+        dates.append(d)
+        if len(dates) > COST_SERIES_MAX_POINTS:
+            raise ValidationError(f"Série trop longue : au plus {COST_SERIES_MAX_POINTS} dates par requête.")
+        i += 1
+    return dates
+
+def recipe_cost_series(recipe, dates, *, store_ids=None, user=None, guest_id=None):
+    """
+    Coût d'une recette à chacune des dates fournies, calculé en bloc.
+
+    Méthode:
+      - Besoins en grammes calculés une seule fois (recipe_ingredient_grams).
+      - Points de prix chargés en une passe pour toute la plage (_load_price_timelines).
+      - Pour chaque date : prix/gramme le plus bas parmi les produits en vigueur de chaque ingrédient.
+
+    Returns:
+        dict {
+          "points": [{"date", "cost", "complete", "missing_ingredient_ids"}],
+          "warnings": [...]
+        }
+    """
+    cache = {}
+    grams, warnings = recipe_ingredient_grams(recipe, user=user, guest_id=guest_id, cache=cache)
+    if not dates:
+        return {"points": [], "warnings": warnings}
+
+    timelines = _load_price_timelines(list(grams), min(dates), max(dates), store_ids=store_ids)
+    _prefill_unit_cache(list(grams), {k[4] for k in timelines}, user=user, guest_id=guest_id, cache=cache)
+
+    # Coefficient produit → prix au gramme (None si format non convertible)
+    by_ingredient = {}
+    for key, points in timelines.items():
+        try:
+            pack_g = key[3] * _get_coeff_to_grams(key[0], key[4], user=user, guest_id=guest_id, cache=cache)
+        except ValidationError:
+            continue
+        if pack_g > 0:
+            by_ingredient.setdefault(key[0], []).append((pack_g, points))
+
+    out = []
+    for day in sorted(dates):
+        total, missing = 0.0, []
+        for ing_id, need_g in grams.items():
+            best = None
+            for pack_g, points in by_ingredient.get(ing_id, []):
+                point = _price_in_effect(points, day)
+                if point is not None:
+                    ppg = point[1] / pack_g
+                    best = ppg if best is None else min(best, ppg)
+            if best is None:
+                missing.append(ing_id)
+            else:
+                total += need_g * best
+        out.append({"date": day, "cost": round(total, 2), "complete": not missing, "missing_ingredient_ids": missing})
+    return {"points": out, "warnings": warnings}
+
+def recipe_cost_as_of(recipe, as_of, *, store_ids=None, user=None, guest_id=None):
+    """
+    Coût d'une recette à une date donnée, détaillé par ingrédient (prix le plus bas en vigueur à cette date).
+    """
+    cache = {}
+    grams, warnings = recipe_ingredient_grams(recipe, user=user, guest_id=guest_id, cache=cache)
+    timelines = _load_price_timelines(list(grams), as_of, as_of, store_ids=store_ids)
+    _prefill_unit_cache(list(grams), {k[4] for k in timelines}, user=user, guest_id=guest_id, cache=cache)
+
+    best = {}
+    for key, points in timelines.items():
+        point = _price_in_effect(points, as_of)
+        if point is None:
+            continue
+        try:
+            pack_g = key[3] * _get_coeff_to_grams(key[0], key[4], user=user, guest_id=guest_id, cache=cache)
+        except ValidationError:
+            continue
+        ppg = point[1] / pack_g if pack_g > 0 else None
+        if ppg is not None and (key[0] not in best or ppg < best[key[0]][0]):
+            best[key[0]] = (ppg, key, point)
+
+    lines, total, missing = [], 0.0, []
+    for ing_id, need_g in grams.items():
+        if ing_id not in best:
+            missing.append(ing_id)
+            continue
+        ppg, key, point = best[ing_id]
+        cost = need_g * ppg
+        total += cost
+        lines.append({
+            "ingredient_id": ing_id, "quantity_g": round(need_g, 3),
+            "price_per_g": ppg, "cost": round(cost, 2),
+            "store_id": key[1], "brand_name": key[2],
+            "price": point[1], "price_quantity": point[2], "price_unit": point[3],
+            "price_date": point[0], "is_promo": point[4],
+        })
+    return {
+        "as_of": as_of, "cost": round(total, 2), "complete": not missing,
+        "ingredients": lines, "missing_ingredient_ids": missing, "warnings": warnings,
+    }
+
+# ============================================================
+# 11. IMPORT DE PRIX EN MASSE
+# ============================================================
+
+PRICE_IMPORT_BATCH_SIZE = 1000
+_TRUE_VALUES = {"1", "true", "yes", "oui", "y", "o"}
+
+def _parse_import_date(value, field):
+    """ Date ISO (AAAA-MM-JJ) ou objet date → date. Vide → None. """
+    import datetime
+    if value in (None, ""):
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        return datetime.date.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValidationError(f"{field} : date invalide '{value}' (format attendu AAAA-MM-JJ).")
+
+def _parse_price_row(raw, today):
+    """
+    Valide et normalise une ligne d'import en mémoire, sans requête.
+    Reprend les règles de IngredientPrice.clean() qui ne dépendent pas de la base.
+    """
+    from .constants import UNIT_CHOICES
+
+    if not isinstance(raw, dict):
+        raise ValidationError("Ligne invalide : objet attendu.")
+
+    ingredient = normalize_case(raw.get("ingredient") or raw.get("ingredient_name") or "")
+    if not ingredient:
+        raise ValidationError("ingredient : ce champ est obligatoire.")
+
+    try:
+        price = float(str(raw.get("price")).replace(",", "."))
+        quantity = float(str(raw.get("quantity")).replace(",", "."))
+    except (TypeError, ValueError):
+        raise ValidationError("Le prix, la quantité et l'unité de mesure sont obligatoires.")
+    if price <= 0:
+        raise ValidationError("Un ingrédient doit avoir un prix strictement supérieur à 0€.")
+    if quantity <= 0:
+        raise ValidationError("Une quantité ne peut pas être négative ou nulle.")
+
+    unit = normalize_case(raw.get("unit") or "")
+    valid_units = dict(UNIT_CHOICES).keys()
+    if unit not in valid_units:
+        raise ValidationError(f"L'unité '{unit}' n'est pas valide. Choisissez parmi {list(valid_units)}.")
+
+    brand_name = normalize_case(raw.get("brand_name") or "") or None
+    if brand_name and len(brand_name) < 2:
+        raise ValidationError("Le nom de la marque doit contenir au moins 2 caractères.")
+
+    is_promo = raw.get("is_promo")
+    is_promo = is_promo if isinstance(is_promo, bool) else str(is_promo or "").strip().lower() in _TRUE_VALUES
+    promotion_end_date = _parse_import_date(raw.get("promotion_end_date"), "promotion_end_date")
+    if promotion_end_date and not is_promo:
+        raise ValidationError("Une date de fin de promo nécessite que `is_promo=True`.")
+    if promotion_end_date and promotion_end_date < today:
+        raise ValidationError("La date de fin de promo ne peut pas être dans le passé.")
+
+    zip_code = str(raw.get("zip_code") or "").strip() or None
+    return {
+        "ingredient": ingredient,
+        "store_name": normalize_case(raw.get("store_name") or raw.get("store") or "") or None,
+        "city": normalize_case(raw.get("city") or "") or None,
+        "zip_code": zip_code,
+        "address": normalize_case(raw.get("address") or "") or None,
+        "brand_name": brand_name,
+        "quantity": quantity,
+        "unit": unit,
+        "price": price,
+        "date": _parse_import_date(raw.get("date"), "date") or today,
+        "is_promo": is_promo,
+        "promotion_end_date": promotion_end_date,
+    }
+
+def _match_store(candidates, row):
+    """ Magasin correspondant à la ligne parmi les magasins de même nom (city/zip_code/address discriminants si fournis). """
+    def same(store, field):
+        stored, wanted = getattr(store, field) or None, row[field]
+        if wanted is None:
+            return True
+        if field == "zip_code" or stored is None:
+            return stored == wanted
+        return fold_accents(stored) == fold_accents(wanted)  # comme les contrôles de doublon (nexact)
+    matches = [s for s in candidates if all(same(s, f) for f in ("city", "zip_code", "address"))]
+    if not matches:
+        raise ValidationError(f"Magasin introuvable : '{row['store_name']}' ({row['city'] or row['zip_code'] or '?'}).")
+    if len(matches) > 1:
+        raise ValidationError(f"Magasin ambigu : '{row['store_name']}'. Précisez city, zip_code ou address.")
+    return matches[0]
+
+def _bulk_update_prices(prices):
+    """
+    Met à jour price/date/is_promo/promotion_end_date d'un lot d'IngredientPrice.
+    UPDATE ... FROM (VALUES ...) par lots : bulk_update() génère un CASE WHEN par ligne, trop lent au-delà de quelques milliers.
+    """
+    from django.db import connection
+    from .models import IngredientPrice
+
+    table = connection.ops.quote_name(IngredientPrice._meta.db_table)
+    prices = list(prices)
+    for start in range(0, len(prices), PRICE_IMPORT_BATCH_SIZE):
+        batch = prices[start:start + PRICE_IMPORT_BATCH_SIZE]
+        values = ", ".join(["(%s::bigint, %s::double precision, %s::date, %s::boolean, %s::date)"] * len(batch))
+        params = [v for p in batch for v in (p.pk, p.price, p.date, p.is_promo, p.promotion_end_date)]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} AS p SET price = v.price, date = v.date, is_promo = v.is_promo, "
+                f"promotion_end_date = v.promotion_end_date "
+                f"FROM (VALUES {values}) AS v(id, price, date, is_promo, promotion_end_date) WHERE p.id = v.id",
+                params,
+            )
+
+def bulk_import_prices(rows, *, skip_invalid=False, dry_run=False, today=None):
+    """
+    Importe une liste de prix (fichier fournisseur) en masse, dans une seule transaction.
+
+    Étapes:
+      1. Validation en mémoire de chaque ligne (_parse_price_row).
+      2. Résolution en bloc des ingrédients (publics ou de base uniquement) et magasins par nom normalisé,
+         sans casse ni accents (2 requêtes) ; nom inconnu ou ambigu → erreur de ligne.
+      3. Dans la transaction : verrouillage (select_for_update) des ingrédients et prix courants concernés,
+         chargement des prix courants et du dernier archivage de chaque produit.
+      4. Application en mémoire des règles de IngredientPrice.save(), ligne par ligne dans l'ordre des dates :
+           - produit inconnu → création ;
+           - prix modifié, date ≥ date courante → archivage de l'ancien prix + mise à jour ;
+           - prix modifié, date antérieure → archivage de la nouvelle valeur seule (rétroactif) ;
+           - prix identique → mise à jour des champs promo/date.
+         Un archivage identique au dernier archivage du produit (même prix, même is_promo) est ignoré.
+      5. Écriture : un bulk_create de l'historique, un bulk_create des nouveaux prix, un UPDATE groupé des prix modifiés.
+         "archived" compte les lignes d'historique réellement insérées (doublons ignorés exclus).
+
+    Args:
+        rows (list[dict]): lignes brutes (ingredient, store_name, city, zip_code, address, brand_name,
+                           quantity, unit, price, date, is_promo, promotion_end_date).
+        skip_invalid (bool): importe les lignes valides malgré les erreurs (sinon rien n'est écrit).
+        dry_run (bool): calcule le rapport sans rien persister.
+
+    Returns:
+        dict {received, created, updated, unchanged, archived, retroactive, errors: [{row, error}], dry_run}
+    """
+    from django.utils.timezone import now
+    from .models import Ingredient, Store, IngredientPrice, IngredientPriceHistory, SearchNormalize
+
+    today = today or now().date()
+    report = {"received": len(rows), "created": 0, "updated": 0, "unchanged": 0,
+              "archived": 0, "retroactive": 0, "errors": [], "dry_run": dry_run}
+
+    def _error(idx, exc):
+        msg = exc.messages[0] if isinstance(exc, ValidationError) else str(exc)
+        report["errors"].append({"row": idx + 1, "error": msg})
+
+    # 1) Validation en mémoire
+    parsed = []
+    for idx, raw in enumerate(rows):
+        try:
+            parsed.append((idx, _parse_price_row(raw, today)))
+        except ValidationError as e:
+            _error(idx, e)
+
+    # 2) Résolution en bloc ingrédients / magasins, insensible à la casse et aux accents (search_normalize,
+    #    index fonctionnels idx_ingredient_name_norm / idx_store_name_city_norm) : "Creme" trouve "crème"
+    #    Seuls les ingrédients publics ou de base sont candidats : jamais l'ingrédient privé d'un autre propriétaire
+    ingredient_keys = {fold_accents(r["ingredient"]) for _, r in parsed}
+    ingredients = {}
+    for i in (Ingredient.objects.filter(SHARED_VISIBILITY_Q).annotate(norm=SearchNormalize("ingredient_name"))
+              .filter(norm__in=ingredient_keys)):
+        ingredients.setdefault(i.norm, []).append(i)
+    stores_by_name = {}
+    store_keys = {fold_accents(r["store_name"]) for _, r in parsed if r["store_name"]}
+    for s in Store.objects.annotate(norm=SearchNormalize("store_name")).filter(norm__in=store_keys):
+        stores_by_name.setdefault(s.norm, []).append(s)
+
+    resolved = []
+    for idx, row in parsed:
+        try:
+            candidates = ingredients.get(fold_accents(row["ingredient"]), [])
+            if not candidates:
+                raise ValidationError(f"Ingrédient introuvable parmi les ingrédients publics ou de base : '{row['ingredient']}'.")
+            if len(candidates) > 1:
+                raise ValidationError(f"Ingrédient ambigu : '{row['ingredient']}' ({len(candidates)} ingrédients publics ou de base).")
+            ingredient = candidates[0]
+            store = _match_store(stores_by_name.get(fold_accents(row["store_name"]), []), row) if row["store_name"] else None
+        except ValidationError as e:
+            _error(idx, e)
+            continue
+        resolved.append((idx, row, ingredient, store))
+
+    if report["errors"] and not skip_invalid:
+        report["errors"].sort(key=lambda e: e["row"])
+        return report
+
+    # 3) à 5) dans une seule transaction : lectures de l'état courant et écritures sans course possible
+    with transaction.atomic():
+        # 3) État courant : prix existants (verrouillés) + dernier archivage par produit
+        ingredient_ids = {ing.id for _, _, ing, _ in resolved}
+        product = ("ingredient_id", "store_id", "brand_name", "quantity", "unit")
+        # Ingrédients verrouillés : deux imports sur les mêmes ingrédients s'exécutent l'un après l'autre
+        list(Ingredient.objects.select_for_update().filter(id__in=ingredient_ids).order_by("pk").values_list("pk", flat=True))
+        # Prix courants verrouillés : une édition API concurrente attend la fin de l'import (ni écrasement ni mauvais archivage)
+        state = {tuple(getattr(p, f) for f in product): p
+                 for p in IngredientPrice.objects.select_for_update().filter(ingredient_id__in=ingredient_ids).order_by("pk")}
+        last_archive = {
+            tuple(h[:5]): h[5:] for h in
+            IngredientPriceHistory.objects.filter(ingredient_id__in=ingredient_ids)
+            .order_by(*product, "-date").distinct(*product)
+            .values_list(*product, "date", "price", "is_promo")
+        }
+        by_store_pair = {}
+        for key in state:
+            by_store_pair.setdefault(key[:2], set()).add(key)
+
+        # 4) Application des règles métier en mémoire
+        created, updated, archives = {}, {}, {}
+        names = {ing.id: ing.ingredient_name for _, _, ing, _ in resolved}
+
+        def _archive(key, date, price, is_promo, promotion_end_date):
+            last = last_archive.get(key)
+            if last and last[1] == price and last[2] == is_promo:
+                return
+            archives.setdefault((key, date), IngredientPriceHistory(
+                ingredient_id=key[0], ingredient_name=names.get(key[0], ""), store_id=key[1], brand_name=key[2],
+                quantity=key[3], unit=key[4], price=price, is_promo=is_promo,
+                promotion_end_date=promotion_end_date, date=date))
+            if last is None or date >= last[0]:
+                last_archive[key] = (date, price, is_promo)
+
+        resolved.sort(key=lambda item: (item[1]["date"], item[0]))
+        for idx, row, ingredient, store in resolved:
+            key = (ingredient.id, store.id if store else None, row["brand_name"], row["quantity"], row["unit"])
+
+            # Promo : doit rester inférieure au dernier prix normal du couple (ingrédient, magasin)
+            if row["is_promo"]:
+                normals = [state[k] for k in by_store_pair.get(key[:2], ()) if not state[k].is_promo]
+                if normals:
+                    last_normal = max(normals, key=lambda p: p.date or today)
+                    if row["price"] > last_normal.price:
+                        _error(idx, ValidationError(f"Le prix promo ({row['price']}€) doit être inférieur au dernier prix normal ({last_normal.price}€)."))
+                        continue
+
+            current = state.get(key)
+            if current is None:
+                obj = IngredientPrice(ingredient=ingredient, store=store, brand_name=row["brand_name"], quantity=row["quantity"],
+                                      unit=row["unit"], price=row["price"], date=row["date"], is_promo=row["is_promo"],
+                                      promotion_end_date=row["promotion_end_date"])
+                state[key] = created[key] = obj
+                by_store_pair.setdefault(key[:2], set()).add(key)
+                continue
+
+            if current.price != row["price"]:
+                if current.date is None or row["date"] >= current.date:
+                    _archive(key, current.date or today, current.price, current.is_promo, current.promotion_end_date)
+                else:
+                    _archive(key, row["date"], row["price"], row["is_promo"], row["promotion_end_date"])
+                    report["retroactive"] += 1
+                    continue
+            elif (current.date, current.is_promo, current.promotion_end_date) == (row["date"], row["is_promo"], row["promotion_end_date"]):
+                report["unchanged"] += 1
+                continue
+
+            current.price, current.date = row["price"], row["date"]
+            current.is_promo, current.promotion_end_date = row["is_promo"], row["promotion_end_date"]
+            if key not in created:
+                updated[key] = current
+
+        report["errors"].sort(key=lambda e: e["row"])
+        if report["errors"] and not skip_invalid:
+            return report
+
+        # 5) Écritures groupées
+        if archives:
+            history = IngredientPriceHistory.objects.filter(ingredient_id__in=ingredient_ids)
+            before = history.count()
+            IngredientPriceHistory.objects.bulk_create(archives.values(), batch_size=PRICE_IMPORT_BATCH_SIZE, ignore_conflicts=True)
+            report["archived"] = history.count() - before  # lignes réellement insérées (ignore_conflicts en écarte sans le dire)
+        IngredientPrice.objects.bulk_create(created.values(), batch_size=PRICE_IMPORT_BATCH_SIZE)
+        _bulk_update_prices(updated.values())
+        if dry_run:
+            transaction.set_rollback(True)
+    if not dry_run:
+        bump_table_generation(IngredientPrice)  # écritures groupées : pas de signal
+
+    report.update(created=len(created), updated=len(updated))
+    return report
+
+# ============================================================
+# 12. TENDANCES DE PRIX (AGRÉGATS PAR PÉRIODE)
+# ============================================================
+
+PRICE_TREND_BUCKETS = ("week", "month")
+
+def price_trends(ingredient_ids, start, end, *, bucket="month", by_store=False):
+    """
+    Prix au gramme min/moy/max par ingrédient (et optionnellement par magasin), agrégés par semaine ou par mois.
+
+    Calcul entièrement SQL (une requête) :
+      - points = IngredientPriceHistory ∪ IngredientPrice sur [start, end] (index (ingredient, date) des deux tables) ;
+      - prix au gramme : g/kg/mg directs, autres unités via IngredientUnitReference globale active ;
+      - date_trunc(bucket) + GROUP BY, puis LAG() (fenêtre) pour la variation de la moyenne d'une période à l'autre.
+    Les points non convertibles en grammes sont ignorés.
+
+    Returns:
+        list[dict] : une série par ingrédient (ou couple ingrédient/magasin) :
+          {"ingredient_id", "store_id"?, "points": [{"bucket", "min_price_per_g", "avg_price_per_g",
+                                                    "max_price_per_g", "count", "avg_change_pct"}]}
+    """
+    from django.db import connection
+    from .models import IngredientPrice, IngredientPriceHistory
+
+    if bucket not in PRICE_TREND_BUCKETS:
+        raise ValidationError(f"Période invalide : '{bucket}'. Choisissez parmi {list(PRICE_TREND_BUCKETS)}.")
+    if not ingredient_ids:
+        return []
+
+    qn = connection.ops.quote_name
+    history_table = qn(IngredientPriceHistory._meta.db_table)
+    price_table = qn(IngredientPrice._meta.db_table)
+    iur_table = qn(IngredientUnitReference._meta.db_table)
+    group = "ingredient_id, store_id" if by_store else "ingredient_id"
+
+    sql = f"""
+        WITH points AS (
+            SELECT ingredient_id, store_id, date, price, quantity, unit FROM {history_table}
+             WHERE ingredient_id = ANY(%(ids)s) AND date BETWEEN %(start)s AND %(end)s
+            UNION ALL
+            SELECT ingredient_id, store_id, date, price, quantity, unit FROM {price_table}
+             WHERE ingredient_id = ANY(%(ids)s) AND date BETWEEN %(start)s AND %(end)s
+        ),
+        per_gram AS (
+            SELECT p.ingredient_id, p.store_id, date_trunc(%(bucket)s, p.date)::date AS bucket,
+                   p.price / NULLIF(p.quantity * CASE p.unit WHEN 'g' THEN 1.0 WHEN 'kg' THEN 1000.0 WHEN 'mg' THEN 0.001
+                                                             ELSE ref.weight_in_grams END, 0) AS ppg
+              FROM points p
+              LEFT JOIN LATERAL (
+                  SELECT r.weight_in_grams FROM {iur_table} r
+                   WHERE r.ingredient_id = p.ingredient_id AND r.unit = p.unit AND NOT r.is_hidden
+                     AND r.user_id IS NULL AND r.guest_id IS NULL
+                   LIMIT 1
+              ) ref ON p.unit NOT IN ('g', 'kg', 'mg')
+        ),
+        agg AS (
+            SELECT {group}, bucket, MIN(ppg) AS min_ppg, AVG(ppg) AS avg_ppg, MAX(ppg) AS max_ppg, COUNT(*) AS n
+              FROM per_gram WHERE ppg IS NOT NULL
+             GROUP BY {group}, bucket
+        )
+        SELECT {group}, bucket, min_ppg, avg_ppg, max_ppg, n,
+               LAG(avg_ppg) OVER (PARTITION BY {group} ORDER BY bucket) AS prev_avg
+          FROM agg
+         ORDER BY {group}, bucket
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {"ids": list(ingredient_ids), "start": start, "end": end, "bucket": bucket})
+        rows = cursor.fetchall()
+
+    series = {}
+    for row in rows:
+        if by_store:
+            ing_id, store_id, day, min_ppg, avg_ppg, max_ppg, n, prev_avg = row
+            key = (ing_id, store_id)
+        else:
+            ing_id, day, min_ppg, avg_ppg, max_ppg, n, prev_avg = row
+            key = (ing_id,)
+        if key not in series:
+            series[key] = {"ingredient_id": ing_id, **({"store_id": key[1]} if by_store else {}), "points": []}
+        series[key]["points"].append({
+            "bucket": day,
+            "min_price_per_g": float(min_ppg), "avg_price_per_g": float(avg_ppg), "max_price_per_g": float(max_ppg),
+            "count": n,
+            "avg_change_pct": round((avg_ppg - prev_avg) / prev_avg * 100, 2) if prev_avg else None,
+        })
+    return list(series.values())
+
+# ============================================================
+# 13. EXPIRATION DES PROMOTIONS
+# ============================================================
+
+def sweep_expired_promotions(*, today=None, dry_run=False, delete_orphans=False):
+    """
+    Sort des prix courants les promotions expirées (is_promo=True, promotion_end_date < today).
+
+    Pour chaque promo expirée (index partiel ip_promo_end_date, lignes verrouillées) :
+      - la promo est archivée dans IngredientPriceHistory (bulk_create, doublons ignorés) ;
+      - si un prix normal antérieur existe dans l'historique pour le même produit, il redevient
+        le prix courant à partir du lendemain de la fin de promo ;
+      - sinon la ligne est conservée comme prix courant (même prix, is_promo=False, à partir du lendemain),
+        ou supprimée seulement si `delete_orphans` est demandé explicitement (suppression irréversible).
+
+    Returns:
+        dict {expired, archived, restored, kept, deleted, ingredient_ids, dry_run}
+    """
+    import datetime
+    from django.utils.timezone import now
+    from .models import IngredientPrice, IngredientPriceHistory
+
+    today = today or now().date()
+    product = ("ingredient_id", "store_id", "brand_name", "quantity", "unit")
+    report = {"expired": 0, "archived": 0, "restored": 0, "kept": 0, "deleted": 0, "ingredient_ids": [], "dry_run": dry_run}
+
+    with transaction.atomic():
+        expired = list(IngredientPrice.objects.select_for_update(skip_locked=True)
+                       .filter(is_promo=True, promotion_end_date__lt=today)
+                       .select_related("ingredient"))
+        if not expired:
+            return report
+        ingredient_ids = {p.ingredient_id for p in expired}
+
+        # Dernier archivage et dernier prix normal archivé, par produit (DISTINCT ON)
+        history = IngredientPriceHistory.objects.filter(ingredient_id__in=ingredient_ids).order_by(*product, "-date").distinct(*product)
+        last_archive = {tuple(h[:5]): h[5:] for h in history.values_list(*product, "price", "is_promo")}
+        last_normal = {tuple(h[:5]): h[5] for h in history.filter(is_promo=False).values_list(*product, "price")}
+
+        archives, restored, kept, deleted = [], [], [], []
+        for p in expired:
+            key = tuple(getattr(p, f) for f in product)
+            if last_archive.get(key) != (p.price, True):
+                archives.append(IngredientPriceHistory(
+                    ingredient_id=p.ingredient_id, ingredient_name=p.ingredient.ingredient_name, store_id=p.store_id,
+                    brand_name=p.brand_name, quantity=p.quantity, unit=p.unit, price=p.price, is_promo=True,
+                    promotion_end_date=p.promotion_end_date, date=p.date or p.promotion_end_date))
+            if key not in last_normal and delete_orphans:
+                deleted.append(p.pk)
+                continue
+            if key in last_normal:
+                p.price = last_normal[key]
+                restored.append(p)
+            else:
+                kept.append(p)  # aucun prix normal connu : le prix de la promo reste le dernier prix en vigueur
+            p.is_promo, p.date, p.promotion_end_date = False, p.promotion_end_date + datetime.timedelta(days=1), None
+
+        IngredientPriceHistory.objects.bulk_create(archives, batch_size=PRICE_IMPORT_BATCH_SIZE, ignore_conflicts=True)
+        _bulk_update_prices(restored + kept)
+        if deleted:
+            IngredientPrice.objects.filter(pk__in=deleted).delete()
+        if dry_run:
+            transaction.set_rollback(True)
+    if not dry_run:
+        bump_table_generation(IngredientPrice)  # écritures groupées : pas de signal
+
+    report.update(expired=len(expired), archived=len(archives), restored=len(restored), kept=len(kept), deleted=len(deleted),
+                  ingredient_ids=sorted(ingredient_ids))
+    return report
+
+# ============================================================
+# 14. PARTITIONS ET ARCHIVAGE DE L'HISTORIQUE DES PRIX
+# ============================================================
+
+PRICE_HISTORY_COLUMNS = ("id", "ingredient_name", "brand_name", "quantity", "unit", "price", "is_promo",
+                         "promotion_end_date", "date", "ingredient_id", "store_id")
+_ARCHIVE_NULL = "\\N"  # marqueur NULL des fichiers d'archive (convention COPY)
+
+def _history_partition_name(year):
+    """ Nom de la partition annuelle d'IngredientPriceHistory (cf. migration 0008). """
+    from .models import IngredientPriceHistory
+    return f"{IngredientPriceHistory._meta.db_table}_y{year}"
+
+def list_price_history_partitions():
+    """
+    Partitions annuelles existantes de l'historique des prix.
+
+    Returns:
+        list[(year, partition_name)] triée par année (la partition DEFAULT est exclue).
+    """
+    import re
+    from django.db import connection
+    from .models import IngredientPriceHistory
+
+    table = IngredientPriceHistory._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                       "WHERE i.inhparent = %s::regclass", [table])
+        names = [row[0] for row in cursor.fetchall()]
+    pattern = re.compile(rf"^{re.escape(table)}_y(\d{{4}})$")
+    return sorted((int(m.group(1)), name) for name in names if (m := pattern.match(name)))
+
+def ensure_price_history_partitions(years=None, *, today=None):
+    """
+    Crée les partitions annuelles manquantes de l'historique des prix.
+
+    Par défaut : année courante, année suivante et années des lignes tombées dans la partition DEFAULT.
+    Les lignes de DEFAULT appartenant à une année créée y sont déplacées (PostgreSQL refuse d'attacher
+    une partition dont les lignes sont déjà dans DEFAULT).
+
+    Returns:
+        list[int] des années créées.
+    """
+    from django.db import connection
+    from django.utils.timezone import now
+    from .models import IngredientPriceHistory
+
+    qn = connection.ops.quote_name
+    table = IngredientPriceHistory._meta.db_table
+    default = qn(f"{table}_default")
+    columns = ", ".join(qn(c) for c in PRICE_HISTORY_COLUMNS)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if years is None:
+            current = (today or now().date()).year
+            cursor.execute(f"SELECT DISTINCT EXTRACT(YEAR FROM date)::int FROM {default}")
+            years = {current, current + 1, *(row[0] for row in cursor.fetchall())}
+        existing = {year for year, _ in list_price_history_partitions()}
+
+        created = []
+        for year in sorted(set(years) - existing):
+            bounds = [f"{year:04d}-01-01", f"{year + 1:04d}-01-01"]
+            cursor.execute(f"CREATE TEMP TABLE iph_moved (LIKE {qn(table)}) ON COMMIT DROP")
+            cursor.execute(f"WITH moved AS (DELETE FROM {default} WHERE date >= %s AND date < %s RETURNING {columns}) "
+                           f"INSERT INTO iph_moved ({columns}) SELECT {columns} FROM moved", bounds)
+            cursor.execute(f"CREATE TABLE {qn(_history_partition_name(year))} PARTITION OF {qn(table)} "
+                           f"FOR VALUES FROM (%s) TO (%s)", bounds)
+            cursor.execute(f"INSERT INTO {qn(table)} ({columns}) SELECT {columns} FROM iph_moved")
+            cursor.execute("DROP TABLE iph_moved")
+            created.append(year)
+    return created
+
+def _write_price_archive(path, rows):
+    """ Écrit les lignes (ordre PRICE_HISTORY_COLUMNS) dans un CSV gzip, via un fichier temporaire renommé. """
+    import csv
+    import gzip
+    import os
+
+    tmp = path.with_name(path.name + ".tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(PRICE_HISTORY_COLUMNS)
+        for row in rows:
+            writer.writerow([_ARCHIVE_NULL if v is None else v for v in row])
+    os.replace(tmp, path)
+
+def _read_price_archive(path):
+    """
+    Lit un fichier d'archive (pas de cache en mémoire : seuls les calculs sur des périodes archivées l'ouvrent).
+
+    Returns:
+        dict[ingredient_id, tuple[dict]] (un dict par ligne, valeurs typées).
+    """
+    import csv
+    import datetime
+    import gzip
+
+    def _date(v):
+        return datetime.date.fromisoformat(v) if v else None
+
+    casts = {"id": int, "quantity": float, "price": float, "is_promo": lambda v: v == "True",
+             "promotion_end_date": _date, "date": _date, "ingredient_id": int, "store_id": int}
+    by_ingredient = {}
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        for raw in csv.DictReader(f):
+            row = {k: (None if v == _ARCHIVE_NULL else casts.get(k, str)(v)) for k, v in raw.items()}
+            by_ingredient.setdefault(row["ingredient_id"], []).append(row)
+    return {k: tuple(v) for k, v in by_ingredient.items()}
+
+def load_archived_price_history(ingredient_ids, end=None, *, start=None, priced_ids=(), store_ids=None):
+    """
+    Lignes d'historique de prix archivées (hors base) pour ces ingrédients, datées ≤ end.
+
+    Une archive n'est ouverte que si elle contient l'un des ingrédients et commence avant `end`, et :
+      - sa plage atteint la fenêtre ]start, end] (start=None : toujours) ;
+      - ou elle contient un ingrédient hors `priced_ids`, c'est-à-dire sans prix normal ≤ start en base,
+        dont la référence est à reprendre dans l'archive.
+
+    Returns:
+        list[dict] (clés PRICE_HISTORY_COLUMNS).
+    """
+    from .models import PriceHistoryArchive
+
+    ids = list(ingredient_ids)
+    unpriced = [i for i in ids if i not in priced_ids]
+    archives = PriceHistoryArchive.objects.filter(ingredient_ids__overlap=ids)
+    if end is not None:
+        archives = archives.filter(range_start__lte=end)
+    if start is not None:
+        archives = archives.filter(django_models.Q(range_end__gt=start) | django_models.Q(ingredient_ids__overlap=unpriced))
+
+    rows = []
+    for archive in archives:
+        wanted = ids if start is None or archive.range_end > start else unpriced
+        try:
+            content = _read_price_archive(archive.path)
+        except FileNotFoundError:
+            raise ValidationError(f"Archive de l'historique des prix introuvable : {archive.path}")
+        for ing_id in wanted:
+            rows.extend(r for r in content.get(ing_id, ())
+                        if (end is None or r["date"] <= end) and (not store_ids or r["store_id"] in store_ids))
+    return rows
+
+def archive_price_history(*, retention_years, directory, today=None, dry_run=False):
+    """
+    Sort de la base les partitions annuelles antérieures à la fenêtre de rétention.
+
+    Pour chaque partition dont la plage se termine avant le 1er janvier de (année courante - retention_years) :
+      1. export des lignes dans <directory>/<partition>.csv.gz (fusion avec l'archive existante de cette année,
+         cas des prix rétroactifs importés après un premier archivage) ;
+      2. enregistrement dans PriceHistoryArchive (lu par le chemin de lecture des calculs de coût à date) ;
+      3. DETACH puis DROP de la partition.
+
+    Les partitions manquantes (année courante/suivante, années présentes dans DEFAULT) sont créées au préalable.
+
+    Returns:
+        dict {created_partitions, archived: [{partition, year, rows, path}], cutoff, dry_run}
+    """
+    import datetime
+    from pathlib import Path
+    from django.db import connection
+    from django.utils.timezone import now
+    from .models import IngredientPriceHistory, PriceHistoryArchive
+
+    if retention_years < 0:
+        raise ValidationError("La durée de rétention doit être positive.")
+    today = today or now().date()
+    cutoff = datetime.date(today.year - retention_years, 1, 1)
+    report = {"created_partitions": [], "archived": [], "cutoff": cutoff, "dry_run": dry_run}
+
+    expired = [(y, name) for y, name in list_price_history_partitions() if y + 1 <= cutoff.year]
+    if dry_run:
+        report["archived"] = [{"partition": name, "year": y, "rows": None, "path": None} for y, name in expired]
+        return report
+
+    report["created_partitions"] = ensure_price_history_partitions(today=today)
+    expired = [(y, name) for y, name in list_price_history_partitions() if y + 1 <= cutoff.year]
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    qn = connection.ops.quote_name
+    table = IngredientPriceHistory._meta.db_table
+    columns = ", ".join(qn(c) for c in PRICE_HISTORY_COLUMNS)
+
+    for year, name in expired:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"SELECT {columns} FROM {qn(name)} ORDER BY date, id FOR UPDATE")
+            rows = cursor.fetchall()
+            archive = PriceHistoryArchive.objects.select_for_update().filter(partition_name=name).first()
+            path = Path(archive.path) if archive else directory / f"{name}.csv.gz"
+            if archive and path.exists():
+                previous = _read_price_archive(str(path))
+                kept = [tuple(r[c] for c in PRICE_HISTORY_COLUMNS) for group in previous.values() for r in group]
+                rows = sorted(kept + rows, key=lambda r: (r[8], r[0]))
+            _write_price_archive(path, rows)
+
+            PriceHistoryArchive.objects.update_or_create(partition_name=name, defaults={
+                "range_start": datetime.date(year, 1, 1), "range_end": datetime.date(year + 1, 1, 1),
+                "path": str(path), "row_count": len(rows),
+                "ingredient_ids": sorted({r[PRICE_HISTORY_COLUMNS.index("ingredient_id")] for r in rows})})
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")  # FK différées en attente : bloqueraient le DROP
+            cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}")
+            cursor.execute(f"DROP TABLE {qn(name)}")
+        report["archived"].append({"partition": name, "year": year, "rows": len(rows), "path": str(path)})
+    return report
+
+# ============================================================
+# 15. RÉSUMÉ DES PRIX PAR INGRÉDIENT (LISTES)
+# ============================================================
+
+def price_per_gram_expression():
+    """
+    Expression ORM du prix au gramme d'une ligne IngredientPrice (g/kg/mg directs,
+    autres unités via IngredientUnitReference globale active ; NULL si non convertible).
+    """
+    from django.db.models import Case, F, FloatField, OuterRef, Subquery, Value, When
+    from django.db.models.functions import NullIf
+
+    global_ref = (IngredientUnitReference.objects
+                  .filter(ingredient_id=OuterRef("ingredient_id"), unit=OuterRef("unit"), is_hidden=False,
+                          user__isnull=True, guest_id__isnull=True)
+                  .values("weight_in_grams")[:1])
+    grams_per_unit = Case(When(unit="g", then=Value(1.0)), When(unit="kg", then=Value(1000.0)),
+                          When(unit="mg", then=Value(0.001)), default=Subquery(global_ref), output_field=FloatField())
+    return F("price") / NullIf(F("quantity") * grams_per_unit, Value(0.0))
+
+def ingredient_price_summary_annotations():
+    """
+    Annotations (sous-requêtes corrélées, index (ingredient, date)) résumant les prix courants d'un ingrédient :
+      - best_price_per_g : meilleur prix au gramme (prix non convertibles ignorés) ;
+      - price_store_count : nb de magasins proposant un prix ;
+      - price_last_updated : date du prix le plus récent.
+    Une ligne par ingrédient, quel que soit le nombre de prix.
+    """
+    from django.db.models import Count, IntegerField, Max, OuterRef, Subquery, Value
+    from django.db.models.functions import Coalesce
+    from .models import IngredientPrice
+
+    prices = IngredientPrice.objects.filter(ingredient_id=OuterRef("pk"))
+    per_ingredient = prices.order_by().values("ingredient_id")
+    best = (prices.annotate(ppg=price_per_gram_expression()).filter(ppg__isnull=False)
+            .order_by("ppg").values("ppg")[:1])
+    return {
+        "best_price_per_g": Subquery(best),
+        "price_store_count": Coalesce(Subquery(per_ingredient.annotate(n=Count("store_id", distinct=True)).values("n")),
+                                      Value(0), output_field=IntegerField()),
+        "price_last_updated": Subquery(per_ingredient.annotate(last=Max("date")).values("last")),
+    }
+
+# ============================================================
+# 16. INDEX DE RECHERCHE UNIFIÉ (OMNIBOX)
+# ============================================================
+
+SEARCH_REBUILD_BATCH_SIZE = 2000
+
+def _search_entity_models():
+    """ Correspondance entity_type → modèle indexé. """
+    from .models import Ingredient, Category, Label, Store
+    return {"recipes": Recipe, "ingredients": Ingredient, "categories": Category, "labels": Label, "pans": Pan, "stores": Store}
+
+def _search_document_values(entity_type, obj):
+    """
+    Champs du SearchDocument d'une instance (title/subtitle identiques aux sérialiseurs Omni).
+    N'utilise que des attributs simples : fonctionne aussi avec les modèles historiques (migrations).
+    """
+    from .constants import SEARCH_ENTITY_WEIGHTS
+
+    if entity_type == "recipes":
+        title = obj.recipe_name
+        secondary = [obj.chef_name, obj.context_name]
+        subtitle = " · ".join(p for p in secondary if p)
+    elif entity_type == "ingredients":
+        title, secondary, subtitle = obj.ingredient_name, [], ""
+    elif entity_type == "categories":
+        title, secondary, subtitle = obj.category_name, [], ""
+    elif entity_type == "labels":
+        title, secondary, subtitle = obj.label_name, [], ""
+    elif entity_type == "pans":
+        title, secondary, subtitle = obj.pan_name or str(obj), [], ""
+    else:  # stores
+        title = obj.store_name
+        secondary = [obj.city, obj.zip_code]
+        subtitle = " ".join(p for p in secondary if p)
+
+    return {
+        "user_id": getattr(obj, "user_id", None),
+        "guest_id": getattr(obj, "guest_id", None),
+        "visibility": getattr(obj, "visibility", "public"),
+        "is_default": getattr(obj, "is_default", False),
+        "title": (title or "")[:255],
+        "subtitle": subtitle[:255],
+        "text": fold_accents(" ".join(p for p in [title, *secondary] if p)),
+        "weight": SEARCH_ENTITY_WEIGHTS[entity_type],
+    }
+
+def _search_entity_type(instance):
+    return next((e for e, model in _search_entity_models().items() if isinstance(instance, model)), None)
+
+def _is_shared_document(visibility, is_default):
+    """ Document visible de tous : seul cas qui alimente l'index de préfixes et le cache public de l'omnibox. """
+    return visibility == "public" or bool(is_default)
+
+def index_search_document(instance):
+    """
+    Crée ou met à jour le document de recherche d'une instance (appelé par signal post_save).
+    Renvoie True si le document est, ou était avant l'écriture, public ou de base (cf. bump_search_generation).
+    """
+    from .models import SearchDocument
+    entity_type = _search_entity_type(instance)
+    if entity_type is None:
+        return False
+    values = _search_document_values(entity_type, instance)
+    with transaction.atomic():
+        doc = SearchDocument.objects.select_for_update().filter(entity_type=entity_type, entity_id=instance.pk).first()
+        if doc is None:
+            SearchDocument.objects.create(entity_type=entity_type, entity_id=instance.pk, **values)
+            return _is_shared_document(values["visibility"], values["is_default"])
+        was_shared = _is_shared_document(doc.visibility, doc.is_default)
+        for field, value in values.items():
+            setattr(doc, field, value)
+        doc.save()
+    return was_shared or _is_shared_document(values["visibility"], values["is_default"])
+
+def unindex_search_document(instance):
+    """
+    Supprime le document de recherche d'une instance (appelé par signal post_delete).
+    Renvoie True si l'instance supprimée était publique ou de base.
+    """
+    from .models import SearchDocument
+    entity_type = _search_entity_type(instance)
+    if entity_type is None:
+        return False
+    SearchDocument.objects.filter(entity_type=entity_type, entity_id=instance.pk).delete()
+    return _is_shared_document(getattr(instance, "visibility", "public"), getattr(instance, "is_default", False))
+
+def rebuild_search_documents(*, entity_types=None, models=None, document_model=None):
+    """
+    Reconstruit l'index de recherche (toutes les entités ou `entity_types`) en une transaction :
+    suppression puis bulk_create par lots, puis nouvelle génération au commit (index de préfixes et cache public
+    de l'omnibox reconstruits). `models`/`document_model` permettent l'appel depuis une migration.
+
+    Returns:
+        dict[entity_type, nb de documents]
+    """
+    from .models import SearchDocument
+
+    models = models or _search_entity_models()
+    document_model = document_model or SearchDocument
+    entity_types = list(entity_types or models)
+    counts = {}
+    with transaction.atomic():
+        document_model.objects.filter(entity_type__in=entity_types).delete()
+        for entity_type in entity_types:
+            batch, counts[entity_type] = [], 0
+            for obj in models[entity_type].objects.order_by("pk").iterator(chunk_size=SEARCH_REBUILD_BATCH_SIZE):
+                batch.append(document_model(entity_type=entity_type, entity_id=obj.pk, **_search_document_values(entity_type, obj)))
+                if len(batch) >= SEARCH_REBUILD_BATCH_SIZE:
+                    document_model.objects.bulk_create(batch)
+                    counts[entity_type] += len(batch)
+                    batch = []
+            document_model.objects.bulk_create(batch)
+            counts[entity_type] += len(batch)
+    if document_model is SearchDocument:  # depuis une migration, TableGeneration n'existe pas encore
+        transaction.on_commit(bump_search_generation)
+    return counts
+
+def _search_match_q(term):
+    """ Prédicat des candidats sur SearchDocument.text (term déjà normalisé) : préfixe de mot si < 3 caractères, sinon trigram indexé. """
+    Q = django_models.Q
+    if len(term) < 3:
+        return Q(text__startswith=term) | Q(text__contains=f" {term}")
+    return Q(text__trigram_similar=term) | Q(text__trigram_word_similar=term)
+
+def search_document_matches(q, entity_type):
+    """ Ids (sous-requête) des entités `entity_type` dont le document correspond à q, sans score ni limite (ex: facettes). """
+    from .models import SearchDocument
+    return SearchDocument.objects.filter(_search_match_q(fold_accents(q)), entity_type=entity_type).values("entity_id")
+
+def search_documents(q, *, entities, limit, user=None, guest_id=None, scope="all"):
+    """
+    Recherche omnibox en une requête sur SearchDocument.
+
+    - Visibilité : public ∪ is_default ∪ possédés par user/guest_id, moins les recettes soft-hidden.
+      scope="public" : public ∪ is_default seuls (partagé entre appelants, cf. cached_search_documents) ;
+      scope="private" : lignes non publiques possédées par user/guest_id seules.
+    - Candidats : text % q OR q <% text (index GIN trigram ; seuils pg_trgm de la session),
+      préfixe de mot pour q < 3 caractères.
+    - text et q sont normalisés sans accents (fold_accents ≡ search_normalize) : "creme" trouve "crème".
+    - Score = weight × max(similarity(title, q), similarity(text, q)), calculé sur les seuls candidats.
+    - ROW_NUMBER() par entity_type : au plus `limit` résultats par entité, dans la même requête.
+
+    Returns:
+        list[SearchDocument] triée par score décroissant (attribut `score`).
+    """
+    from django.contrib.postgres.search import TrigramSimilarity
+    from django.db.models import F, Q, Window
+    from django.db.models.functions import Greatest, RowNumber
+    from .models import SearchDocument, SearchNormalize
+
+    public = Q(visibility="public") | Q(is_default=True)
+    owned = None
+    if user:
+        owned = Q(user=user)
+    if guest_id:
+        owned = owned | Q(guest_id=guest_id) if owned else Q(guest_id=guest_id)
+    if scope == "public" or owned is None:
+        if scope == "private":
+            return []
+        vis = public
+    else:
+        vis = owned & ~public if scope == "private" else public | owned
+    qs = SearchDocument.objects.filter(vis, entity_type__in=entities)
+
+    hidden = hidden_recipe_ids(user, guest_id) if scope == "all" else ()  # masquages : lignes publiques ou de base seules
+    if hidden:
+        qs = qs.exclude(entity_type="recipes", entity_id__in=sorted(hidden))
+
+    term = fold_accents(q)
+    qs = qs.filter(_search_match_q(term))
+
+    qs = (qs.annotate(score=Greatest(TrigramSimilarity(SearchNormalize("title"), term), TrigramSimilarity("text", term)) * F("weight"))
+            .annotate(rank=Window(RowNumber(), partition_by=[F("entity_type")], order_by=[F("score").desc(), F("title").asc()]))
+            .filter(rank__lte=limit)
+            .only("entity_type", "entity_id", "title", "subtitle"))
+    return sorted(qs, key=lambda d: (-d.score, d.title))
+
+SearchHit = namedtuple("SearchHit", "entity_type entity_id title subtitle score")
+SEARCH_PUBLIC_CACHE_DEPTH = 10  # nb de résultats publics mis en cache par entité (≥ limite max de l'omnibox)
+
+def cached_search_documents(q, *, entities, limit, user=None, guest_id=None):
+    """
+    Omnibox à deux niveaux :
+      - partie publique (public ∪ is_default) : mise en cache par requête normalisée, entités et génération
+        du contenu (get_search_generation), partagée par tous les appelants ;
+      - partie privée (lignes possédées non publiques) requêtée à chaque appel ; recettes soft-hidden exclues
+        via hidden_recipe_ids (cache partagé par propriétaire).
+    Fusion par entité (top `limit` au score), puis tri global.
+
+    Returns:
+        list[SearchHit] triée par score décroissant.
+    """
+    import hashlib
+    from django.conf import settings
+    from django.core.cache import cache
+
+    entities = sorted(entities)
+    term = fold_accents(q)
+    digest = hashlib.sha1(f"{term}|{','.join(entities)}".encode()).hexdigest()
+    key = f"search:public:{get_search_generation()}:{digest}"
+    public = cache.get(key)
+    if public is None:
+        public = [SearchHit(d.entity_type, d.entity_id, d.title, d.subtitle, d.score)
+                  for d in search_documents(q, entities=entities, limit=SEARCH_PUBLIC_CACHE_DEPTH, scope="public")]
+        cache.set(key, public, settings.SEARCH_PUBLIC_CACHE_TTL)
+
+    hits = list(public)
+    if user or guest_id:
+        hidden = hidden_recipe_ids(user, guest_id)
+        hits = [h for h in hits if not (h.entity_type == "recipes" and h.entity_id in hidden)]
+        hits += [SearchHit(d.entity_type, d.entity_id, d.title, d.subtitle, d.score)
+                 for d in search_documents(q, entities=entities, limit=limit, user=user, guest_id=guest_id, scope="private")]
+
+    hits.sort(key=lambda h: (-h.score, h.title))
+    kept, counts = [], {}
+    for hit in hits:
+        counts[hit.entity_type] = counts.get(hit.entity_type, 0) + 1
+        if counts[hit.entity_type] <= limit:
+            kept.append(hit)
+    return kept
+
+# ============================================================
+# 17. AUTOCOMPLÉTION PAR PRÉFIXE (INDEX EN MÉMOIRE)
+# ============================================================
+
+PREFIX_INDEX_ENTITIES = ("recipes", "ingredients", "categories", "labels")
+
+def get_search_generation():
+    """
+    Génération du contenu recherchable public : jeton TableGeneration de SearchDocument (cf. get_table_generations).
+    En base plutôt qu'en cache : jamais évincée, et un jeton n'est jamais réutilisé (aucune entrée périmée ne redevient valide).
+    """
+    from .models import SearchDocument
+    return get_table_generations(SearchDocument)[0]
+
+def bump_search_generation():
+    """ Invalide les index/caches de recherche de tous les processus (écriture d'une entité publique ou de base). """
+    from .models import SearchDocument
+    bump_table_generation(SearchDocument)
+    _forget_prefix_generation()  # ce processus voit sa propre écriture sans attendre l'intervalle de contrôle
+
+_PREFIX_GENERATION = None  # (génération, instant du contrôle) vue par l'index de préfixes de ce processus
+
+def _forget_prefix_generation():
+    global _PREFIX_GENERATION
+    _PREFIX_GENERATION = None
+
+def _prefix_index_generation():
+    """
+    Génération servie par l'index de préfixes : relue en base au plus une fois par SEARCH_GENERATION_CHECK_INTERVAL
+    secondes, pour garder la lecture en base hors du chemin de chaque frappe. Les autres processus voient une
+    écriture publique avec au plus ce délai.
+    """
+    import time
+    from django.conf import settings
+
+    global _PREFIX_GENERATION
+    checked = _PREFIX_GENERATION
+    now = time.monotonic()
+    if checked is None or now - checked[1] >= settings.SEARCH_GENERATION_CHECK_INTERVAL:
+        checked = _PREFIX_GENERATION = (get_search_generation(), now)
+    return checked[0]
+
+class PrefixIndex:
+    """
+    Index de préfixes en mémoire : listes triées de clés (nom sans accents) parcourues par bisect.
+      - `names` : nom complet → les suggestions « commence par » sortent en premier ;
+      - `words` : chaque suffixe commençant à un mot ("tarte aux pommes" → "aux pommes", "pommes").
+    Une recherche coûte O(log n + k).
+    """
+
+    def __init__(self, entries, generation=None):
+        """ entries : itérable de (entity_type, entity_id, title). """
+        self.generation = generation
+        names, words = [], []
+        for entity_type, entity_id, title in entries:
+            key = fold_accents(title or "")
+            if not key:
+                continue
+            item = (entity_type, entity_id, title)
+            names.append((key, item))
+            parts = key.split(" ")
+            for i in range(1, len(parts)):
+                words.append((" ".join(parts[i:]), item))
+        names.sort(key=lambda e: e[0])
+        words.sort(key=lambda e: e[0])
+        self._names, self._name_keys = names, [k for k, _ in names]
+        self._words, self._word_keys = words, [k for k, _ in words]
+
+    def __len__(self):
+        return len(self._names)
+
+    def search(self, prefix, *, entities=None, limit=10):
+        """ Suggestions dont le nom (puis un mot du nom) commence par `prefix` → list[(entity_type, entity_id, title)]. """
+        from bisect import bisect_left
+        prefix = fold_accents(prefix or "")
+        if not prefix:
+            return []
+        out, seen = [], set()
+        for keys, entries in ((self._name_keys, self._names), (self._word_keys, self._words)):
+            idx = bisect_left(keys, prefix)
+            while idx < len(keys) and keys[idx].startswith(prefix) and len(out) < limit:
+                item = entries[idx][1]
+                if (entities is None or item[0] in entities) and item[:2] not in seen:
+                    seen.add(item[:2])
+                    out.append(item)
+                idx += 1
+        return out
+
+_PREFIX_INDEX = None
+_PREFIX_INDEX_LOCK = threading.Lock()
+
+def _public_prefix_entries():
+    """ Noms publics indexés : recettes/ingrédients publics ou de base, toutes les catégories et tous les labels. """
+    from .models import Ingredient, Category, Label
+    public = django_models.Q(visibility="public") | django_models.Q(is_default=True)
+    yield from (("recipes", pk, name) for pk, name in Recipe.objects.filter(public).values_list("pk", "recipe_name").iterator())
+    yield from (("ingredients", pk, name) for pk, name in Ingredient.objects.filter(public).values_list("pk", "ingredient_name").iterator())
+    yield from (("categories", pk, name) for pk, name in Category.objects.values_list("pk", "category_name").iterator())
+    yield from (("labels", pk, name) for pk, name in Label.objects.values_list("pk", "label_name").iterator())
+
+def get_prefix_index():
+    """
+    Index de préfixes du processus, (re)construit à la première utilisation puis dès que la génération change
+    (contrôlée au plus une fois par intervalle, cf. _prefix_index_generation).
+    Un seul thread reconstruit ; les autres continuent de lire l'index précédent entre-temps.
+    """
+    global _PREFIX_INDEX
+    generation = _prefix_index_generation()
+    index = _PREFIX_INDEX
+    if index is not None and index.generation == generation:
+        return index
+    if not _PREFIX_INDEX_LOCK.acquire(blocking=index is None):
+        return index  # reconstruction en cours dans un autre thread
+    try:
+        if _PREFIX_INDEX is None or _PREFIX_INDEX.generation != generation:
+            _PREFIX_INDEX = PrefixIndex(_public_prefix_entries(), generation=generation)
+        return _PREFIX_INDEX
+    finally:
+        _PREFIX_INDEX_LOCK.release()
+
+def suggest_names(q, *, entities=PREFIX_INDEX_ENTITIES, limit=10, user=None, guest_id=None):
+    """
+    Autocomplétion : préfixes publics depuis l'index mémoire (hors recettes masquées par l'appelant,
+    cf. hidden_recipe_ids), complétés par une requête SQL (SearchDocument) pour les lignes privées
+    de l'appelant et la recherche approchée (trigram) lorsque l'index ne suffit pas à remplir `limit`.
+
+    Returns:
+        list[dict] {type, id, title, source: "prefix"|"db"}
+    """
+    from .models import SearchDocument
+
+    entities = [e for e in entities if e in PREFIX_INDEX_ENTITIES]
+    hidden = hidden_recipe_ids(user, guest_id) if "recipes" in entities else ()
+    prefixes = get_prefix_index().search(q, entities=entities, limit=limit + len(hidden))
+    results = [{"type": e, "id": pk, "title": title, "source": "prefix"}
+               for e, pk, title in prefixes if not (e == "recipes" and pk in hidden)][:limit]
+
+    term = fold_accents(q)  # même normalisation que SearchDocument.text
+    if (user or guest_id) and len(results) < limit:
+        owner = django_models.Q(user=user) if user else django_models.Q(guest_id=guest_id)
+        private = (SearchDocument.objects.filter(owner, entity_type__in=entities)
+                   .filter(django_models.Q(text__startswith=term) | django_models.Q(text__contains=f" {term}"))
+                   .exclude(visibility="public").order_by("title")[:limit])
+        results += [{"type": d.entity_type, "id": d.entity_id, "title": d.title, "source": "db"} for d in private]
+    if len(term) >= 3 and len(results) < limit:
+        fuzzy = search_documents(q, entities=entities, limit=limit, user=user, guest_id=guest_id)
+        results += [{"type": d.entity_type, "id": d.entity_id, "title": d.title, "source": "db"} for d in fuzzy]
+
+    out, seen = [], set()
+    for r in results:
+        if (r["type"], r["id"]) not in seen:
+            seen.add((r["type"], r["id"]))
+            out.append(r)
+    return out[:limit]
+
+# ============================================================
+# 18. RECHERCHE PLEIN TEXTE DANS LE CONTENU DES RECETTES
+# ============================================================
+
+RECIPE_SEARCH_CONFIG = "french"  # configuration text search PostgreSQL (racinisation française)
+
+def recipe_search_vector_expression(apps=None):
+    """
+    Expression tsvector pondérée d'une recette, évaluée dans un UPDATE ensembliste :
+      A : nom · B : chef et contexte · C : ingrédients et sous-recettes · D : instructions des étapes.
+    Les textes passent par unaccent, comme le terme recherché (fold_accents).
+    `apps` permet l'appel depuis une migration (modèles historiques).
+    """
+    from django.apps import apps as global_apps
+    from django.contrib.postgres.aggregates import StringAgg
+    from django.contrib.postgres.lookups import Unaccent
+    from django.contrib.postgres.search import SearchVector
+
+    apps = apps or global_apps
+    step_model, ingredient_model, sub_model = (apps.get_model("pastry_app", m) for m in ("RecipeStep", "RecipeIngredient", "SubRecipe"))
+
+    def joined(model, path):
+        rows = model.objects.filter(recipe=django_models.OuterRef("pk")).order_by().values("recipe")
+        return django_models.Subquery(rows.annotate(text=StringAgg(path, " ")).values("text"))
+
+    def vector(*expressions, weight):
+        return SearchVector(*(Unaccent(e) for e in expressions), weight=weight, config=RECIPE_SEARCH_CONFIG)
+
+    return (vector("recipe_name", weight="A")
+            + vector("chef_name", "context_name", weight="B")
+            + vector(joined(ingredient_model, "ingredient__ingredient_name"), joined(sub_model, "sub_recipe__recipe_name"), weight="C")
+            + vector(joined(step_model, "instruction"), weight="D"))
+
+def refresh_recipe_search_vectors(recipe_ids=None, *, apps=None):
+    """
+    Recalcule Recipe.search_vector en un seul UPDATE (sous-requêtes agrégées par recette).
+    recipe_ids : itérable ou queryset d'ids ; None → toutes les recettes.
+
+    Returns:
+        int: nb de recettes mises à jour
+    """
+    from django.apps import apps as global_apps
+
+    recipe_model = (apps or global_apps).get_model("pastry_app", "Recipe")
+    qs = recipe_model.objects.all() if recipe_ids is None else recipe_model.objects.filter(pk__in=recipe_ids)
+    return qs.update(search_vector=recipe_search_vector_expression(apps))
+
+def recipe_flag_expressions(apps=None):
+    """
+    Expressions des indicateurs dénormalisés de Recipe (sous-requêtes corrélées, évaluées dans un UPDATE) :
+    ingredient_count, has_steps, has_sub_recipes, is_preparation, is_variant.
+    """
+    from django.apps import apps as global_apps
+    from django.db.models import BooleanField, Count, Exists, ExpressionWrapper, IntegerField, OuterRef, Q, Subquery, Value
+    from django.db.models.functions import Coalesce
+
+    apps = apps or global_apps
+    step_model, ingredient_model, sub_model = (apps.get_model("pastry_app", m) for m in ("RecipeStep", "RecipeIngredient", "SubRecipe"))
+    ingredients = (ingredient_model.objects.filter(recipe=OuterRef("pk")).order_by().values("recipe")
+                   .annotate(n=Count("pk")).values("n"))
+    return {
+        "ingredient_count": Coalesce(Subquery(ingredients, output_field=IntegerField()), Value(0)),
+        "has_steps": Exists(step_model.objects.filter(recipe=OuterRef("pk"))),
+        "has_sub_recipes": Exists(sub_model.objects.filter(recipe=OuterRef("pk"))),
+        "is_preparation": Exists(sub_model.objects.filter(sub_recipe=OuterRef("pk"))),
+        "is_variant": ExpressionWrapper(Q(parent_recipe__isnull=False), output_field=BooleanField()),
+    }
+
+def refresh_recipe_flags(recipe_ids=None, *, apps=None):
+    """ Recalcule les indicateurs dénormalisés (un UPDATE). recipe_ids=None → toutes les recettes. """
+    from django.apps import apps as global_apps
+
+    recipe_model = (apps or global_apps).get_model("pastry_app", "Recipe")
+    qs = recipe_model.objects.all() if recipe_ids is None else recipe_model.objects.filter(pk__in=recipe_ids)
+    return qs.update(**recipe_flag_expressions(apps))
+
+def refresh_recipe_derived_fields(recipe_ids, touched=()):
+    """
+    tsvector + indicateurs des recettes `recipe_ids` (None ignorés) en un seul UPDATE (appelé par signaux).
+    `touched` : recettes dont le contenu imbriqué a changé (étapes, ingrédients, liens) → version +1 et updated_at,
+    pour que leur ETag (cf. recipe_etag) et le verrou optimiste If-Match suivent.
+    """
+    from django.db.models import Case, F, When
+    from django.db.models.functions import Now
+
+    if isinstance(recipe_ids, (list, tuple, set)):
+        recipe_ids = {pk for pk in recipe_ids if pk is not None}
+    updates = {"search_vector": recipe_search_vector_expression(), **recipe_flag_expressions()}
+    if touched:
+        updates["version"] = Case(When(pk__in=touched, then=F("version") + 1), default=F("version"),
+                                  output_field=django_models.PositiveIntegerField())
+        updates["updated_at"] = Case(When(pk__in=touched, then=Now()), default=F("updated_at"))
+    return Recipe.objects.filter(pk__in=recipe_ids).update(**updates)
+
+def search_recipe_content(queryset, q):
+    """
+    Filtre `queryset` sur le contenu des recettes (index GIN sur search_vector) et annote `content_rank`.
+    Syntaxe websearch : "bain-marie", praliné -noisette, "crème pâtissière".
+    """
+    from django.contrib.postgres.search import SearchQuery, SearchRank
+
+    query = SearchQuery(fold_accents(q), search_type="websearch", config=RECIPE_SEARCH_CONFIG)
+    return queryset.filter(search_vector=query).annotate(content_rank=SearchRank(django_models.F("search_vector"), query))
+
+# ============================================================
+# 19. FACETTES (COMPTEURS PAR VALEUR DE FILTRE)
+# ============================================================
+
+def parse_recipe_facets(raw):
+    """
+    Parse le paramètre ?facets= (CSV, "all" = toutes). Lève ValidationError sur une facette inconnue.
+
+    Returns:
+        list[str] (vide si paramètre absent)
+    """
+    from .constants import RECIPE_FACETS
+
+    if not raw:
+        return []
+    facets = [f.strip() for f in raw.split(",") if f.strip()]
+    if facets == ["all"]:
+        return list(RECIPE_FACETS)
+    invalid = [f for f in facets if f not in RECIPE_FACETS]
+    if invalid:
+        raise ValidationError(f"facets invalides: {invalid} (valeurs possibles : {', '.join(RECIPE_FACETS)}, all)")
+    return list(dict.fromkeys(facets))
+
+def recipe_facet_counts(queryset, facets):
+    """
+    Compteurs de facettes sur tout l'ensemble filtré `queryset` (pas seulement la page renvoyée) :
+    une requête GROUP BY par facette, sur la sous-requête des ids (filtres, visibilité et recherche déjà appliqués).
+
+    Returns:
+        dict: {"categories"/"labels": [{id, name, count}], "recipe_type"/"pan_type": [{value, count}]}
+              trié par count décroissant puis nom/valeur.
+    """
+    from django.db.models import Count
+    from .models import RecipeCategory, RecipeLabel
+
+    ids = queryset.order_by().values("pk")
+    recipes = Recipe.objects.filter(pk__in=ids)
+
+    def grouped(qs, key, name):
+        rows = qs.values(key, name).annotate(count=Count("pk")).order_by("-count", name)
+        return [{"id": r[key], "name": r[name], "count": r["count"]} for r in rows]
+
+    def by_value(qs, key):
+        rows = qs.values(key).annotate(count=Count("pk")).order_by("-count", key)
+        return [{"value": r[key], "count": r["count"]} for r in rows]
+
+    builders = {
+        "categories": lambda: grouped(RecipeCategory.objects.filter(recipe__in=ids), "category_id", "category__category_name"),
+        "labels": lambda: grouped(RecipeLabel.objects.filter(recipe__in=ids), "label_id", "label__label_name"),
+        "recipe_type": lambda: by_value(recipes, "recipe_type"),
+        "pan_type": lambda: by_value(recipes.filter(pan__isnull=False), "pan__pan_type"),
+    }
+    return {facet: builders[facet]() for facet in facets}
+
+# ============================================================
+# 20. VISIBILITÉ (UNION ALL DE BRANCHES INDEXABLES)
+# ============================================================
+
+# Partage les prédicats des index partiels de Recipe (idx_recipe_shared / idx_recipe_user_private / idx_recipe_guest_private)
+SHARED_VISIBILITY_Q = django_models.Q(visibility="public") | django_models.Q(is_default=True)
+PRIVATE_VISIBILITY_Q = ~django_models.Q(visibility="public") & django_models.Q(is_default=False)
+
+HIDDEN_RECIPES_CACHE_PREFIX = "recipes:hidden"
+
+def _hidden_recipes_cache_key(user_id=None, guest_id=None):
+    return f"{HIDDEN_RECIPES_CACHE_PREFIX}:u:{user_id}" if user_id else f"{HIDDEN_RECIPES_CACHE_PREFIX}:g:{guest_id}"
+
+def hidden_recipe_ids(user=None, guest_id=None):
+    """
+    Ids des recettes soft-hidden par l'appelant (UserRecipeVisibility.visible=False), user prioritaire sur guest_id.
+    Mis en cache par propriétaire dans le cache partagé (quelques ids au plus en pratique) : les listes et la recherche
+    les excluent en ids littéraux, sans anti-jointure. Invalidé au commit par signaux sur UserRecipeVisibility
+    (cf. invalidate_hidden_recipe_ids), HIDDEN_RECIPES_CACHE_TTL couvrant les écritures sans signal (.update()).
+
+    Returns:
+        frozenset[int] (vide sans user ni guest_id)
+    """
+    from django.conf import settings
+    from django.core.cache import cache
+    from .models import UserRecipeVisibility
+
+    if not (user or guest_id):
+        return frozenset()
+    key = _hidden_recipes_cache_key(getattr(user, "pk", None), guest_id)
+    hidden = cache.get(key)
+    if hidden is None:
+        owner = {"user": user} if user else {"guest_id": guest_id}
+        hidden = frozenset(UserRecipeVisibility.objects.filter(visible=False, **owner).values_list("recipe_id", flat=True))
+        cache.set(key, hidden, settings.HIDDEN_RECIPES_CACHE_TTL)
+    return hidden
+
+def invalidate_hidden_recipe_ids(user_id=None, guest_id=None):
+    """ Oublie l'ensemble mis en cache d'un propriétaire (appelé à chaque écriture de UserRecipeVisibility). """
+    from django.core.cache import cache
+    cache.delete(_hidden_recipes_cache_key(user_id, guest_id))
+
+def visible_ids(model, *, user=None, guest_id=None, hidden=()):
+    """
+    Sous-requête des ids visibles, en UNION ALL de branches disjointes plutôt qu'un OR global :
+      1. publiques ou de base, hors `hidden` (ids littéraux, cf. hidden_recipe_ids : pas d'anti-jointure) ;
+      2. privées possédées par `user` ;
+      3. privées possédées par `guest_id`.
+    Chaque branche est servie par son propre index partiel ; à utiliser via `pk__in` (semi-jointure, sans DISTINCT).
+    """
+    shared = model.objects.filter(SHARED_VISIBILITY_Q)
+    if hidden:
+        shared = shared.exclude(pk__in=sorted(hidden))
+    branches = [shared]
+    if user:
+        branches.append(model.objects.filter(PRIVATE_VISIBILITY_Q, user=user))
+    if guest_id:
+        branches.append(model.objects.filter(PRIVATE_VISIBILITY_Q, guest_id=guest_id))
+    first, *rest = (b.order_by().values("pk") for b in branches)
+    return first.union(*rest, all=True) if rest else first
+
+def visible_recipes(user=None, guest_id=None, queryset=None):
+    """
+    Recettes visibles pour un user et/ou un invité : publiques/de base non masquées + privées possédées.
+    `queryset` (par défaut Recipe.objects.all()) conserve ses select_related/prefetch.
+    """
+    queryset = Recipe.objects.all() if queryset is None else queryset
+    hidden = hidden_recipe_ids(user, guest_id)
+    return queryset.filter(pk__in=visible_ids(Recipe, user=user, guest_id=guest_id, hidden=hidden))
+
+# ============================================================
+# 21. CHAMPS CLAIRSEMÉS (?fields= / ?expand=)
+# ============================================================
+
+def parse_sparse_fieldset(raw_fields, raw_expand, *, allowed, expandable):
+    """
+    Parse ?fields= et ?expand= (CSV). Lève ValidationError sur un champ inconnu ou non développable.
+    Un champ développé est rendu même s'il n'est pas listé dans `fields`.
+
+    Returns:
+        (fields, expand) : frozenset des champs à rendre (None = tous), frozenset des relations à développer
+    """
+    def split(raw):
+        return [f.strip() for f in (raw or "").split(",") if f.strip()]
+
+    fields, expand = split(raw_fields), split(raw_expand)
+    invalid = [f for f in fields if f not in allowed]
+    if invalid:
+        raise ValidationError(f"fields invalides: {invalid} (valeurs possibles : {', '.join(allowed)})")
+    invalid = [f for f in expand if f not in expandable]
+    if invalid:
+        raise ValidationError(f"expand invalides: {invalid} (valeurs possibles : {', '.join(expandable)})")
+    return (frozenset(fields) | frozenset(expand) if fields else None), frozenset(expand)
+
+# ============================================================
+# 22. REQUÊTES CONDITIONNELLES (ETAG / LAST-MODIFIED)
+# ============================================================
+
+REFERENCE_LIST_CACHE_PREFIX = "reflist"  # listes de référence sérialisées, clé = état de génération (cf. GenerationETagMixin)
+
+def new_generation_token():
+    """ Jeton de génération jamais réutilisé : aucun ETag émis avant une écriture ne peut revalider après. """
+    import uuid
+    return uuid.uuid4().hex
+
+def get_table_generations(*models):
+    """
+    Générations des tables `models` (une requête, cf. TableGeneration) ; une table encore absente reçoit un
+    jeton neuf (un jeton neuf ne fait jamais revalider un ancien ETag : au pire un 200 de plus).
+    """
+    from .models import TableGeneration
+
+    labels = [m._meta.label_lower for m in models]
+    found = dict(TableGeneration.objects.filter(table_name__in=labels).values_list("table_name", "token"))
+    missing = [TableGeneration(table_name=label, token=new_generation_token()) for label in labels if label not in found]
+    if missing:
+        TableGeneration.objects.bulk_create(missing, update_conflicts=True, unique_fields=["table_name"], update_fields=["token"])
+        found.update((g.table_name, g.token) for g in missing)
+    return [found[label] for label in labels]
+
+def bump_table_generation(model):
+    """
+    Nouvelle génération de `model` (signaux, et écritures groupées sans signal), en un upsert.
+    Écrite dans la transaction courante : les lecteurs ne voient la nouvelle génération qu'avec les nouvelles données.
+    """
+    from .models import TableGeneration
+    TableGeneration.objects.bulk_create([TableGeneration(table_name=model._meta.label_lower, token=new_generation_token())],
+                                        update_conflicts=True, unique_fields=["table_name"], update_fields=["token"])
+
+def make_etag(*parts):
+    """ ETag fort (entre guillemets) : empreinte des composants d'état de la représentation. """
+    import hashlib
+    from django.utils.http import quote_etag
+    return quote_etag(hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:32])
+
+def recipe_etag(recipe_id, version, variant=""):
+    """
+    ETag d'une recette : "<id>-<version>", suffixé d'une empreinte de `variant` (ex: ?fields=) si non vide.
+    Réutilisable tel quel dans If-Match (cf. etag_version).
+    """
+    import hashlib
+    suffix = f"-{hashlib.sha1(variant.encode()).hexdigest()[:12]}" if variant else ""
+    return f'"{recipe_id}-{version}{suffix}"'
+
+def etag_version(value):
+    """ Version portée par un If-Match : "3", ou ETag de recette "\"<id>-<version>[-…]\"" (W/ toléré). None si illisible. """
+    value = (value or "").strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    value = value.strip('"')
+    parts = value.split("-")
+    if len(parts) == 1 and parts[0].isdigit():
+        return int(parts[0])
+    if len(parts) >= 2 and parts[1].isdigit():
+        return int(parts[1])
+    return None
+
+def recipe_tree_state(recipe_id):
+    """
+    État de l'arbre d'une recette (elle-même + sous-recettes à toute profondeur), en une requête récursive :
+    (liste triée des (id, version), updated_at le plus récent). Liste vide si la recette n'existe pas.
+    """
+    from django.db import connection
+
+    recipe_table, link_table = Recipe._meta.db_table, SubRecipe._meta.db_table
+    sql = (f"WITH RECURSIVE tree(id) AS (SELECT %s::bigint UNION "
+           f"SELECT l.sub_recipe_id FROM {link_table} l JOIN tree t ON l.recipe_id = t.id) "
+           f"SELECT r.id, r.version, r.updated_at FROM {recipe_table} r JOIN tree USING (id) ORDER BY r.id")
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [recipe_id])
+        rows = cursor.fetchall()
+    return [(pk, version) for pk, version, _ in rows], max((row[2] for row in rows), default=None)
@@ -1,18 +1,26 @@
 # views.py
+import base64
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from rest_framework import viewsets, status
 from rest_framework.views import APIView
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAdminUser
-from rest_framework.exceptions import PermissionDenied, ValidationError as DRFValidationError
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError as DRFValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.throttling import ScopedRateThrottle
 from django.core.exceptions import ValidationError as DjangoValidationError
 from django.views.decorators.cache import cache_page
 from django.views.decorators.vary import vary_on_headers
-from django.db import transaction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
 from django.db.utils import IntegrityError 
 from django.utils.decorators import method_decorator
+from django.utils import timezone
 from django.db.models import ProtectedError, Q, Value, FloatField
 from django.db.models.functions import Greatest
 from django_filters.rest_framework import DjangoFilterBackend
@@ -72,29 +80,27 @@ def _visible_recipes(request):
         QuerySet[Recipe]: recettes filtrées selon les droits de lecture.
     """
     user = request.user if getattr(request.user, "is_authenticated", False) else None
-    guest_id = _extract_guest_id(request)
-    qs = Recipe.objects.all()
-    vis_q = Q(visibility="public") | Q(is_default=True)
-    if user:
-        vis_q |= Q(user=user)
-    if guest_id:
-        vis_q |= Q(guest_id=guest_id)
-    qs = qs.filter(vis_q)
-    # soft-hide
-    if user:
-        hidden = UserRecipeVisibility.objects.filter(user=user, visible=False).values_list("recipe_id", flat=True)
-        qs = qs.exclude(id__in=hidden)
-    elif guest_id:
-        hidden = UserRecipeVisibility.objects.filter(guest_id=guest_id, visible=False).values_list("recipe_id", flat=True)
-        qs = qs.exclude(id__in=hidden)
-    return qs
+    return visible_recipes(user=user, guest_id=_extract_guest_id(request))
+
+def _set_similarity_threshold():
+    """
+    Fixe les seuils pg_trgm de la session (opérateurs % et <%) avant les requêtes de recherche.
+    Valeurs: settings.SEARCH_SIMILARITY_THRESHOLD et settings.SEARCH_WORD_SIMILARITY_THRESHOLD.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, false), "
+                       "set_config('pg_trgm.word_similarity_threshold', %s, false)",
+                       [str(settings.SEARCH_SIMILARITY_THRESHOLD), str(settings.SEARCH_WORD_SIMILARITY_THRESHOLD)])
 
 def _score_qs(qs, q, fields):
     """
     Annote et filtre un QuerySet avec un score de pertinence textuelle.
 
     Méthode:
-      - Si TrigramSimilarity dispo: score = max(trigram(field_i, q)).
+      - Si TrigramSimilarity dispo: candidats = (field_i % q) OR (q <% field_i), opérateurs indexables par
+        les index GIN gin_trgm_ops (seuils pg_trgm fixés par _set_similarity_threshold) ; pour q < 3 caractères
+        (aucun trigramme exploitable) : préfixe LIKE 'q%'.
+        Le score = max(trigram(field_i, q)) n'est calculé que sur ces candidats.
       - Sinon: fallback icontains → score fixe 1.0 et filtrage OR sur fields.
     Usage:
       - Tri intra-entité par -score, pas de normalisation inter-entités.
@@ -108,6 +114,13 @@ def _score_qs(qs, q, fields):
         QuerySet: queryset annoté d'une colonne 'score' et déjà filtré.
     """
     if HAS_TRIGRAM:
+        cond = Q()
+        for f in fields:
+            if len(q) < 3:
+                cond |= Q(**{f"{f}__startswith": normalize_case(q)})
+            else:
+                cond |= Q(**{f"{f}__trigram_similar": q}) | Q(**{f"{f}__trigram_word_similar": q})
+        qs = qs.filter(cond)
         sims = [TrigramSimilarity(f, q) for f in fields]
         if len(sims) == 1:
             return qs.annotate(score=sims[0])
@@ -117,6 +130,63 @@ def _score_qs(qs, q, fields):
         cond |= Q(**{f"{f}__icontains": q})
     return qs.annotate(score=Value(1.0, output_field=FloatField())).filter(cond)
 
+_SEARCH_EXECUTOR = None
+_SEARCH_CONNECTIONS = []  # connexions Django des threads du pool (fermées par _shutdown_search_executor)
+
+def _register_search_connection():
+    """ Initialiseur des threads du pool : mémorise la connexion du thread pour pouvoir la fermer à l'arrêt. """
+    _SEARCH_CONNECTIONS.append(connections[DEFAULT_DB_ALIAS])
+
+def _search_executor():
+    """ Pool de threads borné (settings.SEARCH_MAX_WORKERS) partagé par les requêtes omnibox, créé à la demande. """
+    global _SEARCH_EXECUTOR
+    if _SEARCH_EXECUTOR is None:
+        _SEARCH_EXECUTOR = ThreadPoolExecutor(max_workers=settings.SEARCH_MAX_WORKERS, thread_name_prefix="omnibox",
+                                              initializer=_register_search_connection)
+    return _SEARCH_EXECUTOR
+
+def _shutdown_search_executor():
+    """ Arrête le pool omnibox et ferme les connexions de ses threads (tests transactionnels, arrêt du processus). """
+    global _SEARCH_EXECUTOR
+    if _SEARCH_EXECUTOR is not None:
+        _SEARCH_EXECUTOR.shutdown(wait=True)
+        _SEARCH_EXECUTOR = None
+    while _SEARCH_CONNECTIONS:
+        conn = _SEARCH_CONNECTIONS.pop()
+        conn.inc_thread_sharing()
+        try:
+            conn.close()
+        finally:
+            conn.dec_thread_sharing()
+
+def _run_in_own_connection(query):
+    """
+    Exécute une requête d'entité dans un thread du pool. Chaque thread garde sa connexion Django d'une tâche
+    à l'autre (au plus SEARCH_MAX_WORKERS connexions, quel que soit CONN_MAX_AGE) : ouvrir une connexion
+    PostgreSQL par requête coûterait plus que le parallélisme ne rapporte. Elle n'est rouverte qu'après une
+    erreur ou une coupure ; les seuils pg_trgm sont fixés une fois par connexion.
+    """
+    if connection.connection is not None and connection.errors_occurred:
+        if connection.is_usable():
+            connection.errors_occurred = False
+        else:
+            connection.close()
+    if HAS_TRIGRAM and connection.connection is None:
+        _set_similarity_threshold()  # ouvre la connexion
+    return query()
+
+def _run_entity_queries(queries):
+    """
+    Exécute les requêtes {entité: callable} et renvoie {entité: résultat}.
+
+    Parallèle sur le pool si SEARCH_MAX_WORKERS > 1 et plusieurs entités. Séquentiel dans une transaction
+    (ATOMIC_REQUESTS, tests) : les autres connexions ne verraient pas les écritures non committées.
+    """
+    if settings.SEARCH_MAX_WORKERS <= 1 or len(queries) <= 1 or connection.in_atomic_block:
+        return {entity: query() for entity, query in queries.items()}
+    futures = {entity: _search_executor().submit(_run_in_own_connection, query) for entity, query in queries.items()}
+    return {entity: future.result() for entity, future in futures.items()}
+
 @method_decorator(cache_page(30), name="dispatch")
 @method_decorator(vary_on_headers("Authorization","X-Guest-Id","X-GUEST-ID"), name="dispatch")
 class SearchAPIView(APIView):
@@ -140,20 +210,26 @@ class SearchAPIView(APIView):
             - entities (str, optionnel): liste CSV dans {recipes,ingredients,pans,categories,labels,stores}.
               Défaut: recipes,ingredients,stores.
             - limit (int, optionnel): 1..10, défaut 5. S'applique par entité.
+            - facets (str, optionnel): CSV dans {categories,labels,recipe_type,pan_type} ou "all" ; compteurs sur
+              toutes les recettes correspondant à q (pas seulement les `limit` premières), cf. recipe_facet_counts.
 
         Sécurité:
             - Recettes: (public ∪ is_default ∪ owned par user/guest) \ soft-hidden.
             - Autres entités: lecture libre (sauf si un champ visibility existe, même logique).
 
         Classement:
-            - TrigramSimilarity si disponible, sinon icontains binaire.
+            - Index unifié (settings.SEARCH_UNIFIED_INDEX) : une requête sur SearchDocument, score pondéré par entité
+              (cf. search_documents), "results" = top `limit` toutes entités confondues.
+              Partie publique en cache partagé (génération de contenu), partie privée en direct (cached_search_documents).
+            - Sinon une requête par entité. Candidats par opérateurs trigram indexés (%, <%),
+              seuil settings.SEARCH_SIMILARITY_THRESHOLD ; TrigramSimilarity calculée sur les seuls candidats.
             - Tri intra-entité par -score puis nom.
 
         Cache:
             - Cache HTTP 30 s (cache_page) avec Vary sur Authorization, X-Guest-Id, X-GUEST-ID.
 
         Réponse:
-            200: {"q", "limit", "entities", "<entité>": [items sérialisés]}
+            200: {"q", "limit", "entities", "<entité>": [items sérialisés], "results"?: [items + type], "facets"?: {...}}
             400: {"error": "..."} si q invalide ou entities invalides.
 
         Returns:
@@ -172,41 +248,194 @@ class SearchAPIView(APIView):
         except ValueError:
             limit = LIMIT_DEFAULT
         limit = max(LIMIT_MIN, min(LIMIT_MAX, limit))
+        try:
+            facets = parse_recipe_facets(request.query_params.get("facets")) if "recipes" in entities else []
+        except DjangoValidationError as e:
+            return Response({"error": str(e)}, status=400)
 
         out = {"q": q, "limit": limit, "entities": entities}
+        if HAS_TRIGRAM:
+            _set_similarity_threshold()
+
+        if HAS_TRIGRAM and settings.SEARCH_UNIFIED_INDEX:
+            user = request.user if getattr(request.user, "is_authenticated", False) else None
+            docs = cached_search_documents(q, entities=entities, limit=limit, user=user, guest_id=_extract_guest_id(request))
+            for entity in entities:
+                out[entity] = SearchDocumentOmniSerializer([d for d in docs if d.entity_type == entity], many=True).data
+            out["results"] = SearchDocumentOmniSerializer(docs[:limit], many=True, context={"with_type": True}).data
+            if facets:
+                out["facets"] = recipe_facet_counts(_visible_recipes(request).filter(pk__in=search_document_matches(q, "recipes")), facets)
+            return Response(out)
+
+        out = self._search_per_entity(request, q, entities, limit, out)
+        if facets:
+            matches = _score_qs(_visible_recipes(request), q, ["recipe_name","chef_name","context_name"])
+            out["facets"] = recipe_facet_counts(matches, facets)
+        return Response(out)
 
-        if "recipes" in entities:
-            rqs = _score_qs(_visible_recipes(request), q, ["recipe_name","chef_name","context_name"])\
-                    .only("id","recipe_name","chef_name","context_name")\
-                    .order_by("-score","recipe_name")[:limit]
-            out["recipes"] = RecipeOmniSerializer(rqs, many=True).data
-        if "ingredients" in entities:
-            iqs = _score_qs(Ingredient.objects.all(), q, ["ingredient_name"]).only("id","ingredient_name")\
-                    .order_by("-score","ingredient_name")[:limit]
-            out["ingredients"] = IngredientOmniSerializer(iqs, many=True).data
-        if "pans" in entities:
-            pqs = _score_qs(Pan.objects.all(), q, ["pan_name"]).only("id","pan_name")\
-                    .order_by("-score","pan_name")[:limit]
-            out["pans"] = PanOmniSerializer(pqs, many=True).data
-        if "categories" in entities:
-            cqs = _score_qs(Category.objects.all(), q, ["category_name"]).only("id","category_name","category_type","parent_category")\
-                    .order_by("-score","category_name")[:limit]
-            out["categories"] = CategoryOmniSerializer(cqs, many=True).data
-        if "labels" in entities:
-            lqs = _score_qs(Label.objects.all(), q, ["label_name"]).only("id","label_name","label_type")\
-                    .order_by("-score","label_name")[:limit]
-            out["labels"] = LabelOmniSerializer(lqs, many=True).data
-        if "stores" in entities:
-            sqs = _score_qs(Store.objects.all(), q, ["store_name","city","zip_code"]).only("id","store_name","city","zip_code")\
-                    .order_by("-score","store_name")[:limit]
-            out["stores"] = StoreOmniSerializer(sqs, many=True).data
+    def _search_per_entity(self, request, q, entities, limit, out):
+        """
+        Mode historique (SEARCH_UNIFIED_INDEX=False) : une requête scorée par entité.
+        Les requêtes sont lancées en parallèle (cf. _run_entity_queries) : latence = max des requêtes, pas leur somme.
+        """
+        queries = {
+            "recipes": lambda: RecipeOmniSerializer(
+                _score_qs(_visible_recipes(request), q, ["recipe_name","chef_name","context_name"])
+                .only("id","recipe_name","chef_name","context_name").order_by("-score","recipe_name")[:limit], many=True).data,
+            "ingredients": lambda: IngredientOmniSerializer(
+                _score_qs(Ingredient.objects.all(), q, ["ingredient_name"]).only("id","ingredient_name")
+                .order_by("-score","ingredient_name")[:limit], many=True).data,
+            "pans": lambda: PanOmniSerializer(
+                _score_qs(Pan.objects.all(), q, ["pan_name"]).only("id","pan_name")
+                .order_by("-score","pan_name")[:limit], many=True).data,
+            "categories": lambda: CategoryOmniSerializer(
+                _score_qs(Category.objects.all(), q, ["category_name"]).only("id","category_name","category_type","parent_category")
+                .order_by("-score","category_name")[:limit], many=True).data,
+            "labels": lambda: LabelOmniSerializer(
+                _score_qs(Label.objects.all(), q, ["label_name"]).only("id","label_name","label_type")
+                .order_by("-score","label_name")[:limit], many=True).data,
+            "stores": lambda: StoreOmniSerializer(
+                _score_qs(Store.objects.all(), q, ["store_name","city","zip_code"]).only("id","store_name","city","zip_code")
+                .order_by("-score","store_name")[:limit], many=True).data,
+        }
+        out.update(_run_entity_queries({e: queries[e] for e in entities}))
+        return out
 
-        return Response(out)
+class SearchSuggestAPIView(APIView):
+    """
+    GET /api/search/suggest/?q=...&entities=recipes,ingredients,categories,labels&limit=10
+    Autocomplétion à chaque frappe : préfixes publics servis par l'index mémoire du processus (suggest_names),
+    SQL uniquement pour les lignes privées de l'appelant et le repli approché.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        q = (request.query_params.get("q") or "").strip()
+        if not (MIN_Q_LEN <= len(q) <= MAX_Q_LEN):
+            return Response({"error": f"Paramètre q requis, longueur {MIN_Q_LEN}..{MAX_Q_LEN}."}, status=400)
+        raw_entities = request.query_params.get("entities") or ",".join(PREFIX_INDEX_ENTITIES)
+        entities = [e.strip() for e in raw_entities.split(",") if e.strip()]
+        invalid = [e for e in entities if e not in PREFIX_INDEX_ENTITIES]
+        if invalid:
+            return Response({"error": f"entities invalides: {invalid}"}, status=400)
+        try:
+            limit = max(LIMIT_MIN, min(LIMIT_MAX, int(request.query_params.get("limit", LIMIT_MAX))))
+        except ValueError:
+            limit = LIMIT_MAX
+
+        user = request.user if getattr(request.user, "is_authenticated", False) else None
+        results = suggest_names(q, entities=entities, limit=limit, user=user, guest_id=_extract_guest_id(request))
+        return Response({"q": q, "results": results})
 
 # Alias pour ?q= en plus de ?search=
 class QSearchFilter(SearchFilter):
     search_param = "q"
 
+class KeysetPagination(BasePagination):
+    """
+    Pagination par curseur opaque (keyset) : page N coûte autant que la page 1, sans OFFSET ni COUNT(*).
+
+    - Opt-in : actif seulement avec ?cursor= ou ?page_size= (sinon la liste reste complète, contrat historique).
+    - Ordres stables déclarés par la vue (`keyset_orderings` : clé ?ordering → champs terminés par un champ unique),
+      chacun adossé à un index composite ; défaut = première clé, tout autre ?ordering → 400.
+    - Curseur = base64(JSON {ordering, valeurs de la dernière ligne}) ; la page suivante filtre
+      (a, id) > (va, vid) sous forme (a ≥ va) AND (a > va OR (a = va AND id > vid)).
+    - Réponse : {"next": url|null, "results": [...]}.
+    """
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = 50
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        qp = request.query_params
+        if self.cursor_query_param not in qp and self.page_size_query_param not in qp:
+            return None
+        if not hasattr(queryset, "order_by"):  # listes calculées en Python (ex: reference-uses) : pas de keyset
+            return None
+        orderings = getattr(view, "keyset_orderings", None) or {"id": ("id",)}
+        cursor = self._decode(qp.get(self.cursor_query_param)) if qp.get(self.cursor_query_param) else None
+        if cursor is not None:
+            key = cursor["o"]
+            if key not in orderings:
+                raise NotFound("Curseur invalide.")
+        elif qp.get("ordering"):
+            key = qp.get("ordering")
+            if key not in orderings:  # refuser plutôt que trier autrement que demandé
+                raise DRFValidationError({"error": f"Tri '{key}' non disponible avec la pagination par curseur. "
+                                                   f"Tris possibles : {', '.join(orderings)}."})
+        else:
+            key = next(iter(orderings))
+        fields = orderings[key]
+
+        try:
+            size = min(int(qp.get(self.page_size_query_param, self.page_size)), self.max_page_size)
+        except ValueError:
+            size = self.page_size
+        size = max(1, size)
+
+        queryset = queryset.order_by(*fields)
+        if cursor is not None:
+            queryset = queryset.filter(self._after(fields, cursor["v"]))
+        rows = list(queryset[:size + 1])
+        self.request, self.key = request, key
+        self.next_values = [self._value(rows[size - 1], f) for f in fields] if len(rows) > size else None
+        return rows[:size]
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_next_link(self):
+        if self.next_values is None:
+            return None
+        token = base64.urlsafe_b64encode(json.dumps({"o": self.key, "v": self.next_values}).encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, token)
+
+    def _decode(self, token):
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+            if not isinstance(cursor, dict) or not isinstance(cursor.get("v"), list):
+                raise ValueError
+            return cursor
+        except (ValueError, TypeError, UnicodeDecodeError):
+            raise NotFound("Curseur invalide.")
+
+    @staticmethod
+    def _value(obj, field):
+        value = getattr(obj, field.lstrip("-"))
+        return value.isoformat() if hasattr(value, "isoformat") else value
+
+    @staticmethod
+    def _after(fields, values):
+        if len(values) != len(fields):
+            raise NotFound("Curseur invalide.")
+        first = fields[0].lstrip("-")
+        bound = Q(**{f"{first}__{'lte' if fields[0].startswith('-') else 'gte'}": values[0]})  # borne indexable
+        after = Q()
+        for i, field in enumerate(fields):
+            name, op = field.lstrip("-"), "lt" if field.startswith("-") else "gt"
+            cond = Q(**{f"{name}__{op}": values[i]})
+            for prev, value in zip(fields[:i], values[:i]):
+                cond &= Q(**{prev.lstrip("-"): value})
+            after |= cond
+        return bound & after
+
+class RankedPagination(PageNumberPagination):
+    """
+    Listes classées par adéquation (ordre calculé, sans clé de keyset) : pages numérotées ?page= / ?page_size=,
+    toujours bornées (page_size par défaut et maximum de KeysetPagination). Réponse : {count, next, previous, results}.
+    """
+    page_size = KeysetPagination.page_size
+    page_size_query_param = "page_size"
+    max_page_size = KeysetPagination.max_page_size
+
+class RankedOrderingFilter(OrderingFilter):
+    """ Sans ?ordering explicite, une recherche plein texte (?content=) est triée par pertinence. """
+    def filter_queryset(self, request, queryset, view):
+        if self.ordering_param not in request.query_params and "content_rank" in queryset.query.annotations:
+            return queryset.order_by("-content_rank", *(self.get_default_ordering(view) or []))
+        return super().filter_queryset(request, queryset, view)
+
 def _sanitize_params(qp, allowed: set) -> dict:
     """
     Filtre les query params : garde seulement ceux de 'allowed'.
@@ -224,6 +453,13 @@ class RecipeFilter(filters.FilterSet):
     - usage_type: standalone|preparation|both
     - has_pan / has_servings: présence d'info scalable
     - mine: limiter aux recettes de l'utilisateur courant (user ou guest_id)    
+    - content: recherche plein texte pondérée dans le nom, les ingrédients et les étapes (ex: ?content=bain-marie)
+    - plages numériques (index B-tree) :
+        servings_min/servings_max (chevauchement avec la plage de portions de la recette),
+        total_recipe_quantity_min/_max (g), pan_volume_min/_max (cm³),
+        created_at_after/_before, updated_at_after/_before (AAAA-MM-JJ)
+    - indicateurs dénormalisés (sans jointure) : has_steps, has_sub_recipes, is_preparation, is_variant,
+        ingredient_count_min/_max
     """
     # tags
     tags = filters.CharFilter(method='filter_tags')
@@ -242,6 +478,23 @@ class RecipeFilter(filters.FilterSet):
     # ownership
     mine = filters.BooleanFilter(method="filter_mine")
 
+    # contenu (tsvector)
+    content = filters.CharFilter(method="filter_content")
+
+    # plages numériques / dates
+    servings = filters.RangeFilter(method="filter_servings")
+    total_recipe_quantity = filters.RangeFilter()
+    pan_volume = filters.RangeFilter(field_name="pan__volume_cm3_cache")
+    created_at = filters.DateFromToRangeFilter()
+    updated_at = filters.DateFromToRangeFilter()
+
+    # indicateurs dénormalisés (cf. utils.recipe_flag_expressions)
+    has_steps = filters.BooleanFilter()
+    has_sub_recipes = filters.BooleanFilter()
+    is_preparation = filters.BooleanFilter()
+    is_variant = filters.BooleanFilter()
+    ingredient_count = filters.RangeFilter()
+
     class Meta:
         model = Recipe
         fields = ['recipe_type', 'chef_name', 'categories', 'labels', 'pan', 'parent_recipe']
@@ -268,8 +521,8 @@ class RecipeFilter(filters.FilterSet):
 
     def filter_usage(self, qs, name, value):
         if value == "preparation":
-            # recettes déjà utilisées comme sous-recette
-            return qs.filter(used_in_recipes__isnull=False).distinct()
+            # recettes déjà utilisées comme sous-recette (indicateur dénormalisé : ni jointure ni DISTINCT)
+            return qs.filter(is_preparation=True)
         # "standalone" = pas de restriction; "both" idem
         return qs
 
@@ -283,6 +536,20 @@ class RecipeFilter(filters.FilterSet):
             return qs.filter(Q(servings_min__isnull=False) | Q(servings_max__isnull=False))
         return qs.filter(Q(servings_min__isnull=True) & Q(servings_max__isnull=True))
 
+    def filter_servings(self, qs, name, value):
+        """Recettes dont la plage [servings_min, servings_max] chevauche la plage demandée (bornes optionnelles)."""
+        if value.start is not None:
+            qs = qs.filter(servings_max__gte=value.start)
+        if value.stop is not None:
+            qs = qs.filter(servings_min__lte=value.stop)
+        return qs
+
+    def filter_content(self, qs, name, value):
+        """Recherche plein texte (index GIN sur search_vector), annote `content_rank` pour le tri."""
+        if not value.strip():
+            return qs
+        return search_recipe_content(qs, value)
+
     def filter_mine(self, qs, name, value: bool):
         """Filtre les objets appartenant à l’utilisateur ou invité courant."""
         if not value:
@@ -304,9 +571,11 @@ class RecipeFilter(filters.FilterSet):
         # si anonyme sans identifiant, rien
         return qs.none()
 
-class StoreViewSet(GuestUserRecipeMixin, viewsets.ModelViewSet):
+class StoreViewSet(GenerationETagMixin, GuestUserRecipeMixin, viewsets.ModelViewSet):
     """ API CRUD pour gérer les magasins. """
     queryset = Store.objects.all().order_by('store_name', 'city')
+    etag_generation_models = (Store,)
+    cache_generation_lists = True
     serializer_class = StoreSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ["city", "zip_code", "store_name"]
@@ -372,14 +641,50 @@ class IngredientPriceViewSet(viewsets.ModelViewSet):
             
         return super().create(request, *args, **kwargs)
 
+    @action(detail=False, methods=["post"], url_path="bulk-import", permission_classes=[IsAdminUser])
+    def bulk_import(self, request):
+        """
+        Import en masse d’une liste de prix fournisseur (admin uniquement).
+
+        Entrée: {rows: [...], skip_invalid: bool, dry_run: bool}
+        Réponses:
+          200: rapport {received, created, updated, unchanged, archived, retroactive, errors, dry_run}
+          400: rapport avec "errors" si des lignes sont invalides et skip_invalid=False (rien n’est écrit)
+        """
+        s = IngredientPriceBulkImportSerializer(data=request.data)
+        s.is_valid(raise_exception=True)
+        report = bulk_import_prices(s.validated_data["rows"], skip_invalid=s.validated_data["skip_invalid"], 
+                                    dry_run=s.validated_data["dry_run"])
+        code = status.HTTP_400_BAD_REQUEST if report["errors"] and not s.validated_data["skip_invalid"] else status.HTTP_200_OK
+        return Response(report, status=code)
+
 class IngredientPriceHistoryViewSet(viewsets.ReadOnlyModelViewSet):
     """ API en lecture seule pour l'historique des prix d'ingrédients. """
     queryset = IngredientPriceHistory.objects.all()
     serializer_class = IngredientPriceHistorySerializer
     filter_backends = [SearchFilter]
     search_fields = ["ingredient__ingredient_name"]
+    pagination_class = KeysetPagination
+    keyset_orderings = {"-date": ("-date", "-id"), "date": ("date", "id")}  # index iph_date_id
+
+    @action(detail=False, methods=["get"], url_path="trends")
+    def trends(self, request):
+        """
+        Tendances de prix agrégées (prix au gramme min/moy/max) par semaine ou par mois, calculées en SQL.
+
+        Query params: ingredient=1,2 (obligatoire), bucket=week|month, by_store=0|1, start, end (YYYY-MM-DD)
+        Réponse: {bucket, start, end, series: [{ingredient_id, store_id?, points: [{bucket, min_price_per_g,
+                  avg_price_per_g, max_price_per_g, count, avg_change_pct}]}]}
+        """
+        s = PriceTrendQuerySerializer(data=request.query_params)
+        s.is_valid(raise_exception=True)
+        data = s.validated_data
+        end = data.get("end") or timezone.now().date()
+        start = data.get("start") or end - timedelta(days=365)
+        series = price_trends(data["ingredient"], start, end, bucket=data["bucket"], by_store=data["by_store"])
+        return Response({"bucket": data["bucket"], "start": start, "end": end, "series": series}, status=status.HTTP_200_OK)
     
-class RecipeViewSet(GuestUserRecipeMixin, viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, GuestUserRecipeMixin, viewsets.ModelViewSet):
     """
     - Lecture pour tous
     - Modification/suppression :
@@ -391,20 +696,59 @@ class RecipeViewSet(GuestUserRecipeMixin, viewsets.ModelViewSet):
     - L'opération est atomique: création + M2M dans la même transaction.
     - Ordre recommandé côté client: créer dépendances -> poster la recette -> lier steps / sub-recipes.
     """
-    queryset = Recipe.objects.all()\
-        .prefetch_related("categories", "labels", "recipe_ingredients__ingredient", "steps", "main_recipes__sub_recipe", 
-                          "main_recipes__sub_recipe__recipe_ingredients__ingredient", "main_recipes__sub_recipe__main_recipes__sub_recipe")\
-        .select_related("pan", "parent_recipe", "owned_by_recipe")\
-        .order_by("recipe_name", "chef_name")
+    queryset = Recipe.objects.all().order_by("recipe_name", "chef_name")
     serializer_class = RecipeSerializer
     permission_classes = [CanSoftHideRecipeOrIsOwnerOrGuest]
 
     filterset_class = RecipeFilter
-    filter_backends = [QSearchFilter, SearchFilter, DjangoFilterBackend, OrderingFilter]
+    filter_backends = [QSearchFilter, SearchFilter, DjangoFilterBackend, RankedOrderingFilter]
     search_fields = ["recipe_name", "chef_name", "context_name","categories__category_name", "labels__label_name"]
     filterset_fields = ["recipe_type", "chef_name", "categories", "labels", "pan", "parent_recipe", "tags"]
-    ordering_fields = ["recipe_name", "chef_name", "recipe_type", "created_at", "updated_at", "parent_recipe"]
+    ordering_fields = ["recipe_name", "chef_name", "recipe_type", "created_at", "updated_at", "parent_recipe", "ingredient_count"]
     ordering = ["recipe_name", "chef_name"]
+    pagination_class = KeysetPagination
+    # Chargement par action (cf. PrefetchPlanMixin) : exactement les relations lues par le sérialiseur de l'action.
+    # FK rendues par id (pan, user…) : colonne *_id, sans jointure.
+    _list_plan = {"prefetch": {"categories": "categories", "labels": "labels"},
+                  "expand": {"pan": "pan"}, "defer": ("search_vector",)}  # parent_recipe : non rendu par la liste
+    _detail_plan = {"select": {"parent_recipe_name": "parent_recipe"},
+                    "prefetch": {"categories": "categories", "labels": "labels", "ingredients": "recipe_ingredients",
+                                 "steps": "steps", "sub_recipes": "main_recipes"},
+                    "expand": {"pan": "pan", "parent_recipe": "parent_recipe"}, "defer": ("search_vector",)}
+    prefetch_plans = {
+        "list": _list_plan,
+        "lego_candidates": _list_plan,
+        "retrieve": _detail_plan,
+        "create": _detail_plan, "update": _detail_plan, "partial_update": _detail_plan,
+        "adapt_recipe": _detail_plan,
+        "full": {"prefetch": {"*": recipe_tree_prefetch_lookups()}},  # build_tree_from_db
+        "reference_suggestions": {"prefetch": {"*": "categories"}},
+    }
+    # ?expand= lu dans une table de référence : sa génération entre dans l'ETag du détail (cf. retrieve)
+    expand_generation_models = {"pan": Pan, "categories": Category, "labels": Label}
+    keyset_orderings = {  # index idx_recipe_name_id / idx_recipe_updated_id
+        "recipe_name": ("recipe_name", "id"),
+        "-updated_at": ("-updated_at", "-id"),
+        "updated_at": ("updated_at", "id"),
+    }
+
+    def list(self, request, *args, **kwargs):
+        """
+        Liste filtrée. Avec ?facets=categories,labels,recipe_type,pan_type (ou "all"), la réponse devient
+        {"results": [...], "facets": {...}} : compteurs calculés sur tout l'ensemble filtré (cf. recipe_facet_counts).
+        """
+        try:
+            facets = parse_recipe_facets(request.query_params.get("facets"))
+        except DjangoValidationError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        response = super().list(request, *args, **kwargs)
+        if not facets:
+            return response
+        counts = recipe_facet_counts(self.filter_queryset(self.get_queryset()), facets)
+        if isinstance(response.data, dict):  # réponse paginée
+            response.data["facets"] = counts
+            return response
+        return Response({"results": response.data, "facets": counts})
 
     @action(detail=True, methods=["post"], url_path="adapt", permission_classes=[AllowAny])
     @transaction.atomic  # Pour que tout soit fait ou rien si une étape échoue
@@ -623,6 +967,11 @@ class RecipeViewSet(GuestUserRecipeMixin, viewsets.ModelViewSet):
         Liste paginée des recettes candidates pour le mode LEGO.
         - Repose sur RecipeFilter + Search/Ordering DRF.
         - Par défaut, aucune restriction d'usage (standalone ou déjà utilisées).
+        - Classement par adéquation (cf. rank_lego_candidates) si une cible est fournie :
+            target_quantity=<g> (prioritaire) ou target_servings=<n>, host=<id recette hôte>,
+            include_non_scalable=0|1 (défaut 1, non scalables en fin de liste).
+          Chaque item porte alors scale_multiplier et is_host_variant ; aucune adaptation n'est exécutée.
+          Réponse paginée ?page= / ?page_size= (cf. RankedPagination).
         """
         params = _sanitize_params(request.query_params, ALLOWED_LEGO_SEARCH_PARAMS)
         # Option stricte: refuse toute clé non whitelistée
@@ -630,19 +979,44 @@ class RecipeViewSet(GuestUserRecipeMixin, viewsets.ModelViewSet):
         if unknown:
             return Response({"detail": f"Paramètres non supportés: {sorted(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            target_quantity = float(params["target_quantity"]) if params.get("target_quantity") else None
+            target_servings = int(params["target_servings"]) if params.get("target_servings") else None
+            host_id = int(params["host"]) if params.get("host") else None
+        except ValueError:
+            return Response({"detail": "target_quantity, target_servings et host doivent être numériques."}, status=status.HTTP_400_BAD_REQUEST)
+        if (target_quantity is not None and target_quantity <= 0) or (target_servings is not None and target_servings < 1):
+            return Response({"detail": "target_quantity et target_servings doivent être strictement positifs."}, status=status.HTTP_400_BAD_REQUEST)
+        host = get_object_or_404(self.get_queryset(), pk=host_id) if host_id is not None else None
+        ranked = target_quantity is not None or target_servings is not None or host is not None
+
         # Applique SearchFilter + DjangoFilterBackend + OrderingFilter + RecipeFilter
         qs = self.filter_queryset(self.get_queryset())
 
+        if ranked:
+            include_non_scalable = str(params.get("include_non_scalable", "1")).lower() in {"1", "true", "yes"}
+            qs = rank_lego_candidates(qs, target_quantity=target_quantity, target_servings=target_servings, host=host,
+                                      include_non_scalable=include_non_scalable)
+            if "ordering" in params:  # tri explicite du client prioritaire sur l'adéquation
+                qs = OrderingFilter().filter_queryset(request, qs, self)
         # Tri par défaut si 'ordering' non fourni
-        if "ordering" not in params:
+        elif "ordering" not in params:
             qs = qs.order_by("recipe_name", "-updated_at")
 
         # Pagination DRF standard:
-        page = self.paginate_queryset(qs)  # paginate_queryset(qs) renvoie la page courante (liste) ou None si pas de pagination.
+        # paginate_queryset(qs) renvoie la page courante (liste) ou None si pas de pagination.
+        # Classement par adéquation : pas de keyset (il imposerait son propre ordre), la liste classée est
+        # découpée en pages numérotées, toujours bornée (RankedPagination).
+        if ranked:
+            paginator = RankedPagination()
+            page = paginator.paginate_queryset(qs, request, view=self)
+            ser = RecipeLegoCandidateSerializer(page, many=True, context=self.get_serializer_context())
+            return paginator.get_paginated_response(ser.data)
+        page = self.paginate_queryset(qs)
         data_qs = page if page is not None else qs
         ser = RecipeListSerializer(data_qs, many=True, context=self.get_serializer_context())
 
-        # get_paginated_response sérialise en {count,next,previous,results:[...]}
+        # get_paginated_response sérialise en {next,results:[...]}
         return self.get_paginated_response(ser.data) if page is not None else Response(ser.data, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["get"], url_path="reference-uses", permission_classes=[AllowAny])
@@ -796,11 +1170,21 @@ class RecipeViewSet(GuestUserRecipeMixin, viewsets.ModelViewSet):
         Usage:
         - lecture et édition front (vue “tout à plat” ou sectionnée)
         - aucune adaptation/scaling n’est effectuée ici
+
+        GET conditionnel : ETag sur les versions de la recette et de toutes ses sous-recettes (utils.recipe_tree_state),
+        Last-Modified = updated_at le plus récent de l'arbre ; 304 avant la construction de l'arbre.
         """
+        if self._recipe_validators(pk) is None:
+            raise NotFound()
+        versions, last_modified = recipe_tree_state(int(pk))
+        etag = make_etag("full", versions)
+        not_modified = self.conditional_response(request, etag, last_modified)
+        if not_modified:
+            return not_modified
         recipe = self.get_object()
         payload = compose_full(recipe)
         serializer = self.get_serializer(payload)  # => RecipeFullSerializer
-        return Response(serializer.data, 200)
+        return self.set_validators(Response(serializer.data, 200), etag, last_modified)
 
     @action(detail=True, methods=["post"], url_path="convert-units", permission_classes=[AllowAny])
     def convert_units(self, request, pk=None):
@@ -857,6 +1241,60 @@ class RecipeViewSet(GuestUserRecipeMixin, viewsets.ModelViewSet):
             "warnings": warnings
         }, status=200)
 
+    @action(detail=True, methods=["get"], url_path="cost", permission_classes=[AllowAny])
+    def cost(self, request, pk=None):
+        """
+        Coût de la recette à une date donnée, à partir de l’historique des prix.
+
+        Query params:
+          - as_of=YYYY-MM-DD (défaut: aujourd’hui)
+          - store_ids=1,2 (optionnel)
+
+        Réponse: {as_of, cost, complete, ingredients:[{ingredient_id, quantity_g, price_per_g, cost, ...}],
+                  missing_ingredient_ids, warnings}
+        """
+        recipe = get_object_or_404(_visible_recipes(request), pk=pk)
+        s = RecipeCostQuerySerializer(data=request.query_params)
+        s.is_valid(raise_exception=True)
+
+        user = request.user if request.user.is_authenticated else None
+        guest_id = _extract_guest_id(request)
+        as_of = s.validated_data.get("as_of") or timezone.now().date()
+        try:
+            payload = recipe_cost_as_of(recipe, as_of, store_ids=s.validated_data.get("store_ids"), user=user, guest_id=guest_id)
+        except DjangoValidationError as e:
+            return Response({"error": str(e)}, status=400)
+        payload["recipe_id"] = recipe.id
+        return Response(payload, 200)
+
+    @action(detail=True, methods=["get"], url_path="cost-history", permission_classes=[AllowAny])
+    def cost_history(self, request, pk=None):
+        """
+        Série de coûts de la recette sur une période, calculée en bloc (une passe sur l’historique).
+
+        Query params:
+          - start, end=YYYY-MM-DD (défaut: les 365 derniers jours)
+          - granularity=day|week|month (défaut: week)
+          - store_ids=1,2 (optionnel)
+
+        Réponse: {recipe_id, start, end, granularity, points:[{date, cost, complete, missing_ingredient_ids}], warnings}
+        """
+        recipe = get_object_or_404(_visible_recipes(request), pk=pk)
+        s = RecipeCostQuerySerializer(data=request.query_params)
+        s.is_valid(raise_exception=True)
+        data = s.validated_data
+
+        user = request.user if request.user.is_authenticated else None
+        guest_id = _extract_guest_id(request)
+        end = data.get("end") or timezone.now().date()
+        start = data.get("start") or end - timedelta(days=365)
+        try:
+            dates = cost_date_range(start, end, data["granularity"])
+            series = recipe_cost_series(recipe, dates, store_ids=data.get("store_ids"), user=user, guest_id=guest_id)
+        except DjangoValidationError as e:
+            return Response({"error": str(e)}, status=400)
+        return Response({"recipe_id": recipe.id, "start": start, "end": end, "granularity": data["granularity"], **series}, 200)
+
     def get_filter_backends(self):
         if getattr(self, "action", None) in {"reference_uses"}:
             return []
@@ -865,50 +1303,90 @@ class RecipeViewSet(GuestUserRecipeMixin, viewsets.ModelViewSet):
     def get_queryset(self):
         """
         1) Retourne les recettes visibles pour l'utilisateur courant (connecté ou invité).
-        - Filtre de base : recettes accessibles selon GuestUserRecipeMixin (user, guest_id, visibilité, is_default).
+        - Filtre de base : recettes accessibles (user, guest_id, visibilité, is_default), cf. utils.visible_recipes.
         - Exclut les recettes masquées pour l'utilisateur courant (UserRecipeVisibility).
         - Si query param `parent_recipe`, filtre uniquement les adaptations de cette recette mère.
 
-        2) Ajoute select_related/prefetch selon le contexte:
-        - list: léger
-        - retrieve/actions: complet
+        2) Ajoute select_related/prefetch selon le plan de l'action (prefetch_plans), limité pour list/retrieve
+        aux relations rendues (?fields=) ou développées (?expand=).
         """    
-        # Étape 1 : Récupère le queryset de base (incluant user/guest_id/public/de base)
-        qs = super().get_queryset()
-        user = self.request.user
-        guest_id = (
-            self.request.headers.get("X-Guest-Id")
-            or self.request.headers.get("X-GUEST-ID")
-            or self.request.data.get("guest_id")
-            or self.request.query_params.get("guest_id")
-        )
-
-        # Étape 2 : Exclure les recettes explicitement masquées par ce user ou guest_id
-        if user.is_authenticated:
-            hidden_ids = UserRecipeVisibility.objects.filter(user=user, visible=False).values_list("recipe_id", flat=True)
-            qs = qs.exclude(id__in=hidden_ids)
-        elif guest_id:
-            hidden_ids = UserRecipeVisibility.objects.filter(guest_id=guest_id, visible=False).values_list("recipe_id", flat=True)
-            qs = qs.exclude(id__in=hidden_ids)
+        # Étapes 1-2 : recettes visibles (user/guest_id/public/de base) hors masquées, en UNION ALL indexable
+        qs = self._visible_queryset()
 
         # Étape 3 : Si on filtre sur une recette mère, ne garder que ses adaptations (variations)
         parent_recipe = self.request.query_params.get("parent_recipe")
         if parent_recipe:
             qs = qs.filter(parent_recipe=parent_recipe)
 
-        # --- Étape enrichissement conditionnel ---
-        qs = qs.select_related("pan").order_by("recipe_name","chef_name")
+        # --- Étape enrichissement : plan de l'action, restreint aux champs rendus / développés (?fields= / ?expand=) ---
+        return self.apply_prefetch_plan(qs, *self.get_sparse_fieldset())
 
-        heavy = {"retrieve","full","adapt_recipe","reference_suggestions","bulk_edit_subrecipe_ingredients"}
-        if getattr(self, "action", None) in heavy:
-            return qs.prefetch_related(
-                "categories","labels",
-                "recipe_ingredients__ingredient",
-                "steps",
-                "main_recipes__sub_recipe",
-            )
-        else:
-            return qs.prefetch_related("categories","labels")
+    def _visible_queryset(self):
+        """ Recettes visibles pour l'appelant, sans plan de chargement (cf. utils.visible_recipes). """
+        user = self.request.user
+        if user.is_authenticated:
+            return visible_recipes(user=user, queryset=self.queryset.all())
+        return visible_recipes(guest_id=self.get_guest_id(), queryset=self.queryset.all())
+
+    def _recipe_validators(self, pk):
+        """
+        (version, updated_at, version et updated_at de la recette parente) de la recette visible `pk`,
+        en une requête légère ; None si absente ou invisible.
+        """
+        if not str(pk).isdigit():
+            return None
+        return (self._visible_queryset().filter(pk=pk)
+                .values_list("version", "updated_at", "parent_recipe__version", "parent_recipe__updated_at").first())
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Détail avec GET conditionnel : ETag "<id>-<version>" (suffixé selon ?fields=/?expand=), Last-Modified = updated_at.
+        Les données lues dans d'autres lignes entrent aussi dans les validateurs :
+          - parent_recipe_name (et ?expand=parent_recipe) : version et updated_at de la recette parente ;
+          - ?expand=pan|categories|labels : générations des tables (cf. get_table_generations), sans date
+            de modification → pas de Last-Modified, seul l'ETag valide.
+        If-None-Match / If-Modified-Since à jour → 304, vérifié avant tout chargement ou sérialisation.
+        """
+        state = self._recipe_validators(kwargs.get("pk"))
+        if state is None:
+            return super().retrieve(request, *args, **kwargs)  # 404
+        version, updated_at, parent_version, parent_updated_at = state
+        variant = [request.META.get("QUERY_STRING", "")]
+        if parent_version is not None:
+            variant.append(f"parent:{parent_version}:{parent_updated_at.timestamp()}")
+            updated_at = max(updated_at, parent_updated_at)
+        _, expand = self.get_sparse_fieldset()
+        expanded = [model for name, model in self.expand_generation_models.items() if name in expand]
+        if expanded:
+            variant.extend(get_table_generations(*expanded))
+            updated_at = None
+        etag = recipe_etag(kwargs["pk"], version, "|".join(variant) if len(variant) > 1 else variant[0])
+        return (self.conditional_response(request, etag, updated_at)
+                or self.set_validators(super().retrieve(request, *args, **kwargs), etag, updated_at))
+
+    def get_sparse_fieldset(self):
+        """
+        (fields, expand) issus de ?fields= / ?expand= pour list et retrieve en lecture (cf. utils.parse_sparse_fieldset),
+        (None, ∅) sinon. Paramètre invalide, ou relation absente du sérialiseur de l'action → 400.
+        """
+        if not hasattr(self, "_sparse_fieldset"):
+            self._sparse_fieldset = (None, frozenset())
+            request = getattr(self, "request", None)
+            if request is not None and request.method == "GET" and getattr(self, "action", None) in {"list", "retrieve"}:
+                allowed = self.get_serializer_class().Meta.fields
+                expandable = [f for f in RECIPE_EXPANDABLE_FIELDS if f in allowed]  # seules les relations rendues par l'action
+                try:
+                    self._sparse_fieldset = parse_sparse_fieldset(
+                        request.query_params.get("fields"), request.query_params.get("expand"),
+                        allowed=allowed, expandable=expandable)
+                except DjangoValidationError as e:
+                    raise DRFValidationError({"error": str(e)})
+        return self._sparse_fieldset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["fields"], context["expand"] = self.get_sparse_fieldset()
+        return context
 
     def get_serializer_class(self):
         mapping = {
@@ -971,11 +1449,12 @@ class RecipeViewSet(GuestUserRecipeMixin, viewsets.ModelViewSet):
     def _check_if_match(self, request, instance):
         """
         Vérifie le header HTTP 'If-Match' contre instance.version (verrou optimiste).
+        - Accepte la version brute ("3") ou l'ETag renvoyé par le détail ("\"12-3\"", cf. utils.etag_version).
         - Si présent et différent, on renvoie 409 pour signaler un conflit de concurrence.
         - Sinon, on laisse la mutation se poursuivre.
         """
         client_ver = request.headers.get("If-Match")
-        if client_ver is not None and str(instance.version) != str(client_ver):
+        if client_ver is not None and client_ver.strip() != "*" and etag_version(client_ver) != instance.version:
             return Response({"detail": "Version conflict"}, status=status.HTTP_409_CONFLICT)
         return None
 
@@ -1010,8 +1489,9 @@ class RecipeViewSet(GuestUserRecipeMixin, viewsets.ModelViewSet):
         instance.save(update_fields=["version"])
         return resp
 
-class IngredientViewSet(GuestUserRecipeMixin, viewsets.ModelViewSet):
+class IngredientViewSet(GenerationETagMixin, GuestUserRecipeMixin, viewsets.ModelViewSet):
     queryset = Ingredient.objects.all().order_by('ingredient_name')
+    etag_generation_models = (Ingredient, IngredientPrice, Category, Label)  # prix résumés / détaillés, M2M
     serializer_class = IngredientSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ["categories", "labels"]
@@ -1019,6 +1499,26 @@ class IngredientViewSet(GuestUserRecipeMixin, viewsets.ModelViewSet):
     ordering_fields = ["ingredient_name"]
     ordering = ["ingredient_name"]
     permission_classes = [IsOwnerOrGuestOrReadOnly & IsNotDefaultInstance]
+    pagination_class = KeysetPagination
+    keyset_orderings = {"ingredient_name": ("ingredient_name",), "id": ("id",)}  # nom unique : index d'unicité
+
+    def _include_prices(self):
+        """ Prix détaillés : toujours en détail, sur demande (?include_prices=true) en liste. """
+        if self.action != "list":
+            return True
+        return (self.request.query_params.get("include_prices") or "").lower() in {"1", "true", "yes"}
+
+    def get_queryset(self):
+        """ Liste résumée : meilleur prix au gramme, nb de magasins et dernière mise à jour annotés (une ligne par ingrédient). """
+        qs = super().get_queryset().annotate(**ingredient_price_summary_annotations()).prefetch_related("categories", "labels")
+        if self._include_prices():
+            qs = qs.prefetch_related("prices")
+        return qs
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["include_prices"] = self._include_prices()
+        return context
 
     def create(self, request, *args, **kwargs):
         """ Normaliser le nom de l'ingrédient et empêcher les doublons """
@@ -1026,7 +1526,7 @@ class IngredientViewSet(GuestUserRecipeMixin, viewsets.ModelViewSet):
         ingredient_name = normalize_case(data.get("ingredient_name", ""))
 
         # Vérifier si l'ingrédient existe déjà AVANT toute validation
-        if Ingredient.objects.filter(ingredient_name__iexact=ingredient_name).exists():
+        if Ingredient.objects.filter(ingredient_name__nexact=ingredient_name).exists():
             return Response({"ingredient_name": "Cet ingrédient existe déjà."}, status=status.HTTP_400_BAD_REQUEST)
 
         # Normalisation du nom de l'ingrédient
@@ -1054,8 +1554,11 @@ class IngredientViewSet(GuestUserRecipeMixin, viewsets.ModelViewSet):
             )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(GenerationETagMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all().order_by('category_name')
+    etag_generation_models = (Category,)
+    generation_shared_scope = True  # catégories globales : même liste pour tous
+    cache_generation_lists = True
     serializer_class = CategorySerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ["category_name", "parent_category"]
@@ -1105,8 +1608,11 @@ class CategoryViewSet(viewsets.ModelViewSet):
         except IntegrityError:
             return Response({"error": "Erreur lors de la suppression de la catégorie."}, status=status.HTTP_400_BAD_REQUEST)
 
-class LabelViewSet(viewsets.ModelViewSet):
+class LabelViewSet(GenerationETagMixin, viewsets.ModelViewSet):
     queryset = Label.objects.all().order_by('label_name')
+    etag_generation_models = (Label,)
+    generation_shared_scope = True  # labels globaux : même liste pour tous
+    cache_generation_lists = True
     serializer_class = LabelSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ["label_type"]
@@ -1233,8 +1739,10 @@ class SubRecipeViewSet(viewsets.ModelViewSet):
         except DjangoValidationError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-class PanViewSet(GuestUserRecipeMixin, viewsets.ModelViewSet):
+class PanViewSet(GenerationETagMixin, GuestUserRecipeMixin, viewsets.ModelViewSet):
     queryset = Pan.objects.all().order_by('pan_name')
+    etag_generation_models = (Pan,)
+    cache_generation_lists = True
     serializer_class = PanSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['pan_type', 'pan_brand']  # autorise le filtre ?pan_type=ROUND&pan_brand=DeBuyer
@@ -1267,13 +1775,15 @@ class PanViewSet(GuestUserRecipeMixin, viewsets.ModelViewSet):
 
         return Response(serializer.data)
     
-class IngredientUnitReferenceViewSet(OverridableReferenceQuerysetMixin, GuestUserReferenceMixin, viewsets.ModelViewSet):
+class IngredientUnitReferenceViewSet(GenerationETagMixin, OverridableReferenceQuerysetMixin, GuestUserReferenceMixin, viewsets.ModelViewSet):
     """
     ViewSet CRUD complet pour gérer le mapping d'unités en API.
     Limité aux admins (modifiable selon tes besoins).
     """
     queryset = IngredientUnitReference.objects.all().select_related('ingredient')
     serializer_class = IngredientUnitReferenceSerializer
+    etag_generation_models = (IngredientUnitReference, Ingredient)
+    cache_generation_lists = True
     filterset_fields = ['unit', 'ingredient']
     search_fields = ['ingredient__ingredient_name', 'ingredient__slug', 'notes']
     ordering_fields = ['ingredient', 'unit', 'weight_in_grams']
@@ -1578,3 +2088,43 @@ class RecipeAdaptationByIngredientAPIView(APIView):
 
         except ValidationError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+class ShoppingBasketOptimizerAPIView(APIView):
+    """
+    API pour répartir une liste de courses entre magasins au moindre coût.
+    Respecte les formats de vente (IngredientPrice.quantity/unit) et, optionnellement, un nombre max de magasins.
+    """
+
+    def post(self, request):
+        """
+        Paramètres d'entrée :
+            - items (list [{ingredient_id, quantity, unit}]) [obligatoire]
+            - max_stores (int, optionnel)
+            - store_ids (list[int], optionnel)
+        Retour :
+            - "stores": panier par magasin (lignes, formats achetés, sous-total)
+            - "total_cost", "missing" (ingrédients sans prix exploitable), "solver" (exact|greedy)
+        """
+        serializer = ShoppingBasketOptimizerSerializer(data=request.data, context={"request": request})
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        user = request.user if request.user.is_authenticated else None
+        guest_id = _extract_guest_id(request)
+
+        # Magasins visibles par l'appelant
+        vis_q = Q(visibility="public") | Q(is_default=True)
+        if user:
+            vis_q |= Q(user=user)
+        if guest_id:
+            vis_q |= Q(guest_id=guest_id)
+        stores = Store.objects.filter(vis_q)
+        if data.get("store_ids"):
+            stores = stores.filter(id__in=data["store_ids"])
+
+        try:
+            result = build_shopping_basket(data["items"], stores, max_stores=data.get("max_stores"), user=user, guest_id=guest_id)
+            return Response(result, status=status.HTTP_200_OK)
+
+        except DjangoValidationError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)